@@ -90,6 +90,31 @@ async def startup_event():
     model_path = "./models"
     agent = await Agent.load(model_path)
     logger.info("Rasa agent loaded successfully")
+    
+    # Open the shared MongoDB pool and keep the health status fresh in the background
+    from db_connection import health_probe
+    health_probe.start()
+    
+    # Feedback is buffered and written in batches. The flusher also keeps the
+    # stats current with what other workers wrote, and compacts the fallback log
+    from feedback_analyzer import feedback_analyzer
+    from feedback_queue import feedback_queue
+    feedback_queue.add_flush_listener(feedback_analyzer.refresh)
+    feedback_queue.add_flush_listener(feedback_analyzer.compact_if_needed)
+    feedback_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    import async_recipe_db
+    from db_connection import health_probe, recipe_database
+    from feedback_analyzer import feedback_analyzer
+    from feedback_queue import feedback_queue
+    await health_probe.stop()
+    # Flush buffered feedback before the connection goes away, then compact the log
+    await feedback_queue.stop()
+    await asyncio.get_running_loop().run_in_executor(None, feedback_analyzer.save_feedback)
+    async_recipe_db.shutdown()
+    recipe_database.close()
 
 @app.middleware("http")
 async def rate_limit_middleware(request: Request, call_next):
@@ -275,9 +300,12 @@ async def get_recipes(request: Request):
             if key in ["diet", "cuisine", "ingredient", "course", "time", "taste", "exclude_ingredient"]:
                 preferences[key] = value
         
-        # Search for recipes
-        from recipe_db import search_with_fallback
-        search_result = search_with_fallback(preferences)
+        # Free-text keywords ("q") use the MongoDB text index
+        text_query = params.get("q", "").strip() or None
+        
+        # Search for recipes without blocking the event loop
+        from async_recipe_db import search_with_fallback
+        search_result = await search_with_fallback(preferences, text_query=text_query)
         recipes = search_result["results"]
         relaxed = search_result["relaxed"]
         
@@ -310,14 +338,15 @@ async def collect_feedback(request: Request):
     }
     
     try:
-        # Store feedback in MongoDB
-        from pymongo import MongoClient
-        import os
+        # Buffer the feedback; it is written to MongoDB in batches
+        from feedback_queue import feedback_queue
+        
+        if not feedback_queue.put(feedback):
+            raise RuntimeError("Feedback queue is full")
         
-        mongo_uri = os.environ.get("MONGO_URI", "mongodb://localhost:27017/")
-        client = MongoClient(mongo_uri)
-        db = client["recipeDB"]
-        db["feedback"].insert_one(feedback)
+        # Keep the live rating aggregates current
+        from feedback_analyzer import feedback_analyzer
+        feedback_analyzer.observe_feedback(feedback)
         
         # Also log it
         logger.info(f"Received feedback: {feedback}")
@@ -328,6 +357,16 @@ async def collect_feedback(request: Request):
         # Still acknowledge receipt even if storage fails
         return {"status": "partial", "message": "Feedback received but not stored"}
 
+@app.get("/feedback/stats")
+async def feedback_stats(days: int = 30):
+    """Rating averages, distribution and daily trend without building a report"""
+    try:
+        from feedback_analyzer import feedback_analyzer
+        return {"status": "success", "stats": feedback_analyzer.get_stats(days)}
+    except Exception as e:
+        logger.error(f"Error computing feedback stats: {e}")
+        return {"status": "error", "message": str(e)}
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint with detailed status"""
@@ -335,23 +374,17 @@ async def health_check():
         # Check if agent is loaded
         agent_status = agent is not None
         
-        # Check MongoDB connection
-        db_status = False
-        try:
-            from pymongo import MongoClient
-            import os
-            
-            mongo_uri = os.environ.get("MONGO_URI", "mongodb://localhost:27017/")
-            client = MongoClient(mongo_uri, serverSelectionTimeoutMS=2000)
-            client.server_info()  # Will raise exception if cannot connect
-            db_status = True
-        except:
-            db_status = False
+        # MongoDB status from the background probe (no round trip here)
+        from db_connection import health_probe
+        from feedback_queue import feedback_queue
+        db_status = health_probe.status
         
         return {
             "status": "healthy" if agent_status else "degraded",
             "agent_loaded": agent_status,
-            "database_connected": db_status,
+            "database_connected": db_status["database_connected"],
+            "database_checked_at": db_status["checked_at"],
+            "feedback_queue": feedback_queue.stats(),
             "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
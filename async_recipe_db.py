@@ -0,0 +1,46 @@
+import asyncio
+import functools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional
+
+import recipe_db
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# The search functions share in-process state (index, caches, pantry matrix) with
+# the synchronous recipe_db module, so they run on a bounded worker pool rather
+# than a separate async driver. The event loop stays free while a query runs.
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("RECIPE_DB_WORKERS", "8")),
+    thread_name_prefix="recipe-db"
+)
+
+async def _run(func, *args, **kwargs):
+    """Run a blocking recipe_db call on the worker pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+async def search_with_fallback(preferences: Dict[str, Any], max_relaxations: int = 3,
+                               text_query: Optional[str] = None) -> Dict[str, Any]:
+    """Async version of recipe_db.search_with_fallback"""
+    return await _run(recipe_db.search_with_fallback, preferences, max_relaxations, text_query=text_query)
+
+async def search_with_weighted_scoring(preferences: Dict[str, Any],
+                                       weights: Optional[Dict[str, float]] = None,
+                                       ranges: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Async version of recipe_db.search_with_weighted_scoring"""
+    return await _run(recipe_db.search_with_weighted_scoring, preferences, weights, ranges=ranges)
+
+async def search_by_available_ingredients(available_ingredients: List[str],
+                                          min_match_percentage: float = 0.6) -> List[Dict[str, Any]]:
+    """Async version of recipe_db.search_by_available_ingredients"""
+    return await _run(recipe_db.search_by_available_ingredients, available_ingredients, min_match_percentage)
+
+def shutdown():
+    """Stop the worker pool (call on application shutdown)"""
+    _executor.shutdown(wait=False)
+    logger.info("Recipe database worker pool shut down")
@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+from pymongo import MongoClient
+
+from schema_capabilities import schema_capabilities
+from search_cache import notify_recipes_reloaded, register_freshness_check
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Bump whenever INDEX_SPECS changes so deployments recreate their indexes once
+SCHEMA_VERSION = 2
+
+# Every index the recipe collection needs, as (keys, options)
+INDEX_SPECS: List[Tuple[List[Tuple[str, Any]], Dict[str, Any]]] = [
+    # A collection may only have one text index
+    ([("RecipeName", "text"), ("Description", "text"), ("ingredients", "text")], {"name": "recipe_text"}),
+    ([("Cuisine", 1)], {}),
+    ([("diet", 1)], {}),
+    ([("course", 1)], {}),
+    ([("time", 1)], {}),
+    ([("RecipeName", 1)], {}),
+    ([("TotalTimeInMins", 1)], {}),
+    ([("cleaned_ingredients", 1)], {}),
+    # Normalized fields targeted by the query compiler
+    ([("cuisine_normalized", 1)], {}),
+    ([("ingredient_tokens", 1)], {}),
+    ([("search_tokens", 1)], {}),
+    # Numeric fields derived at import, for range filters and sorts
+    ([("total_minutes", 1)], {}),
+    ([("calories", 1)], {}),
+    ([("protein", 1)], {}),
+    ([("complexity_score", 1)], {}),
+    # Compound indexes for common combinations
+    ([("diet", 1), ("cuisine_normalized", 1)], {}),
+    ([("diet", 1), ("Cuisine", 1)], {}),
+    ([("diet", 1), ("course", 1)], {}),
+    ([("diet", 1), ("total_minutes", 1)], {}),
+]
+
+def bootstrap_indexes(collection, force: bool = False) -> bool:
+    """Create the collection's indexes once per schema version; returns True if created"""
+    schema_info = collection.database["schema_info"]
+    if not force:
+        current = schema_info.find_one({"_id": collection.name})
+        if current and current.get("version", 0) >= SCHEMA_VERSION:
+            return False
+
+    for keys, options in INDEX_SPECS:
+        try:
+            collection.create_index(keys, **options)
+        except Exception as e:
+            # e.g. an older text index with a different definition
+            logger.warning(f"Could not create index {keys}: {e}")
+
+    schema_info.update_one(
+        {"_id": collection.name},
+        {"$set": {"version": SCHEMA_VERSION, "indexes_created_at": datetime.now().isoformat()}},
+        upsert=True
+    )
+    logger.info(f"Created MongoDB indexes for schema version {SCHEMA_VERSION}")
+    return True
+
+def record_import(collection) -> str:
+    """Stamp schema_info with a new import generation so serving processes reload"""
+    generation = uuid.uuid4().hex
+    collection.database["schema_info"].update_one(
+        {"_id": collection.name},
+        {"$set": {"import_generation": generation, "imported_at": datetime.now().isoformat()}},
+        upsert=True
+    )
+    return generation
+
+def read_import_generation(collection) -> Optional[str]:
+    """The generation stamped by the last recipe import (None before the first)"""
+    info = collection.database["schema_info"].find_one({"_id": collection.name}, {"import_generation": 1})
+    return info.get("import_generation") if info else None
+
+class RecipeDatabase:
+    """MongoDB connection that is opened on first use rather than at import"""
+
+    def __init__(self, uri: Optional[str] = None, db_name: str = "recipeDB",
+                 collection_name: str = "recipes", retry_interval: float = 30.0,
+                 import_check_interval: float = 30.0):
+        self.uri = uri
+        self.db_name = db_name
+        self.collection_name = collection_name
+        self.retry_interval = retry_interval
+        self.client: Optional[MongoClient] = None
+        self._collection = None
+        self._retry_after = 0.0
+        self._lock = threading.Lock()
+        # Imports run in another process; their stamp is polled at most this often
+        self.import_check_interval = import_check_interval
+        self._import_generation: Optional[str] = None
+        self._import_check_after = 0.0
+        self._import_lock = threading.Lock()
+
+    def _client_options(self) -> Dict[str, Any]:
+        """Connection options, configurable through the environment"""
+        return {
+            "serverSelectionTimeoutMS": int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "2000")),
+            # One pool shared by every request handler in the process
+            "maxPoolSize": int(os.environ.get("MONGO_MAX_POOL_SIZE", "50")),
+            "minPoolSize": int(os.environ.get("MONGO_MIN_POOL_SIZE", "0"))
+        }
+
+    def get_collection(self):
+        """Return the recipe collection, connecting on first use; None if MongoDB is unreachable"""
+        if self._collection is not None:
+            self.check_import_generation()
+            return self._collection
+
+        # Don't retry a failed connection on every call
+        if time.monotonic() < self._retry_after:
+            return None
+
+        with self._lock:
+            if self._collection is not None:
+                return self._collection
+            try:
+                uri = self.uri or os.environ.get("MONGO_URI", "mongodb://localhost:27017/")
+                client = MongoClient(uri, **self._client_options())
+                client.admin.command("ping")
+                collection = client[self.db_name][self.collection_name]
+                bootstrap_indexes(collection)
+                # Record which optional fields this deployment's recipes carry
+                schema_capabilities.refresh(collection)
+                self._import_generation = read_import_generation(collection)
+                self._import_check_after = time.monotonic() + self.import_check_interval
+
+                self.client = client
+                self._collection = collection
+                logger.info("Connected to MongoDB")
+            except Exception as e:
+                logger.error(f"Failed to connect to MongoDB: {e}")
+                self._retry_after = time.monotonic() + self.retry_interval
+        return self._collection
+
+    def check_import_generation(self):
+        """Reload derived state if the recipes were re-imported by another process"""
+        if self._collection is None:
+            return
+        # One request polls at a time; the others carry on with the current state
+        if time.monotonic() < self._import_check_after or not self._import_lock.acquire(blocking=False):
+            return
+        try:
+            self._import_check_after = time.monotonic() + self.import_check_interval
+            generation = read_import_generation(self._collection)
+            changed = generation != self._import_generation
+            self._import_generation = generation
+        except Exception as e:
+            logger.warning(f"Could not check the recipe import generation: {e}")
+            return
+        finally:
+            self._import_lock.release()
+
+        if changed:
+            logger.info("Recipes were re-imported; rebuilding cached search state")
+            notify_recipes_reloaded()
+
+    def get_database(self):
+        """Return the recipe database, connecting on first use; None if unreachable"""
+        collection = self.get_collection()
+        return collection.database if collection is not None else None
+
+    def close(self):
+        """Close the client; the next use reconnects"""
+        with self._lock:
+            if self.client is not None:
+                self.client.close()
+            self.client = None
+            self._collection = None
+            self._retry_after = 0.0
+
+    def ping(self) -> bool:
+        """Round-trip to the server; False if MongoDB is unreachable"""
+        collection = self.get_collection()
+        if collection is None:
+            return False
+        try:
+            collection.database.client.admin.command("ping")
+            return True
+        except Exception as e:
+            logger.warning(f"MongoDB ping failed: {e}")
+            return False
+
+class DatabaseHealthProbe:
+    """Pings MongoDB in the background so health checks read a cached result"""
+
+    def __init__(self, database: RecipeDatabase, interval: float = 10.0):
+        self.database = database
+        self.interval = interval
+        self.status: Dict[str, Any] = {"database_connected": False, "checked_at": None, "latency_ms": None}
+        self._task = None
+
+    async def check(self):
+        """Ping once on a worker thread and record the result"""
+        started = time.monotonic()
+        connected = await asyncio.get_running_loop().run_in_executor(None, self.database.ping)
+        self.status = {
+            "database_connected": connected,
+            "checked_at": datetime.now().isoformat(),
+            "latency_ms": round((time.monotonic() - started) * 1000, 1)
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"Health probe failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start probing (call from an application startup hook)"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop probing (call from an application shutdown hook)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# Create the shared database handle
+recipe_database = RecipeDatabase(import_check_interval=float(os.environ.get("IMPORT_CHECK_INTERVAL", "30")))
+# Cache hits never reach get_collection, so they check the import stamp too
+register_freshness_check(recipe_database.check_import_generation)
+health_probe = DatabaseHealthProbe(recipe_database, interval=float(os.environ.get("HEALTH_PROBE_INTERVAL", "10")))
+
+def get_collection():
+    """Return the shared recipe collection (None if MongoDB is unreachable)"""
+    return recipe_database.get_collection()
@@ -0,0 +1,80 @@
+import hashlib
+import json
+import logging
+import os
+import re
+from email.utils import formatdate
+from typing import Dict, List, Any, Optional
+
+from search_cache import SearchCache, register_reload_listener
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class FacetService:
+    """Distinct cuisine and diet values with per-value counts, cached in memory"""
+
+    def __init__(self, ttl_seconds: float = 300):
+        self.cache = SearchCache(max_size=64, ttl_seconds=ttl_seconds)
+
+    @staticmethod
+    def _selection_filters(diet: Optional[str], cuisine: Optional[str]) -> Dict[str, Dict[str, Any]]:
+        """Match stages for the current selection; each facet ignores its own field"""
+        diets = [d.strip().lower() for d in (diet or "").split(",") if d.strip()]
+        return {
+            "cuisines": {"diet": {"$all": diets}} if diets else {},
+            "diets": {"Cuisine": {"$regex": re.escape(cuisine.strip()), "$options": "i"}} if cuisine and cuisine.strip() else {}
+        }
+
+    def _aggregate(self, collection, diet: Optional[str], cuisine: Optional[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Count cuisines and diets in a single aggregation"""
+        filters = self._selection_filters(diet, cuisine)
+        pipeline = [{"$facet": {
+            "cuisines": [
+                {"$match": filters["cuisines"]},
+                {"$group": {"_id": "$Cuisine", "count": {"$sum": 1}}}
+            ],
+            "diets": [
+                {"$match": filters["diets"]},
+                # diet is a list for imported recipes and a string for older ones
+                {"$unwind": "$diet"},
+                {"$group": {"_id": "$diet", "count": {"$sum": 1}}}
+            ]
+        }}]
+        buckets = next(collection.aggregate(pipeline), {})
+
+        # Filter out None values and empty strings
+        return {
+            facet: sorted(
+                ({"value": bucket["_id"], "count": bucket["count"]} for bucket in buckets.get(facet, []) if bucket["_id"]),
+                key=lambda entry: entry["value"]
+            )
+            for facet in ("cuisines", "diets")
+        }
+
+    def get_facets(self, collection, diet: Optional[str] = None, cuisine: Optional[str] = None) -> Dict[str, Any]:
+        """Return {"facets", "etag", "last_modified"}, computing the facets on a cache miss"""
+        key = ((diet or "").strip().lower(), (cuisine or "").strip().lower())
+        hit, entry = self.cache.get(key)
+        if hit:
+            return entry
+
+        facets = self._aggregate(collection, diet, cuisine)
+        body = json.dumps(facets, sort_keys=True, default=str).encode()
+        entry = {
+            "facets": facets,
+            "etag": '"' + hashlib.sha1(body).hexdigest() + '"',
+            "last_modified": formatdate(usegmt=True)
+        }
+        self.cache.set(key, entry)
+        logger.info(f"Computed recipe facets for diet={diet!r}, cuisine={cuisine!r}")
+        return entry
+
+    def invalidate(self):
+        """Drop cached facets (called after a recipe import)"""
+        self.cache.invalidate()
+
+# Create the shared facet service
+facet_service = FacetService(ttl_seconds=float(os.environ.get("FACET_CACHE_TTL", "300")))
+register_reload_listener(facet_service.invalidate)
@@ -1,83 +1,268 @@
 import logging
 import json
 import os
-from typing import Dict, List, Any, Optional
-from datetime import datetime
+import hashlib
+import threading
+import time
+import uuid
+from typing import Dict, List, Any, Optional, Set, Iterable
+from datetime import date, datetime
 import re
-from collections import Counter, defaultdict
+from collections import Counter
 import matplotlib.pyplot as plt
 import numpy as np
 
+from feedback_queue import FEEDBACK_LOG_PATH, FEEDBACK_LOG_LOCK, append_feedback_log, ensure_feedback_id
+from feedback_store import FeedbackStore, day_of, seconds_ago
+from recommender_store import read_jsonl
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Look-back of each named time period, in days
+PERIOD_DAYS = {"day": 1, "week": 7, "month": 30}
+
+# Compacted feedback; the log holds what was appended since
+FEEDBACK_SNAPSHOT_PATH = os.path.join("data", "feedback.json")
+
+# The log is moved here while save_feedback compacts it
+COMPACTING_LOG_PATH = FEEDBACK_LOG_PATH + ".compacting"
+
+# compact_if_needed compacts once the log is larger than this
+COMPACT_LOG_BYTES = int(os.environ.get("FEEDBACK_COMPACT_BYTES", str(1024 * 1024)))
+
+# refresh reads MongoDB at most this often, going back this far before the last
+# read (a batch is flushed a little after its entries were timestamped)
+REFRESH_INTERVAL = float(os.environ.get("FEEDBACK_REFRESH_INTERVAL", "10"))
+REFRESH_OVERLAP_SECONDS = float(os.environ.get("FEEDBACK_REFRESH_OVERLAP", "300"))
+
+def assign_legacy_ids(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Give entries written before feedback ids existed a stable feedback_id
+
+    The id is derived from the entry and the number of identical entries before
+    it, so the same files always load with the same ids and identical entries
+    stay distinct.
+    """
+    occurrences = Counter()
+    for entry in entries:
+        if "feedback_id" not in entry:
+            digest = hashlib.sha1(json.dumps(entry, sort_keys=True, default=str).encode()).hexdigest()
+            entry["feedback_id"] = f"{digest}-{occurrences[digest]}"
+            occurrences[digest] += 1
+    return entries
+
+def read_feedback_files() -> List[Dict[str, Any]]:
+    """Entries of the snapshot file and the log, oldest first"""
+    entries = []
+    if os.path.exists(FEEDBACK_SNAPSHOT_PATH):
+        with open(FEEDBACK_SNAPSHOT_PATH, "r") as f:
+            entries = json.load(f)
+    # A log left aside by an interrupted compaction comes first
+    entries.extend(read_jsonl(COMPACTING_LOG_PATH))
+    entries.extend(read_jsonl(FEEDBACK_LOG_PATH))
+    return assign_legacy_ids(entries)
+
+def read_feedback_collection(since: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+    """Entries the feedback queue wrote to MongoDB, optionally only those timestamped
+    since an ISO time; None if MongoDB is unreachable"""
+    from db_connection import recipe_database
+
+    db = recipe_database.get_database()
+    if db is None:
+        return None
+    feedback = db["feedback"]
+    if since is None:
+        # Full loads happen once per process; refreshes query by timestamp
+        feedback.create_index("timestamp")
+    entries = []
+    for document in feedback.find({"timestamp": {"$gte": since}} if since else {}):
+        object_id = document.pop("_id")
+        # Inserted before feedback ids existed
+        document.setdefault("feedback_id", str(object_id))
+        entries.append(document)
+    return entries
+
+def unique_feedback(entries: Iterable[Dict[str, Any]], seen: Optional[Set[str]] = None) -> List[Dict[str, Any]]:
+    """Entries whose feedback_id is not in seen, first occurrence kept; their ids are added to seen"""
+    seen = set() if seen is None else seen
+    unique = []
+    for entry in entries:
+        if entry["feedback_id"] not in seen:
+            seen.add(entry["feedback_id"])
+            unique.append(entry)
+    return unique
+
 class FeedbackAnalyzer:
     """Analyze user feedback to improve the chatbot"""
     
     def __init__(self):
-        self.feedback_data = []
+        self.store = FeedbackStore()
+        self.feedback_ids: Set[str] = set()
+        self._lock = threading.RLock()
+        self._refreshed_at: Optional[float] = None
         self.load_feedback()
     
+    @property
+    def feedback_data(self) -> List[Dict[str, Any]]:
+        """All feedback entries, oldest first"""
+        return self.store.entries
+    
     def load_feedback(self):
-        """Load feedback data from file"""
+        """Load feedback from MongoDB, where the feedback queue writes it, and from
+        the snapshot file and the append-only log, which hold what MongoDB did not take"""
+        started = time.time()
+        entries = []
         try:
-            if os.path.exists("data/feedback.json"):
-                with open("data/feedback.json", "r") as f:
-                    self.feedback_data = json.load(f)
-                logger.info(f"Loaded {len(self.feedback_data)} feedback entries")
+            entries = read_feedback_files()
         except Exception as e:
             logger.error(f"Error loading feedback data: {e}")
+        database_entries = None
+        try:
+            database_entries = read_feedback_collection()
+        except Exception as e:
+            logger.error(f"Error loading feedback from MongoDB: {e}")
+        if database_entries is None:
+            logger.warning("MongoDB unavailable, feedback stats only include the feedback log until refreshed")
+        
+        feedback_ids = set()
+        store = FeedbackStore(unique_feedback(entries + (database_entries or []), feedback_ids))
+        with self._lock:
+            self.store, self.feedback_ids = store, feedback_ids
+            self._refreshed_at = started if database_entries is not None else None
+        logger.info(f"Loaded {len(store)} feedback entries")
+    
+    def refresh(self, min_interval: float = REFRESH_INTERVAL) -> int:
+        """Add feedback other processes wrote to MongoDB since the last read; returns how many
+        
+        Does nothing if the last read was less than min_interval seconds ago.
+        """
+        started = time.time()
+        refreshed_at = self._refreshed_at
+        if refreshed_at is not None and started - refreshed_at < min_interval:
+            return 0
+        since = None
+        if refreshed_at is not None:
+            since = datetime.fromtimestamp(refreshed_at - REFRESH_OVERLAP_SECONDS).isoformat()
+        try:
+            entries = read_feedback_collection(since)
+        except Exception as e:
+            logger.error(f"Error refreshing feedback from MongoDB: {e}")
+            return 0
+        if entries is None:
+            return 0
+        
+        added = self._add_entries(entries)
+        self._refreshed_at = started
+        return added
     
     def save_feedback(self):
-        """Save feedback data to file"""
+        """Compact the snapshot file and the log into a new snapshot and empty the log
+        
+        Only entries these files hold are written; feedback that was only observed
+        (e.g. from the feedback queue, which writes to MongoDB) stays where it is.
+        Under the log lock (shared with other worker processes) the log is moved
+        aside and replayed, so entries appended meanwhile are either in the
+        snapshot or in a fresh log, never in a truncated one.
+        """
         try:
             os.makedirs("data", exist_ok=True)
-            with open("data/feedback.json", "w") as f:
-                json.dump(self.feedback_data, f)
-            logger.info(f"Saved {len(self.feedback_data)} feedback entries")
+            with FEEDBACK_LOG_LOCK:
+                # Keep a log left aside by an interrupted compaction; both are replayed
+                if os.path.exists(FEEDBACK_LOG_PATH) and not os.path.exists(COMPACTING_LOG_PATH):
+                    os.replace(FEEDBACK_LOG_PATH, COMPACTING_LOG_PATH)
+                replayed = [path for path in (COMPACTING_LOG_PATH, FEEDBACK_LOG_PATH) if os.path.exists(path)]
+                
+                entries = unique_feedback(read_feedback_files())
+                temp_path = f"{FEEDBACK_SNAPSHOT_PATH}.{os.getpid()}-{uuid.uuid4().hex}.tmp"
+                try:
+                    with open(temp_path, "w") as f:
+                        json.dump(entries, f, default=str)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(temp_path, FEEDBACK_SNAPSHOT_PATH)
+                finally:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                for path in replayed:
+                    os.remove(path)
+            
+            # Entries another process logged are not in memory yet
+            self._add_entries(entries)
+            logger.info(f"Saved {len(entries)} feedback entries")
         except Exception as e:
             logger.error(f"Error saving feedback data: {e}")
     
+    def compact_if_needed(self, max_log_bytes: int = COMPACT_LOG_BYTES) -> bool:
+        """Compact the log once it is larger than max_log_bytes; True if it was compacted"""
+        try:
+            if os.path.getsize(FEEDBACK_LOG_PATH) <= max_log_bytes:
+                return False
+        except OSError:
+            # No log yet
+            return False
+        self.save_feedback()
+        return True
+    
     def add_feedback(self, feedback: Dict[str, Any]):
-        """Add a new feedback entry"""
+        """Add a new feedback entry (appended to the log, not a full rewrite)"""
+        self.observe_feedback(feedback)
+        try:
+            append_feedback_log([feedback])
+        except Exception as e:
+            logger.error(f"Error saving feedback data: {e}")
+    
+    def observe_feedback(self, feedback: Dict[str, Any]):
+        """Update the in-memory store and daily aggregates without persisting
+        (for feedback already persisted elsewhere, e.g. by the feedback queue)"""
         # Add timestamp if not present
         if "timestamp" not in feedback:
             feedback["timestamp"] = datetime.now().isoformat()
+        ensure_feedback_id(feedback)
         
-        self.feedback_data.append(feedback)
-        self.save_feedback()
+        self._add_entries([feedback])
+    
+    def _add_entries(self, entries: Iterable[Dict[str, Any]]) -> int:
+        """Add entries not seen yet (by feedback_id); returns how many were new"""
+        with self._lock:
+            new_entries = unique_feedback(entries, self.feedback_ids)
+            for entry in new_entries:
+                self.store.append(entry)
+        return len(new_entries)
+    
+    def get_stats(self, days: int = 30) -> Dict[str, Any]:
+        """Rating averages, distribution and daily trend, answered from the daily buckets"""
+        moving_avg = self.store.buckets.moving_average(7)
+        first_day = date.today().toordinal() - days + 1
+        return {
+            "total_feedback": len(self.store),
+            "average_rating": {
+                "all": round(self.get_average_rating(), 2),
+                "day": round(self.get_average_rating("day"), 2),
+                "week": round(self.get_average_rating("week"), 2),
+                "month": round(self.get_average_rating("month"), 2)
+            },
+            "rating_distribution": self.store.rating_counts(),
+            "daily": self.store.daily_stats(days),
+            "moving_average_7d": [
+                {"date": date.fromordinal(day).isoformat(), "average": round(average, 2)}
+                for day, average in moving_avg if day >= first_day
+            ]
+        }
     
     def get_average_rating(self, time_period: Optional[str] = None) -> float:
         """Get average rating, optionally filtered by time period"""
-        if not self.feedback_data:
+        if not len(self.store):
             return 0.0
         
-        # Filter by time period if specified
-        filtered_data = self.feedback_data
-        if time_period:
-            now = datetime.now()
-            filtered_data = []
-            
-            for entry in self.feedback_data:
-                try:
-                    timestamp = datetime.fromisoformat(entry.get("timestamp", ""))
-                    
-                    if time_period == "day" and (now - timestamp).days <= 1:
-                        filtered_data.append(entry)
-                    elif time_period == "week" and (now - timestamp).days <= 7:
-                        filtered_data.append(entry)
-                    elif time_period == "month" and (now - timestamp).days <= 30:
-                        filtered_data.append(entry)
-                except:
-                    continue
+        if not time_period:
+            return self.store.average_rating()
         
-        # Calculate average rating
-        ratings = [entry.get("rating", 0) for entry in filtered_data if "rating" in entry]
-        if not ratings:
+        days = PERIOD_DAYS.get(time_period)
+        if days is None:
             return 0.0
-        
-        return sum(ratings) / len(ratings)
+        # Entries whose age in whole days is at most `days`
+        return self.store.average_rating(since=seconds_ago(days + 1))
     
     def get_common_issues(self, n: int = 5) -> List[str]:
         """Extract common issues from feedback messages"""
@@ -128,11 +313,7 @@ class FeedbackAnalyzer:
         avg_rating_month = self.get_average_rating("month")
         
         # Count ratings
-        rating_counts = defaultdict(int)
-        for entry in self.feedback_data:
-            rating = entry.get("rating")
-            if rating is not None:
-                rating_counts[rating] += 1
+        rating_counts = self.store.rating_counts()
         
         # Extract common issues
         common_issues = self.get_common_issues(10)
@@ -215,11 +396,7 @@ class FeedbackAnalyzer:
         """
         
         # Add recent feedback entries
-        recent_entries = sorted(
-            self.feedback_data, 
-            key=lambda x: x.get("timestamp", ""), 
-            reverse=True
-        )[:20]
+        recent_entries = self.store.recent(20)
         
         for entry in recent_entries:
             timestamp = entry.get("timestamp", "")
@@ -259,11 +436,7 @@ class FeedbackAnalyzer:
             plt.figure(figsize=(8, 6))
             
             # Count ratings
-            rating_counts = defaultdict(int)
-            for entry in self.feedback_data:
-                rating = entry.get("rating")
-                if rating is not None:
-                    rating_counts[rating] += 1
+            rating_counts = self.store.rating_counts()
             
             # Create bar chart
             ratings = sorted(rating_counts.keys())
@@ -287,46 +460,31 @@ class FeedbackAnalyzer:
         try:
             plt.figure(figsize=(10, 6))
             
-            # Extract timestamps and ratings
-            data = []
-            for entry in self.feedback_data:
-                timestamp = entry.get("timestamp")
-                rating = entry.get("rating")
-                
-                if timestamp and rating is not None:
-                    try:
-                        date = datetime.fromisoformat(timestamp)
-                        data.append((date, rating))
-                    except:
-                        continue
-            
-            # Sort by date
-            data.sort(key=lambda x: x[0])
+            # Timestamps and ratings, already in time order (unreadable timestamps are 0)
+            timestamps = self.store.timestamp_column()
+            rating_column = self.store.rating_column()
+            keep = (timestamps > 0) & ~np.isnan(rating_column)
             
-            if not data:
+            if not keep.any():
                 logger.warning("No data available for rating trend plot")
                 return
             
-            dates = [d[0] for d in data]
-            ratings = [d[1] for d in data]
+            dates = [datetime.fromtimestamp(t) for t in timestamps[keep]]
+            ratings = rating_column[keep].tolist()
             
-            # Calculate 7-day moving average
-            window_size = min(7, len(ratings))
-            moving_avg = []
-            
-            for i in range(len(ratings)):
-                if i < window_size - 1:
-                    # Not enough data for full window
-                    window = ratings[:i+1]
-                else:
-                    # Full window
-                    window = ratings[i-window_size+1:i+1]
-                
-                moving_avg.append(sum(window) / len(window))
+            # 7-day moving average of the daily buckets (skipping unreadable timestamps)
+            window_size = 7
+            unknown_day = day_of(0.0)
+            moving_avg = [
+                (datetime.combine(date.fromordinal(day), datetime.min.time()), average)
+                for day, average in self.store.buckets.moving_average(window_size)
+                if day != unknown_day
+            ]
             
             # Plot individual ratings and moving average
             plt.scatter(dates, ratings, alpha=0.5, color='#3498db', label='Individual Ratings')
-            plt.plot(dates, moving_avg, color='#e74c3c', linewidth=2, label=f'{window_size}-day Moving Average')
+            plt.plot([d for d, _ in moving_avg], [a for _, a in moving_avg], color='#e74c3c', linewidth=2,
+                     label=f'{window_size}-day Moving Average')
             
             plt.xlabel('Date')
             plt.ylabel('Rating')
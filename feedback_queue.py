@@ -0,0 +1,260 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Dict, List, Any, Optional, Callable
+
+from pymongo.errors import BulkWriteError
+
+try:
+    import fcntl
+except ImportError:
+    # Windows locks a byte range of the lock file instead
+    fcntl = None
+    import msvcrt
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Append-only feedback log, read by FeedbackAnalyzer
+FEEDBACK_LOG_PATH = os.path.join("data", "feedback.jsonl")
+
+class FeedbackLogLock:
+    """Exclusive lock on the feedback log, across threads and worker processes
+
+    A thread lock serializes this process's threads; an OS lock on a separate
+    lock file (the log itself is renamed during compaction) serializes processes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._file = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "a+")
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            else:
+                self._file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        # LK_LOCK gives up after about 10 seconds; keep waiting
+                        pass
+        except Exception:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
+            self._thread_lock.release()
+
+# Held while appending to the log and while FeedbackAnalyzer compacts it
+FEEDBACK_LOG_LOCK = FeedbackLogLock(os.path.join("data", "feedback.lock"))
+
+def ensure_feedback_id(entry: Dict[str, Any]) -> str:
+    """Give an entry a unique feedback_id (kept if it has one); the id entries are deduplicated on"""
+    if "feedback_id" not in entry:
+        entry["feedback_id"] = uuid.uuid4().hex
+    return entry["feedback_id"]
+
+def append_feedback_log(entries: List[Dict[str, Any]], path: str = FEEDBACK_LOG_PATH):
+    """Append feedback entries as JSON lines and fsync them"""
+    for entry in entries:
+        ensure_feedback_id(entry)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with FEEDBACK_LOG_LOCK:
+        with open(path, "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+class FeedbackQueue:
+    """Buffers feedback in memory and writes it in batches
+
+    Batches go to MongoDB with insert_many; if MongoDB is unavailable they are
+    appended to the JSONL log instead, so nothing buffered is lost on shutdown.
+    Flush listeners run after every flush cycle of the background flusher.
+    """
+
+    def __init__(self, flush_size: int = 100, flush_interval: float = 2.0, max_pending: int = 10000,
+                 log_path: str = FEEDBACK_LOG_PATH):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.log_path = log_path
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task = None
+        self._flush_listeners: List[Callable[[], None]] = []
+
+        # Metrics
+        self.accepted = 0
+        self.rejected = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.flush_failures = 0
+        self.high_water_mark = 0
+        self.last_flush_at: Optional[float] = None
+
+    def add_flush_listener(self, listener: Callable[[], None]):
+        """Run a callback (on a worker thread) after every background flush cycle"""
+        if listener not in self._flush_listeners:
+            self._flush_listeners.append(listener)
+
+    def put(self, entry: Dict[str, Any]) -> bool:
+        """Buffer one entry, giving it a feedback_id; False if the buffer is full (backpressure)"""
+        ensure_feedback_id(entry)
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self.rejected += 1
+                return False
+            self._pending.append(entry)
+            self.accepted += 1
+            self.high_water_mark = max(self.high_water_mark, len(self._pending))
+            full = len(self._pending) >= self.flush_size
+
+        if full and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def flush(self) -> int:
+        """Write everything buffered so far; returns the number of entries written"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+
+            try:
+                self._write(batch)
+            except Exception as e:
+                # Put the batch back in front so the next flush retries it
+                logger.error(f"Error flushing {len(batch)} feedback entries: {e}")
+                self.flush_failures += 1
+                with self._lock:
+                    self._pending = batch + self._pending
+                return 0
+
+            self.flushed += len(batch)
+            self.flushes += 1
+            self.last_flush_at = time.time()
+            return len(batch)
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        """insert_many into MongoDB, falling back to the append-only log"""
+        from db_connection import recipe_database
+
+        db = recipe_database.get_database()
+        if db is not None:
+            try:
+                # insert_many adds _id to the dicts; keep the caller's entries clean
+                db["feedback"].insert_many([dict(entry) for entry in batch], ordered=False)
+                return
+            except BulkWriteError as e:
+                # Unordered: everything but the failed documents was inserted
+                failed = sorted({error["index"] for error in e.details.get("writeErrors", [])})
+                logger.warning(f"{len(failed)} of {len(batch)} feedback inserts failed, appending them to {self.log_path}")
+                batch = [batch[index] for index in failed]
+                if not batch:
+                    return
+            except Exception as e:
+                logger.warning(f"Feedback insert_many failed, appending to {self.log_path}: {e}")
+        append_feedback_log(batch, self.log_path)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await loop.run_in_executor(None, self._flush_cycle)
+
+    def _flush_cycle(self):
+        self.flush()
+        for listener in self._flush_listeners:
+            try:
+                listener()
+            except Exception as e:
+                logger.error(f"Error in feedback flush listener {listener}: {e}")
+
+    def start(self):
+        """Start the background flusher (call from an application startup hook)"""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and durably write whatever is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+        await asyncio.get_running_loop().run_in_executor(None, self.flush)
+
+        # Anything MongoDB still refuses goes to the log rather than being dropped
+        with self._lock:
+            remaining, self._pending = self._pending, []
+        if remaining:
+            append_feedback_log(remaining, self.log_path)
+            self.flushed += len(remaining)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and throughput metrics"""
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "max_pending": self.max_pending,
+            # Backpressure: how full the buffer is; writes are rejected at 1.0
+            "utilization": round(pending / self.max_pending, 3) if self.max_pending else 0.0,
+            "high_water_mark": self.high_water_mark,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "flush_failures": self.flush_failures,
+            "last_flush_at": self.last_flush_at
+        }
+
+# Create the shared feedback queue
+feedback_queue = FeedbackQueue(
+    flush_size=int(os.environ.get("FEEDBACK_FLUSH_SIZE", "100")),
+    flush_interval=float(os.environ.get("FEEDBACK_FLUSH_INTERVAL", "2")),
+    max_pending=int(os.environ.get("FEEDBACK_MAX_PENDING", "10000"))
+)
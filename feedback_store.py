@@ -0,0 +1,196 @@
+import logging
+import math
+import time
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from datetime import date, datetime
+from typing import Dict, List, Any, Optional, Iterable, Tuple
+
+import numpy as np
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def parse_timestamp(value: Any) -> float:
+    """Epoch seconds for an ISO timestamp; 0.0 (oldest) if missing or unreadable"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+def parse_rating(value: Any) -> float:
+    """Numeric rating, NaN when absent"""
+    try:
+        return float(value) if value is not None else math.nan
+    except (TypeError, ValueError):
+        return math.nan
+
+def day_of(timestamp: float) -> int:
+    """Local calendar day (date ordinal) of an epoch timestamp"""
+    return datetime.fromtimestamp(timestamp).date().toordinal()
+
+def day_start(day: int) -> float:
+    """Epoch timestamp of local midnight at the start of a day ordinal"""
+    return datetime.combine(date.fromordinal(day), datetime.min.time()).timestamp()
+
+class DailyRatingBuckets:
+    """Per-day rating count, sum and histogram, updated incrementally"""
+
+    def __init__(self):
+        self.days: List[int] = []
+        self.counts: Dict[int, int] = {}
+        self.sums: Dict[int, float] = {}
+        self.histograms: Dict[int, Counter] = {}
+
+    def add(self, timestamp: float, rating: float):
+        """Count one rating (NaN ratings are not counted)"""
+        if math.isnan(rating):
+            return
+        day = day_of(timestamp)
+        if day not in self.counts:
+            insort(self.days, day)
+            self.counts[day] = 0
+            self.sums[day] = 0.0
+            self.histograms[day] = Counter()
+        self.counts[day] += 1
+        self.sums[day] += rating
+        self.histograms[day][rating] += 1
+
+    def days_from(self, first_day: int) -> List[int]:
+        """Days with ratings on or after first_day"""
+        return self.days[bisect_left(self.days, first_day):]
+
+    def totals(self, first_day: Optional[int] = None) -> Tuple[int, float]:
+        """(count, sum) of ratings on or after first_day"""
+        days = self.days if first_day is None else self.days_from(first_day)
+        return sum(self.counts[d] for d in days), sum(self.sums[d] for d in days)
+
+    def histogram(self) -> Counter:
+        """Ratings per value across all days"""
+        total = Counter()
+        for histogram in self.histograms.values():
+            total.update(histogram)
+        return total
+
+    def moving_average(self, window_days: int = 7) -> List[Tuple[int, float]]:
+        """(day, average over the window_days calendar days ending that day) for each rated day"""
+        series = []
+        start = 0
+        count, total = 0, 0.0
+        for day in self.days:
+            count += self.counts[day]
+            total += self.sums[day]
+            while self.days[start] <= day - window_days:
+                count -= self.counts[self.days[start]]
+                total -= self.sums[self.days[start]]
+                start += 1
+            series.append((day, total / count))
+        return series
+
+class FeedbackStore:
+    """Feedback kept column-wise, sorted by time
+
+    Ratings and epoch timestamps live in typed arrays; the full entries (messages
+    and other fields) are kept alongside in the same order. Time windows are
+    found by bisecting the timestamp column.
+    """
+
+    def __init__(self, entries: Optional[Iterable[Dict[str, Any]]] = None):
+        self.timestamps = array("d")
+        self.ratings = array("d")
+        self.entries: List[Dict[str, Any]] = []
+        self.buckets = DailyRatingBuckets()
+        if entries:
+            self.extend(entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def append(self, entry: Dict[str, Any]):
+        """Add one entry; O(1) when it is the newest (the usual case)"""
+        timestamp = parse_timestamp(entry.get("timestamp"))
+        position = len(self.timestamps)
+        if position and timestamp < self.timestamps[-1]:
+            position = bisect_right(self.timestamps, timestamp)
+        rating = parse_rating(entry.get("rating"))
+        self.timestamps.insert(position, timestamp)
+        self.ratings.insert(position, rating)
+        self.entries.insert(position, entry)
+        self.buckets.add(timestamp, rating)
+
+    def extend(self, entries: Iterable[Dict[str, Any]]):
+        """Add many entries, sorting once"""
+        rows = [(parse_timestamp(e.get("timestamp")), parse_rating(e.get("rating")), e) for e in entries]
+        for timestamp, rating, _ in rows:
+            self.buckets.add(timestamp, rating)
+        rows.extend(zip(self.timestamps, self.ratings, self.entries))
+        rows.sort(key=lambda row: row[0])
+        self.timestamps = array("d", (row[0] for row in rows))
+        self.ratings = array("d", (row[1] for row in rows))
+        self.entries = [row[2] for row in rows]
+
+    def window(self, since: Optional[float] = None, until: Optional[float] = None) -> Tuple[int, int]:
+        """Index range of entries with since < timestamp <= until (open-ended if None)"""
+        lo = bisect_right(self.timestamps, since) if since is not None else 0
+        hi = bisect_right(self.timestamps, until) if until is not None else len(self.timestamps)
+        return lo, max(lo, hi)
+
+    def rating_column(self, lo: int = 0, hi: Optional[int] = None) -> np.ndarray:
+        """Ratings in an index range as a NumPy array (NaN = no rating); a copy"""
+        return np.array(self.ratings[lo:hi], dtype=np.float64)
+
+    def timestamp_column(self, lo: int = 0, hi: Optional[int] = None) -> np.ndarray:
+        """Epoch timestamps in an index range as a NumPy array; a copy"""
+        return np.array(self.timestamps[lo:hi], dtype=np.float64)
+
+    def average_rating(self, since: Optional[float] = None) -> float:
+        """Mean rating of entries newer than since (0.0 if none)
+
+        Whole days come from the daily buckets; only the part of the first day
+        after `since` is read from the rating column.
+        """
+        if since is None:
+            count, total = self.buckets.totals()
+        else:
+            next_day = day_of(since) + 1
+            lo = bisect_right(self.timestamps, since)
+            hi = max(lo, bisect_left(self.timestamps, day_start(next_day)))
+            partial = self.rating_column(lo, hi)
+            partial = partial[~np.isnan(partial)]
+            count, total = self.buckets.totals(next_day)
+            count += len(partial)
+            total += float(partial.sum())
+        return total / count if count else 0.0
+
+    def rating_counts(self) -> Dict[float, int]:
+        """Number of entries per rating value"""
+        histogram = self.buckets.histogram()
+        return {_plain(value): histogram[value] for value in sorted(histogram)}
+
+    def daily_stats(self, days: int = 30) -> List[Dict[str, Any]]:
+        """Count and average rating for each rated day in the last `days` days"""
+        first_day = date.today().toordinal() - days + 1
+        return [
+            {
+                "date": date.fromordinal(day).isoformat(),
+                "count": self.buckets.counts[day],
+                "average": round(self.buckets.sums[day] / self.buckets.counts[day], 2)
+            }
+            for day in self.buckets.days_from(first_day)
+        ]
+
+    def recent(self, n: int) -> List[Dict[str, Any]]:
+        """The n newest entries, newest first"""
+        return self.entries[:-n - 1:-1] if n > 0 else []
+
+def _plain(value: float):
+    """Render whole-number ratings as ints (4.0 -> 4)"""
+    return int(value) if float(value).is_integer() else float(value)
+
+def seconds_ago(days: float) -> float:
+    """Epoch timestamp `days` before now"""
+    return time.time() - days * 86400
@@ -4,6 +4,13 @@ import os
 import logging
 import re
 from typing import List, Dict, Any, Set
+from recipe_index import tokenize
+from query_compiler import normalize_cuisine
+from search_cache import notify_recipes_reloaded
+from db_connection import bootstrap_indexes, record_import
+from preference_filter import recipe_total_minutes
+from nutritional_analysis import analyze_recipe_nutrition, NUTRIENT_FIELDS
+from recipe_complexity import complexity_analyzer
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -217,6 +224,31 @@ def split_instruction_into_steps(instruction: str) -> List[str]:
     
     return steps
 
+def derive_numeric_fields(recipe: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Derive typed numeric fields so queries can filter and sort without reparsing text.
+    
+    Args:
+        recipe: Recipe record with parsed ingredients and instructions
+        
+    Returns:
+        Dict with total_minutes, per-serving calories/protein/carbs/fat and
+        complexity_score; fields that cannot be derived are left out
+    """
+    fields = {}
+    
+    minutes = recipe_total_minutes(recipe)
+    if minutes is not None:
+        fields["total_minutes"] = minutes
+    
+    per_serving = analyze_recipe_nutrition(recipe).get("per_serving", {})
+    for nutrient in NUTRIENT_FIELDS:
+        if nutrient in per_serving:
+            fields[nutrient] = per_serving[nutrient]
+    
+    fields["complexity_score"] = complexity_analyzer.analyze_recipe(recipe)["score"]
+    return fields
+
 def main() -> None:
     """Main function to import recipes into MongoDB."""
     try:
@@ -263,6 +295,20 @@ def main() -> None:
         logger.info("Classifying recipes by diet types")
         df["diet"] = df["ingredients"].apply(classify_diet)
         
+        # Add lowercase normalized fields for exact, index-friendly matching
+        logger.info("Creating normalized search fields")
+        if "Cuisine" in df.columns:
+            df["cuisine_normalized"] = df["Cuisine"].apply(normalize_cuisine)
+        if "cleaned_ingredients" in df.columns:
+            df["ingredient_tokens"] = df["cleaned_ingredients"].apply(
+                lambda ingredients: sorted(set(tokenize(ingredients)))
+            )
+        text_columns = [c for c in ("RecipeName", "Description") if c in df.columns]
+        if text_columns:
+            df["search_tokens"] = df[text_columns].apply(
+                lambda row: sorted(set(tokenize([v for v in row if isinstance(v, str)]))), axis=1
+            )
+        
         # Rename fields to use consistent naming convention
         logger.info("Standardizing field names")
         rename_map = {
@@ -280,6 +326,11 @@ def main() -> None:
         logger.info("Converting data to MongoDB format")
         data = df.to_dict(orient="records")
         
+        # Typed numeric fields, indexed for range filters and sorts
+        logger.info("Deriving numeric fields (time, nutrition, complexity)")
+        for recipe in data:
+            recipe.update(derive_numeric_fields(recipe))
+        
         # Drop existing collection to avoid duplicates
         logger.info("Dropping existing collection")
         collection.drop()
@@ -290,12 +341,14 @@ def main() -> None:
             # MongoDB will automatically create _id field
             collection.insert_many(data)
             
-            # Create indexes for better query performance
+            # Create indexes for better query performance (the drop removed them)
             logger.info("Creating indexes")
-            collection.create_index([("Cuisine", 1)])
-            collection.create_index([("diet", 1)])
-            collection.create_index([("RecipeName", 1)])
-            collection.create_index([("cleaned_ingredients", 1)])
+            bootstrap_indexes(collection, force=True)
+            
+            # Cached search results and indexes now describe stale data; serving
+            # processes notice the new generation stamp and rebuild theirs
+            record_import(collection)
+            notify_recipes_reloaded()
             
             logger.info("✅ Recipes successfully imported into MongoDB!")
         else:
@@ -1,9 +1,14 @@
-from fastapi import FastAPI, HTTPException, Query
-from pymongo import MongoClient
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
+from db_connection import recipe_database
+from pagination import InvalidCursor, cached_count, fetch_page
+from facet_service import facet_service
+from schema_capabilities import schema_capabilities
 import json
 import math
 import os
 import logging
+from email.utils import parsedate_to_datetime
 from typing import Optional, List
 from rasa_sdk.executor import ActionExecutor
 
@@ -24,20 +29,8 @@ app = FastAPI(
     redoc_url="/redoc"  # Explicitly enable ReDoc
 )
 
-# Connect to MongoDB using environment variable or default to localhost
-mongo_uri = os.environ.get("MONGO_URI", "mongodb://localhost:27017/")
-client = MongoClient(mongo_uri)
-db = client["recipeDB"]
-collection = db["recipes"]
-
-# Ensure indexes exist
-collection.create_index([("Cuisine", 1)])
-collection.create_index([("diet", 1)])
-collection.create_index([("RecipeName", 1)])
-# Add text index for search functionality
-collection.create_index([("RecipeName", "text"), ("ingredients", "text")])
-
-logger.info("Indexes created on Cuisine, diet, RecipeName, and text search fields.")
+# MongoDB is connected lazily on first request, and indexes are created once
+# per schema version (see db_connection.RecipeDatabase)
 
 # Create an executor
 executor = ActionExecutor()
@@ -50,6 +43,45 @@ executor.register_action(ActionClearPreferences())
 if __name__ == "__main__":
     executor.run(port=5055)
 
+def get_recipe_collection():
+    """Return the recipe collection, raising 503 if MongoDB is unreachable"""
+    collection = recipe_database.get_collection()
+    if collection is None:
+        raise HTTPException(status_code=503, detail="Database connection failed")
+    return collection
+
+def get_page(collection, query, page, limit, cursor, include_total, projection=None, sort=None):
+    """Fetch a page of recipes with its pagination metadata
+
+    A cursor continues from the previous page's next_cursor; page numbers are
+    still accepted for the first request (and only reported for it, since a
+    cursor page has no page number). The total is optional and cached.
+    """
+    metadata = {"limit": limit} if cursor else {"page": page, "limit": limit}
+    if include_total:
+        total_recipes = cached_count(collection, query)
+        total_pages = math.ceil(total_recipes / limit) if total_recipes > 0 else 0
+        # Validate page number against total pages
+        if not cursor and total_recipes > 0 and page > total_pages:
+            raise HTTPException(status_code=400, detail=f"Page number exceeds total pages ({total_pages})")
+        metadata.update(total_recipes=total_recipes, total_pages=total_pages)
+
+    try:
+        recipes, next_cursor = fetch_page(
+            collection, query, limit, cursor=cursor, projection=projection, sort=sort,
+            skip=(page - 1) * limit
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    logger.info(f"MongoDB Query: {query}, Returned: {len(recipes)}, Has Next: {next_cursor is not None}")
+    metadata.update(
+        has_next=next_cursor is not None,
+        has_previous=page > 1 or cursor is not None,
+        next_cursor=next_cursor
+    )
+    return recipes, metadata
+
 @app.get("/recipes", 
          summary="Get recipes with pagination and filters",
          description="Retrieve recipes with optional filtering by cuisine and diet types")
@@ -58,10 +90,13 @@ def get_recipes(
     limit: int = Query(10, ge=1, le=50, description="Number of recipes per page"),
     cuisine: Optional[str] = Query(None, description="Filter by cuisine type"),
     diet: Optional[str] = Query(None, description="Comma-separated list of diet filters (vegetarian, non-vegetarian, vegan, gluten-free, dairy-free, low-fodmap)"),
-    diet_mode: str = Query("and", regex="^(and|or)$", description="Filter mode: 'and' (default) requires all diets, 'or' allows any")
+    diet_mode: str = Query("and", regex="^(and|or)$", description="Filter mode: 'and' (default) requires all diets, 'or' allows any"),
+    q: Optional[str] = Query(None, description="Free-text keyword search over recipe names, descriptions and ingredients; relevance-ranked pages are offset-based and stop after the first MAX_SORTED_OFFSET (default 500) results"),
+    cursor: Optional[str] = Query(None, description="Continuation token from a previous response's next_cursor"),
+    include_total: bool = Query(True, description="Include total_recipes/total_pages (cached count)")
 ):
     try:
-        logger.info(f"Fetching recipes - Page: {page}, Limit: {limit}, Cuisine: {cuisine}, Diet: {diet}, Diet Mode: {diet_mode}")
+        logger.info(f"Fetching recipes - Page: {page}, Cursor: {cursor}, Limit: {limit}, Cuisine: {cuisine}, Diet: {diet}, Diet Mode: {diet_mode}, Q: {q}")
 
         # Validate input parameters
         if cuisine and not cuisine.strip():
@@ -69,7 +104,7 @@ def get_recipes(
         if diet and not diet.strip():
             raise HTTPException(status_code=400, detail="Diet parameter cannot be empty")
 
-        skip = (page - 1) * limit
+        collection = get_recipe_collection()
         query = {}
 
         # Use broader regex match for cuisine
@@ -85,16 +120,15 @@ def get_recipes(
                 else:
                     query["diet"] = {"$in": diet_filters}   # Recipe must have AT LEAST ONE diet
 
-        total_recipes = collection.count_documents(query)
-        total_pages = math.ceil(total_recipes / limit) if total_recipes > 0 else 0
-        
-        logger.info(f"MongoDB Query: {query}, Total Recipes: {total_recipes}, Total Pages: {total_pages}")
+        # Keyword search uses the text index and ranks by relevance
+        projection = None
+        sort = None
+        if q and q.strip():
+            query["$text"] = {"$search": q.strip()}
+            projection = {"score": {"$meta": "textScore"}}
+            sort = [("score", {"$meta": "textScore"})]
 
-        # Validate page number against total pages
-        if total_recipes > 0 and page > total_pages:
-            raise HTTPException(status_code=400, detail=f"Page number exceeds total pages ({total_pages})")
-
-        recipes = list(collection.find(query, {"_id": 0}).skip(skip).limit(limit))
+        recipes, metadata = get_page(collection, query, page, limit, cursor, include_total, projection, sort)
 
         formatted_recipes = []
         for recipe in recipes:
@@ -113,16 +147,11 @@ def get_recipes(
             raise HTTPException(status_code=404, detail="No recipes found.")
 
         return {
-            "metadata": {
-                "page": page,
-                "limit": limit,
-                "total_recipes": total_recipes,
-                "total_pages": total_pages,
-                "has_next": page * limit < total_recipes,
-                "has_previous": page > 1,
-            },
+            "metadata": metadata,
             "recipes": formatted_recipes,
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in get_recipes: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Internal server error occurred")
@@ -137,32 +166,70 @@ def home():
 def health_check():
     try:
         # Check if database is connected
-        client.admin.command('ping')
+        get_recipe_collection().database.client.admin.command('ping')
         return {"status": "healthy", "database": "connected"}
     except Exception as e:
         logger.error(f"Health check failed: {str(e)}")
         raise HTTPException(status_code=503, detail="Database connection failed")
 
 
-@app.get("/cuisines", summary="Get available cuisines", description="Returns a list of all available cuisines")
-def get_cuisines():
+def not_modified(request: Request, entry) -> bool:
+    """Whether the client's cached copy of the facets is still current"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or entry["etag"] in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(entry["last_modified"]) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def facet_response(request: Request, entry, payload):
+    """Serve facets with ETag/Last-Modified validators, or 304 if unchanged"""
+    headers = {"ETag": entry["etag"], "Last-Modified": entry["last_modified"], "Cache-Control": "no-cache"}
+    if not_modified(request, entry):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload, headers=headers)
+
+
+@app.get("/cuisines", summary="Get available cuisines", description="Returns a list of all available cuisines with recipe counts")
+def get_cuisines(
+    request: Request,
+    diet: Optional[str] = Query(None, description="Only count recipes with these comma-separated diets")
+):
     try:
-        cuisines = collection.distinct("Cuisine")
-        # Filter out None values and empty strings
-        cuisines = [c for c in cuisines if c]
-        return {"cuisines": sorted(cuisines)}
+        entry = facet_service.get_facets(get_recipe_collection(), diet=diet)
+        cuisines = entry["facets"]["cuisines"]
+        return facet_response(request, entry, {
+            "cuisines": [c["value"] for c in cuisines],
+            "counts": {c["value"]: c["count"] for c in cuisines}
+        })
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching cuisines: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch cuisines")
 
 
-@app.get("/diets", summary="Get available diets", description="Returns a list of all available diet types")
-def get_diets():
+@app.get("/diets", summary="Get available diets", description="Returns a list of all available diet types with recipe counts")
+def get_diets(
+    request: Request,
+    cuisine: Optional[str] = Query(None, description="Only count recipes of this cuisine")
+):
     try:
-        diets = collection.distinct("diet")
-        # Filter out None values and empty strings
-        diets = [d for d in diets if d]
-        return {"diets": sorted(diets)}
+        entry = facet_service.get_facets(get_recipe_collection(), cuisine=cuisine)
+        diets = entry["facets"]["diets"]
+        return facet_response(request, entry, {
+            "diets": [d["value"] for d in diets],
+            "counts": {d["value"]: d["count"] for d in diets}
+        })
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching diets: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch diets")
@@ -176,11 +243,14 @@ def get_filtered_recipes(
     diet_mode: str = Query("and", regex="^(and|or)$", description="Filter mode: 'and' (default) requires all diets, 'or' allows any"),
     exclude_ingredients: Optional[List[str]] = Query(None, description="List of ingredients to exclude"),
     page: int = Query(1, ge=1, description="Page number"),
-    limit: int = Query(10, ge=1, le=50, description="Number of recipes per page")
+    limit: int = Query(10, ge=1, le=50, description="Number of recipes per page"),
+    cursor: Optional[str] = Query(None, description="Continuation token from a previous response's next_cursor"),
+    include_total: bool = Query(True, description="Include total_recipes/total_pages (cached count)")
 ):
     try:
-        logger.info(f"Filtering recipes - Diet: {diet}, Mode: {diet_mode}, Exclude: {exclude_ingredients}, Page: {page}, Limit: {limit}")
+        logger.info(f"Filtering recipes - Diet: {diet}, Mode: {diet_mode}, Exclude: {exclude_ingredients}, Page: {page}, Cursor: {cursor}, Limit: {limit}")
         
+        collection = get_recipe_collection()
         query = {}
 
         # Handle diet filtering with AND/OR logic
@@ -197,7 +267,7 @@ def get_filtered_recipes(
             exclude_ingredients = [i.strip().lower() for i in exclude_ingredients if i.strip()]
             if exclude_ingredients:
                 # Use cleaned_ingredients for more accurate exclusion if available
-                if collection.find_one({"cleaned_ingredients": {"$exists": True}}):
+                if schema_capabilities.ensure(collection).has("cleaned_ingredients"):
                     query["cleaned_ingredients"] = {"$nin": exclude_ingredients}
                 else:
                     # Fall back to ingredients field
@@ -209,12 +279,7 @@ def get_filtered_recipes(
                         query["$and"] = exclude_conditions
 
         # Pagination logic
-        total_recipes = collection.count_documents(query)
-        total_pages = (total_recipes // limit) + (1 if total_recipes % limit else 0)
-        
-        logger.info(f"MongoDB Query: {query}, Total Recipes: {total_recipes}, Total Pages: {total_pages}")
-        
-        recipes = list(collection.find(query, {"_id": 0}).skip((page - 1) * limit).limit(limit))
+        recipes, metadata = get_page(collection, query, page, limit, cursor, include_total)
 
         formatted_recipes = [
             {
@@ -234,17 +299,12 @@ def get_filtered_recipes(
             raise HTTPException(status_code=404, detail="No recipes found.")
 
         return {
-            "metadata": {
-                "page": page,
-                "limit": limit,
-                "total_recipes": total_recipes,
-                "total_pages": total_pages,
-                "has_next": page * limit < total_recipes,
-                "has_previous": page > 1,
-            },
+            "metadata": metadata,
             "recipes": formatted_recipes,
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in get_filtered_recipes: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Internal server error occurred")
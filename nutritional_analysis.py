@@ -45,6 +45,9 @@ NUTRITIONAL_PATTERNS = {
     ]
 }
 
+# Per-serving nutrients stored on each recipe by import_recipes
+NUTRIENT_FIELDS = ["calories", "protein", "carbs", "fat"]
+
 def extract_nutritional_requirements(text: str) -> Dict[str, Any]:
     """Extract nutritional requirements from text"""
     requirements = {}
@@ -164,18 +167,36 @@ def analyze_recipe_nutrition(recipe: Dict[str, Any]) -> Dict[str, Any]:
     
     return nutrition
 
+def recipe_nutrition_per_serving(recipe: Dict[str, Any]) -> Dict[str, float]:
+    """Per-serving nutrients, read from the imported fields when present"""
+    if all(isinstance(recipe.get(nutrient), (int, float)) for nutrient in NUTRIENT_FIELDS):
+        return {nutrient: recipe[nutrient] for nutrient in NUTRIENT_FIELDS}
+    return analyze_recipe_nutrition(recipe).get("per_serving", {})
+
+def nutrition_range_query(requirements: Dict[str, Any]) -> Dict[str, Any]:
+    """Translate nutritional requirements into MongoDB range clauses on the imported fields"""
+    query = {}
+    for nutrient, req in requirements.items():
+        if nutrient not in NUTRIENT_FIELDS:
+            continue
+        bounds = {}
+        if "min" in req:
+            bounds["$gte"] = req["min"]
+        if "max" in req:
+            bounds["$lte"] = req["max"]
+        if bounds:
+            query[nutrient] = bounds
+    return query
+
 def meets_nutritional_requirements(recipe: Dict[str, Any], requirements: Dict[str, Any]) -> bool:
     """Check if recipe meets nutritional requirements"""
     if not requirements:
         return True
     
-    # Analyze recipe nutrition
-    nutrition = analyze_recipe_nutrition(recipe)
-    if not nutrition:
-        return True  # If we can't analyze, give benefit of the doubt
-    
     # Use per-serving values
-    per_serving = nutrition.get("per_serving", {})
+    per_serving = recipe_nutrition_per_serving(recipe)
+    if not per_serving:
+        return True  # If we can't analyze, give benefit of the doubt
     
     # Check each requirement
     for nutrient, req in requirements.items():
@@ -0,0 +1,88 @@
+import base64
+import logging
+import os
+from typing import Dict, List, Any, Optional, Tuple
+
+from bson import json_util
+
+from search_cache import SearchCache, register_reload_listener
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class InvalidCursor(ValueError):
+    """A continuation token that could not be decoded"""
+
+def encode_cursor(position: Dict[str, Any]) -> str:
+    """Encode a position in a result set as an opaque, URL-safe token"""
+    return base64.urlsafe_b64encode(json_util.dumps(position).encode()).decode().rstrip("=")
+
+def decode_cursor(token: str) -> Dict[str, Any]:
+    """Decode a token produced by encode_cursor"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        position = json_util.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except Exception as e:
+        raise InvalidCursor(f"Invalid cursor: {token}") from e
+    if not isinstance(position, dict):
+        raise InvalidCursor(f"Invalid cursor: {token}")
+    return position
+
+# Totals are optional and reused across pages of the same query
+count_cache = SearchCache(
+    max_size=int(os.environ.get("COUNT_CACHE_SIZE", "128")),
+    ttl_seconds=float(os.environ.get("COUNT_CACHE_TTL", "60"))
+)
+register_reload_listener(count_cache.invalidate)
+
+# Relevance-sorted pages use skip, so each costs O(offset); they stop at this depth
+MAX_SORTED_OFFSET = int(os.environ.get("MAX_SORTED_OFFSET", "500"))
+
+def cached_count(collection, query: Dict[str, Any]) -> int:
+    """Number of matching recipes, cached; taken from collection metadata when unfiltered"""
+    key = (collection.name, json_util.dumps(query, sort_keys=True))
+    hit, total = count_cache.get(key)
+    if hit:
+        return total
+
+    total = collection.count_documents(query) if query else collection.estimated_document_count()
+    count_cache.set(key, total)
+    return total
+
+def fetch_page(collection, query: Dict[str, Any], limit: int, cursor: Optional[str] = None,
+               projection: Optional[Dict[str, Any]] = None, sort: Optional[List[Tuple[str, Any]]] = None,
+               skip: int = 0, max_offset: int = MAX_SORTED_OFFSET) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Fetch one page of recipes and the cursor for the next page (None on the last page)
+
+    Pages are keyset-paginated on _id, so page N costs the same as page 1. A
+    relevance sort (text search) cannot be keyed on, so its cursor carries an
+    offset instead; those pages cost O(offset) and end after max_offset results.
+    skip only applies to the first request (legacy page numbers).
+    """
+    position = decode_cursor(cursor) if cursor else {}
+
+    if sort:
+        offset = position.get("offset", skip)
+        if not isinstance(offset, int) or offset < 0:
+            raise InvalidCursor(f"Invalid cursor: {cursor}")
+        if offset >= max_offset:
+            raise InvalidCursor(f"Relevance-ranked results stop after {max_offset} recipes")
+        page_size = min(limit, max_offset - offset)
+        documents = list(collection.find(query, projection).sort(sort).skip(offset).limit(page_size + 1))
+        next_position = {"offset": offset + page_size} if offset + page_size < max_offset else None
+    else:
+        page_size = limit
+        if "after" in position:
+            after = {"_id": {"$gt": position["after"]}}
+            query = {"$and": [query, after]} if query else after
+        cursor_query = collection.find(query, projection).sort([("_id", 1)])
+        if skip and not position:
+            cursor_query = cursor_query.skip(skip)
+        documents = list(cursor_query.limit(limit + 1))
+        next_position = {"after": documents[limit - 1]["_id"]} if len(documents) > limit else None
+
+    # The extra document only tells us whether another page exists
+    if len(documents) > page_size:
+        return documents[:page_size], encode_cursor(next_position) if next_position else None
+    return documents, None
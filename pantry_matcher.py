@@ -0,0 +1,125 @@
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Iterable, Tuple
+
+import numpy as np
+from scipy import sparse
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class PantryMatcher:
+    """Score a pantry against every recipe with one sparse matrix-vector product"""
+
+    # Fields needed from MongoDB to build the incidence matrix
+    MATRIX_PROJECTION = {"cleaned_ingredients": 1, "ingredients": 1}
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.invalidate()
+
+    def invalidate(self):
+        """Drop the matrix so it is rebuilt on next use"""
+        self.matrix: Optional[sparse.csr_matrix] = None
+        self.recipe_ids: List[Any] = []
+        self.recipes: Dict[Any, Dict[str, Any]] = {}
+        self.terms: List[str] = []
+        self.recipe_sizes: Optional[np.ndarray] = None
+        self.source: Optional[str] = None
+        self.built = False
+
+    def build_from_collection(self, collection) -> "PantryMatcher":
+        """Build the matrix from cleaned_ingredients with one projected scan"""
+        with self._lock:
+            self._build(
+                (recipe["_id"], self._base_ingredients(recipe))
+                for recipe in collection.find({}, self.MATRIX_PROJECTION)
+            )
+            self.source = "mongodb"
+        logger.info(f"Built pantry matrix: {len(self.recipe_ids)} recipes x {len(self.terms)} ingredients")
+        return self
+
+    def build_from_recipes(self, recipes: Iterable[Dict[str, Any]]) -> "PantryMatcher":
+        """Build the matrix over an in-memory recipe list (keeps the documents)"""
+        with self._lock:
+            rows = []
+            recipes_by_id = {}
+            for position, recipe in enumerate(recipes):
+                recipe_id = recipe.get("_id", position)
+                recipes_by_id[recipe_id] = recipe
+                rows.append((recipe_id, self._base_ingredients(recipe)))
+            self._build(rows)
+            self.recipes = recipes_by_id
+            self.source = "local"
+        return self
+
+    @staticmethod
+    def _base_ingredients(recipe: Dict[str, Any]) -> List[str]:
+        """Base ingredient names, preferring the ones derived at import time"""
+        ingredients = recipe.get("cleaned_ingredients") or recipe.get("ingredients") or []
+        return [ing.lower().strip() for ing in ingredients if isinstance(ing, str)]
+
+    def _build(self, rows: Iterable[Tuple[Any, List[str]]]):
+        """Assemble the recipe x ingredient incidence matrix"""
+        self.invalidate()
+        vocabulary: Dict[str, int] = {}
+        indptr = [0]
+        indices: List[int] = []
+
+        for recipe_id, ingredients in rows:
+            self.recipe_ids.append(recipe_id)
+            for ingredient in ingredients:
+                indices.append(vocabulary.setdefault(ingredient, len(vocabulary)))
+            indptr.append(len(indices))
+
+        data = np.ones(len(indices), dtype=np.float32)
+        self.matrix = sparse.csr_matrix(
+            (data, np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+            shape=(len(self.recipe_ids), len(vocabulary))
+        )
+        # Repeated ingredients count once per line, as in the recipe
+        self.matrix.sum_duplicates()
+        self.recipe_sizes = np.asarray(self.matrix.sum(axis=1)).ravel()
+        self.terms = list(vocabulary)
+        self.built = True
+
+    def pantry_vector(self, available_ingredients: List[str]) -> np.ndarray:
+        """Mark every known ingredient covered by the pantry"""
+        pantry = [ing.lower().strip() for ing in available_ingredients if ing and ing.strip()]
+        vector = np.zeros(len(self.terms), dtype=np.float32)
+        for column, term in enumerate(self.terms):
+            if any(item in term or term in item for item in pantry):
+                vector[column] = 1.0
+        return vector
+
+    def score(self, available_ingredients: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (match percentage, missing ingredient count) for every recipe"""
+        if not self.built or not self.recipe_ids:
+            return np.zeros(0), np.zeros(0)
+
+        matched = self.matrix @ self.pantry_vector(available_ingredients)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            match_percentage = np.where(self.recipe_sizes > 0, matched / self.recipe_sizes, 0.0)
+        missing = self.recipe_sizes - matched
+        return match_percentage, missing
+
+    def rank(self, available_ingredients: List[str], min_match_percentage: float = 0.6) -> List[Dict[str, Any]]:
+        """Recipes meeting the threshold, best match first (ties in catalog order)"""
+        match_percentage, missing = self.score(available_ingredients)
+        if not len(match_percentage):
+            return []
+
+        positions = np.flatnonzero(match_percentage >= min_match_percentage)
+        order = positions[np.argsort(-match_percentage[positions], kind="stable")]
+        return [
+            {
+                "recipe_id": self.recipe_ids[position],
+                "match_percentage": float(match_percentage[position]),
+                "missing_ingredients": int(missing[position])
+            }
+            for position in order
+        ]
+
+# Create a matcher instance (built lazily by recipe_db)
+pantry_matcher = PantryMatcher()
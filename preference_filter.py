@@ -0,0 +1,129 @@
+import logging
+import re
+from typing import Dict, List, Any, Optional, Iterable, Tuple
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+QUICK_TIME_WORDS = ("quick", "fast", "easy")
+QUICK_MAX_MINUTES = 30
+
+def parse_time_minutes(time_value: Any) -> Optional[int]:
+    """Parse "25 mins", "1 hour 10 minutes" or 45 into minutes; None if unparsable"""
+    if isinstance(time_value, (int, float)) and not isinstance(time_value, bool):
+        # NaN is how pandas stores a missing TotalTimeInMins
+        return int(time_value) if time_value == time_value else None
+    if not isinstance(time_value, str) or not time_value.strip():
+        return None
+
+    time_str = time_value.lower()
+    hours_match = re.search(r'(\d+(?:\.\d+)?)\s*(?:hour|hr)', time_str)
+    minutes_match = re.search(r'(\d+)\s*min', time_str)
+    if hours_match or minutes_match:
+        minutes = float(hours_match.group(1)) * 60 if hours_match else 0
+        if minutes_match:
+            minutes += int(minutes_match.group(1))
+        return int(minutes)
+
+    # A bare number is taken as minutes
+    number_match = re.match(r'\s*(\d+)\s*$', time_str)
+    if number_match:
+        return int(number_match.group(1))
+    return None
+
+def recipe_total_minutes(recipe: Dict[str, Any]) -> Optional[int]:
+    """Total time in minutes, preferring the total_minutes field written at import"""
+    minutes = recipe.get("total_minutes")
+    if isinstance(minutes, (int, float)) and not isinstance(minutes, bool) and minutes == minutes:
+        return int(minutes)
+    minutes = parse_time_minutes(recipe.get("TotalTimeInMins"))
+    if minutes is None:
+        minutes = parse_time_minutes(recipe.get("time"))
+    return minutes
+
+def parse_time_bound(time_preference: str) -> Optional[int]:
+    """Maximum minutes implied by a time preference ("quick", "under 20 minutes")"""
+    time_value = time_preference.lower()
+    if any(word in time_value for word in QUICK_TIME_WORDS):
+        return QUICK_MAX_MINUTES
+    if "under" in time_value or "less than" in time_value:
+        minutes = parse_time_minutes(time_value)
+        if minutes is None:
+            number_match = re.search(r'(\d+)', time_value)
+            minutes = int(number_match.group(1)) if number_match else None
+        return minutes
+    return None
+
+def _needles(value: Any) -> Tuple[str, ...]:
+    """Lowercased, trimmed search terms from a string or list preference"""
+    if not value:
+        return ()
+    if isinstance(value, str):
+        value = [value]
+    return tuple(v.lower().strip() for v in value if isinstance(v, str) and v.strip())
+
+class PreferencePredicate:
+    """Preferences compiled once into a predicate for local recipe filtering"""
+
+    def __init__(self, preferences: Dict[str, Any]):
+        diet = (preferences.get("diet") or "").lower().strip()
+        # Only an explicit vegetarian request rules recipes out by diet
+        self.reject_non_vegetarian = diet == "vegetarian"
+
+        cuisine = _needles(preferences.get("cuisine"))
+        course = _needles(preferences.get("course"))
+        ingredient = _needles(preferences.get("ingredient"))
+        self.cuisine = cuisine[0] if cuisine else None
+        self.course = course[0] if course else None
+        self.ingredient = ingredient[0] if ingredient else None
+        self.exclusions = _needles(preferences.get("exclude_ingredient"))
+
+        self.max_minutes = parse_time_bound(preferences["time"]) if preferences.get("time") else None
+
+    def __call__(self, recipe: Dict[str, Any]) -> bool:
+        """Return True if the recipe satisfies every compiled preference"""
+        if self.reject_non_vegetarian:
+            recipe_diet = recipe.get("diet") or ""
+            if isinstance(recipe_diet, str):
+                recipe_diet = [recipe_diet]
+            if any(d.lower() == "non-vegetarian" for d in recipe_diet if isinstance(d, str)):
+                return False
+
+        if self.cuisine and self.cuisine not in (recipe.get("cuisine") or recipe.get("Cuisine") or "").lower():
+            return False
+
+        if self.course and self.course not in (recipe.get("course") or "").lower():
+            return False
+
+        if self.ingredient or self.exclusions:
+            ingredients = [ing.lower() for ing in recipe.get("ingredients", []) if isinstance(ing, str)]
+
+            if self.ingredient and not any(self.ingredient in ing for ing in ingredients):
+                return False
+
+            for excluded in self.exclusions:
+                if any(excluded in ing for ing in ingredients):
+                    return False
+
+        if self.max_minutes is not None:
+            minutes = recipe_total_minutes(recipe)
+            # Recipes with an unreadable time are kept rather than guessed at
+            if minutes is not None and minutes > self.max_minutes:
+                return False
+
+        return True
+
+    def apply(self, recipes: Iterable[Dict[str, Any]], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Filter recipes in one pass, stopping once limit matches are found"""
+        matches = []
+        for recipe in recipes:
+            if self(recipe):
+                matches.append(recipe)
+                if limit is not None and len(matches) >= limit:
+                    break
+        return matches
+
+def compile_preferences(preferences: Dict[str, Any]) -> PreferencePredicate:
+    """Compile a preferences dict into a reusable predicate"""
+    return PreferencePredicate(preferences or {})
@@ -0,0 +1,270 @@
+import logging
+import os
+import re
+import difflib
+from typing import Dict, List, Any, Optional, Set
+
+import yaml
+
+from recipe_index import tokenize, normalize_label
+from schema_capabilities import schema_capabilities
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+TAXONOMY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recipe_taxonomy.yaml")
+
+# Diet labels written by import_recipes.classify_diet
+IMPORTED_DIETS = ["vegetarian", "non-vegetarian", "vegan", "gluten-free", "dairy-free", "low-fodmap"]
+
+# Normalized fields written at import time (see import_recipes.main)
+NORMALIZED_FIELDS = ["cuisine_normalized", "ingredient_tokens", "search_tokens"]
+
+def normalize_cuisine(cuisine: Any) -> str:
+    """Normalize a cuisine name for exact matching ("South Indian  Recipes" -> "south indian recipes")"""
+    return " ".join(str(cuisine).lower().split()) if cuisine else ""
+
+class QueryCompiler:
+    """Compile chat preferences into exact-match, index-friendly MongoDB queries"""
+
+    # Minimum similarity for correcting misspelled values against the vocabulary
+    FUZZY_CUTOFF = 0.85
+
+    def __init__(self, taxonomy_path: str = TAXONOMY_PATH):
+        self.diets: Set[str] = set(IMPORTED_DIETS)
+        self.cuisines: Set[str] = set()
+        self.ingredient_terms: Set[str] = set()
+        # Every ingredient token stored in the collection, for substring exclusions
+        self.ingredient_vocabulary: Set[str] = set()
+        self.vocabulary_loaded = False
+        # Whether the collection carries the normalized fields; until known,
+        # queries target them and fall back to regex for legacy imports
+        self.normalized_fields = True
+        # Whether the typed numeric fields (total_minutes, calories...) exist
+        self.numeric_fields = False
+        self.load_taxonomy(taxonomy_path)
+
+    def load_taxonomy(self, taxonomy_path: str):
+        """Load diet and ingredient vocabulary from the recipe taxonomy"""
+        try:
+            with open(taxonomy_path, "r") as f:
+                taxonomy = yaml.safe_load(f) or {}
+
+            for terms in taxonomy.get("ingredient_categories", {}).values():
+                for term in terms or []:
+                    self.ingredient_terms.update(tokenize(term))
+
+            self.diets.update(normalize_label(diet) for diet in taxonomy.get("diet_exclusions", {}))
+        except Exception as e:
+            logger.warning(f"Could not load recipe taxonomy: {e}")
+
+    def load_collection_vocabulary(self, collection):
+        """Load cuisines and diets actually present in the collection"""
+        try:
+            capabilities = schema_capabilities.ensure(collection)
+            self.normalized_fields = capabilities.has("cuisine_normalized")
+            self.numeric_fields = capabilities.has("total_minutes")
+            cuisine_field = "cuisine_normalized" if self.normalized_fields else "Cuisine"
+            self.cuisines = {normalize_cuisine(c) for c in collection.distinct(cuisine_field) if c}
+            self.diets.update(normalize_label(d) for d in collection.distinct("diet") if d)
+            if self.normalized_fields:
+                self.ingredient_vocabulary = {t for t in collection.distinct("ingredient_tokens") if t}
+            self.vocabulary_loaded = True
+            logger.info(f"Loaded query vocabulary: {len(self.cuisines)} cuisines, {len(self.diets)} diets, "
+                        f"{len(self.ingredient_vocabulary)} ingredient tokens")
+        except Exception as e:
+            logger.error(f"Error loading query vocabulary: {e}")
+
+    def _closest(self, value: str, vocabulary: Set[str]) -> Optional[str]:
+        """Return the closest vocabulary entry for a possibly misspelled value"""
+        matches = difflib.get_close_matches(value, vocabulary, n=1, cutoff=self.FUZZY_CUTOFF)
+        return matches[0] if matches else None
+
+    def canonicalize_diet(self, diet: str) -> Optional[str]:
+        """Map a user diet onto a known diet label"""
+        label = normalize_label(diet)
+        if label in self.diets:
+            return label
+        return self._closest(label, self.diets)
+
+    def canonicalize_cuisine(self, cuisine: str) -> List[str]:
+        """Map a user cuisine onto every known cuisine containing it"""
+        if not self.cuisines:
+            return []
+
+        # "indian" expands to "indian", "south indian recipes", ...
+        tokens = set(tokenize(cuisine))
+        matches = sorted(c for c in self.cuisines if tokens and tokens <= set(tokenize(c)))
+        if matches:
+            return matches
+
+        # Correct misspellings token by token ("itallian" -> "italian")
+        cuisine_tokens = {t for c in self.cuisines for t in tokenize(c)}
+        corrected = set()
+        for token in tokens:
+            closest = token if token in cuisine_tokens else self._closest(token, cuisine_tokens)
+            if not closest:
+                return []
+            corrected.add(closest)
+        return sorted(c for c in self.cuisines if corrected <= set(tokenize(c)))
+
+    def canonicalize_ingredient(self, ingredient: str) -> List[List[str]]:
+        """Map each token of a user ingredient onto the spellings to match
+        
+        ingredient_tokens keep each recipe's own spelling, so a token corrected
+        against the taxonomy ("chilli" -> "chili") is matched alongside the typed one.
+        """
+        alternatives = []
+        for token in tokenize(ingredient):
+            spellings = [token]
+            if token not in self.ingredient_terms:
+                closest = self._closest(token, self.ingredient_terms)
+                if closest and closest != token:
+                    spellings.append(closest)
+            if spellings not in alternatives:
+                alternatives.append(spellings)
+        return alternatives
+
+    def containing_tokens(self, spellings: List[str]) -> List[str]:
+        """The spellings plus every vocabulary token containing one ("nut" -> "walnut", "peanut"...)"""
+        contained = {token for token in self.ingredient_vocabulary if any(s in token for s in spellings)}
+        return spellings + sorted(contained - set(spellings))
+
+    @staticmethod
+    def _ingredient_match(alternatives: List[List[str]]) -> Dict[str, Any]:
+        """Clause matching recipes that contain one spelling of every token"""
+        if all(len(spellings) == 1 for spellings in alternatives):
+            return {"ingredient_tokens": {"$all": [spellings[0] for spellings in alternatives]}}
+        clauses = [
+            {"ingredient_tokens": spellings[0] if len(spellings) == 1 else {"$in": spellings}}
+            for spellings in alternatives
+        ]
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def compile(self, preferences: Dict[str, Any]) -> Dict[str, Any]:
+        """Compile preferences into a MongoDB query"""
+        clauses = []
+
+        if preferences.get("diet"):
+            diet = self.canonicalize_diet(preferences["diet"])
+            if diet:
+                clauses.append({"diet": diet})
+            else:
+                # Last resort: anchored prefix on the lowercase diet labels
+                clauses.append({"diet": {"$regex": "^" + re.escape(normalize_label(preferences["diet"]))}})
+
+        if preferences.get("cuisine"):
+            cuisines = self.canonicalize_cuisine(preferences["cuisine"])
+            field = "cuisine_normalized" if self.normalized_fields else "Cuisine"
+            if cuisines and self.normalized_fields:
+                clauses.append({field: {"$in": cuisines}})
+            else:
+                clauses.append({field: {"$regex": re.escape(preferences["cuisine"]), "$options": "i"}})
+
+        if preferences.get("course"):
+            if self.normalized_fields:
+                tokens = tokenize(preferences["course"])
+                # Nothing searchable (e.g. punctuation only): no constraint
+                if tokens:
+                    clauses.append({"search_tokens": {"$all": tokens}})
+            else:
+                course_regex = re.escape(preferences["course"])
+                clauses.append({"$or": [
+                    {"RecipeName": {"$regex": course_regex, "$options": "i"}},
+                    {"Description": {"$regex": course_regex, "$options": "i"}}
+                ]})
+
+        if preferences.get("ingredient"):
+            if self.normalized_fields:
+                alternatives = self.canonicalize_ingredient(preferences["ingredient"])
+                # Nothing searchable (e.g. punctuation only): no constraint
+                if alternatives:
+                    clauses.append(self._ingredient_match(alternatives))
+            else:
+                clauses.append({"ingredients": {"$regex": re.escape(preferences["ingredient"]), "$options": "i"}})
+
+        if preferences.get("exclude_ingredient"):
+            if self.normalized_fields and self.ingredient_vocabulary:
+                # A hard filter: like the substring $regex, "nut" also excludes walnuts
+                alternatives = [
+                    self.containing_tokens(spellings)
+                    for spellings in self.canonicalize_ingredient(preferences["exclude_ingredient"])
+                ]
+                if len(alternatives) == 1:
+                    spellings = alternatives[0]
+                    clauses.append({"ingredient_tokens": {"$ne": spellings[0]} if len(spellings) == 1 else {"$nin": spellings}})
+                elif alternatives:
+                    clauses.append({"$nor": [self._ingredient_match(alternatives)]})
+            else:
+                # Last resort without the token vocabulary: substring match on the raw ingredients
+                clauses.append({"ingredients": {"$not": {"$regex": re.escape(preferences["exclude_ingredient"]), "$options": "i"}}})
+
+        if preferences.get("time"):
+            time_value = preferences["time"].lower()
+            # Typed minutes written at import; the raw CSV column otherwise
+            time_field = "total_minutes" if self.numeric_fields else "TotalTimeInMins"
+            if "quick" in time_value or "fast" in time_value or "easy" in time_value:
+                # For quick recipes, look for a total time < 30
+                clauses.append({time_field: {"$lt": 30}})
+            elif "under" in time_value or "less than" in time_value:
+                # Extract the number of minutes
+                time_match = re.search(r"(\d+)", time_value)
+                if time_match:
+                    clauses.append({time_field: {"$lt": int(time_match.group(1))}})
+
+        return self._merge(clauses)
+
+    # Structured filters that may accompany a free-text search; the keywords
+    # stand in for the remaining preferences (course, ingredient, taste)
+    TEXT_FILTER_FIELDS = ("diet", "cuisine", "exclude_ingredient", "time")
+
+    def compile_text(self, text_query: str, preferences: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Compile a $text keyword search restricted by the TEXT_FILTER_FIELDS preferences"""
+        filters = {
+            key: value for key, value in (preferences or {}).items()
+            if key in self.TEXT_FILTER_FIELDS and value
+        }
+        query = {"$text": {"$search": text_query}}
+        query.update(self.compile(filters))
+        return query
+
+    @staticmethod
+    def _merge(clauses: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Merge clauses into one document, using $and only when fields collide"""
+        query = {}
+        for clause in clauses:
+            if any(key in query for key in clause):
+                return {"$and": clauses}
+            query.update(clause)
+        return query
+
+    def explain(self, collection, query: Dict[str, Any]) -> Dict[str, Any]:
+        """Report which indexes MongoDB's winning plan uses for a query"""
+        plan = collection.find(query).explain()
+        winning_plan = plan.get("queryPlanner", {}).get("winningPlan", {})
+
+        indexes, stages = set(), set()
+        pending = [winning_plan]
+        while pending:
+            node = pending.pop()
+            if isinstance(node, dict):
+                if "indexName" in node:
+                    indexes.add(node["indexName"])
+                if "stage" in node:
+                    stages.add(node["stage"])
+                pending.extend(node.values())
+            elif isinstance(node, list):
+                pending.extend(node)
+
+        report = {
+            "query": query,
+            "indexes": sorted(indexes),
+            "collection_scan": "COLLSCAN" in stages
+        }
+        if report["collection_scan"]:
+            logger.warning(f"Query uses a collection scan: {query}")
+        return report
+
+# Create a compiler instance
+query_compiler = QueryCompiler()
@@ -1,8 +1,9 @@
 import logging
 from typing import Dict, List, Any, Optional
-import re
 import math
 
+from preference_filter import recipe_total_minutes
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -43,7 +44,6 @@ class RecipeComplexityAnalyzer:
         # Extract recipe components
         ingredients = recipe.get("ingredients", [])
         instructions = recipe.get("instructions", [])
-        time_str = recipe.get("time", "")
         
         # Calculate individual complexity factors
         factors = {}
@@ -76,7 +76,9 @@ class RecipeComplexityAnalyzer:
         factors["equipment"] = min(equipment_count / 3, 1.0)
         
         # Time factor (0-1)
-        minutes = self._extract_time_minutes(time_str)
+        minutes = recipe_total_minutes(recipe)
+        if minutes is None:
+            minutes = 60  # Default
         factors["time"] = min(minutes / 120, 1.0)  # Cap at 2 hours
         
         # Calculate weighted score
@@ -97,6 +99,13 @@ class RecipeComplexityAnalyzer:
             "factors": {k: round(v, 2) for k, v in factors.items()}
         }
     
+    def complexity_score(self, recipe: Dict[str, Any]) -> float:
+        """Complexity score, read from the complexity_score field written at import when present"""
+        score = recipe.get("complexity_score")
+        if isinstance(score, (int, float)) and not isinstance(score, bool):
+            return score
+        return self.analyze_recipe(recipe)["score"]
+    
     def get_complexity_explanation(self, complexity: Dict[str, Any]) -> str:
         """Generate a human-readable explanation of recipe complexity"""
         if not complexity:
@@ -137,26 +146,6 @@ class RecipeComplexityAnalyzer:
         }
         
         return explanations.get(factor, f"• {factor.replace('_', ' ').title()}: {value}\n")
-    
-    def _extract_time_minutes(self, time_str: str) -> int:
-        """Extract cooking time in minutes from string"""
-        if not time_str:
-            return 60  # Default
-        
-        time_str = time_str.lower()
-        
-        # Try to extract minutes
-        minutes_match = re.search(r'(\d+)\s*min', time_str)
-        if minutes_match:
-            return int(minutes_match.group(1))
-        
-        # Try to extract hours and convert to minutes
-        hours_match = re.search(r'(\d+)\s*hour', time_str)
-        if hours_match:
-            return int(hours_match.group(1)) * 60
-        
-        # If no match, return default
-        return 60
 
 # Create analyzer instance
 complexity_analyzer = RecipeComplexityAnalyzer() 
\ No newline at end of file
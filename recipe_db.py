@@ -1,32 +1,26 @@
+import heapq
 import logging
-from pymongo import MongoClient
+import operator
 import os
 import json
 import random
 import re
+import threading
+from pymongo.errors import OperationFailure
+from db_connection import get_collection, bootstrap_indexes
+from recipe_index import RecipeIndex, recipe_index, tokenize
+from pantry_matcher import PantryMatcher, pantry_matcher
+from query_compiler import query_compiler
+from substitution_matcher import SubstitutionMatcher
+from preference_filter import compile_preferences, recipe_total_minutes
+from search_cache import search_cache, register_reload_listener
+from schema_capabilities import schema_capabilities
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# MongoDB connection
-try:
-    mongo_uri = os.environ.get("MONGO_URI", "mongodb://localhost:27017/")
-    client = MongoClient(mongo_uri)
-    db = client["recipeDB"]  # Your database name
-    collection = db["recipes"]  # Your collection name
-    logger.info("Connected to MongoDB")
-    
-    # Create indexes for better performance
-    collection.create_index([("RecipeName", "text"), ("ingredients", "text")])
-    collection.create_index([("Cuisine", 1)])
-    collection.create_index([("diet", 1)])
-    logger.info("Created MongoDB indexes for better performance")
-    
-except Exception as e:
-    logger.error(f"Failed to connect to MongoDB: {e}")
-    # Fallback to local recipes
-    collection = None
+# MongoDB is connected lazily on first use (see db_connection.RecipeDatabase)
 
 # Sample recipes for fallback
 SAMPLE_RECIPES = [
@@ -58,193 +52,221 @@ INGREDIENT_SUBSTITUTIONS = {
     "jelly": ["jam"]
 }
 
+# Substitution vocabulary compiled once (both directions) for rendering
+substitution_matcher = SubstitutionMatcher(INGREDIENT_SUBSTITUTIONS)
+
 # Add nutritional filtering capabilities
+# Range queries on the indexed per-serving fields written by import_recipes
 NUTRITIONAL_KEYWORDS = {
     "low-calorie": {"calories": {"$lt": 400}},
-    "low-carb": {"carbohydrates": {"$lt": 20}},
+    "low-carb": {"carbs": {"$lt": 20}},
     "high-protein": {"protein": {"$gt": 20}},
     "low-fat": {"fat": {"$lt": 10}},
-    "keto": {"carbohydrates": {"$lt": 10}, "fat": {"$gt": 20}},
-    "balanced": {"protein": {"$gt": 15}, "carbohydrates": {"$gt": 30}, "fat": {"$gt": 10, "$lt": 30}}
+    "keto": {"carbs": {"$lt": 10}, "fat": {"$gt": 20}},
+    "balanced": {"protein": {"$gt": 15}, "carbs": {"$gt": 30}, "fat": {"$gt": 10, "$lt": 30}}
 }
 
 def initialize_db():
-    """Initialize the database with sample recipes if empty or if MongoDB is unreachable"""
-    global collection
+    """Initialize the database with sample recipes if it is empty"""
+    collection = get_collection()
+    if collection is None or not SAMPLE_RECIPES:
+        return
     
     try:
-        if collection and collection.count_documents({}) == 0:
+        if collection.count_documents({}) == 0:
             logger.info("Initializing database with sample recipes")
             # Insert sample recipes
             collection.insert_many(SAMPLE_RECIPES)
             logger.info(f"Inserted {len(SAMPLE_RECIPES)} sample recipes")
-            
-            # Create indexes for better performance
-            collection.create_index([("RecipeName", "text"), ("ingredients", "text")])
-            collection.create_index([("Cuisine", 1)])
-            collection.create_index([("diet", 1)])
-            collection.create_index([("course", 1)])
-            collection.create_index([("time", 1)])
-            logger.info("Created MongoDB indexes for better performance")
     except Exception as e:
         logger.error(f"Error initializing MongoDB: {e}")
-        logger.info("Falling back to local sample recipes")
-        collection = None  # Force use of local recipes
 
 def build_optimized_query(preferences):
     """Build an optimized MongoDB query based on user preferences"""
-    query = {}
-    
-    # Add diet filter with proper indexing
-    if preferences.get("diet"):
-        diet = preferences["diet"].lower()
-        query["diet"] = {"$regex": diet, "$options": "i"}
+    collection = get_collection()
+    if not query_compiler.vocabulary_loaded and collection is not None:
+        query_compiler.load_collection_vocabulary(collection)
+    return query_compiler.compile(preferences)
+
+def explain_query(preferences):
+    """Report which indexes the query for these preferences uses"""
+    collection = get_collection()
+    if collection is None:
+        return {}
+    return query_compiler.explain(collection, build_optimized_query(preferences))
+
+# Number of recipes returned by weighted scoring
+WEIGHTED_TOP_K = 10
+
+# Priority of constraints to relax
+RELAXATION_ORDER = ["time", "taste", "exclude_ingredient", "ingredient", "course", "cuisine", "diet"]
+
+def build_relaxation_levels(preferences, max_relaxations=3):
+    """List (preferences, relaxed) pairs for each fallback level, strictest first"""
+    levels = [(preferences.copy(), [])]
     
-    # Add cuisine filter
-    if preferences.get("cuisine"):
-        query["Cuisine"] = {"$regex": preferences["cuisine"], "$options": "i"}
+    # Relax constraints one by one
+    relaxed = []
+    relaxed_preferences = preferences.copy()
+    for constraint in RELAXATION_ORDER:
+        if constraint in relaxed_preferences:
+            del relaxed_preferences[constraint]
+            relaxed.append(constraint)
+            levels.append((relaxed_preferences.copy(), list(relaxed)))
+            
+            # Stop after max_relaxations
+            if len(relaxed) >= max_relaxations:
+                break
     
-    # Add course filter (look in recipe name or description)
-    if preferences.get("course"):
-        course_regex = preferences["course"]
-        query["$or"] = [
-            {"RecipeName": {"$regex": course_regex, "$options": "i"}},
-            {"Description": {"$regex": course_regex, "$options": "i"}}
-        ]
+    # Minimal constraints: keep only the diet
+    if "diet" in preferences:
+        minimal_relaxed = list(relaxed)
+        for k in preferences.keys():
+            if k != "diet" and k not in minimal_relaxed:
+                minimal_relaxed.append(k)
+        levels.append(({"diet": preferences["diet"]}, minimal_relaxed))
     
-    # Add ingredient filter
-    if preferences.get("ingredient"):
-        # If we already have $or for course, we need to handle differently
-        if "$or" in query:
-            # Save the existing $or
-            existing_or = query["$or"]
-            # Create a new $and that combines the existing $or with the ingredient condition
-            query = {
-                "$and": [
-                    {"$or": existing_or},
-                    {"ingredients": {"$regex": preferences["ingredient"], "$options": "i"}}
-                ]
-            }
-        else:
-            query["ingredients"] = {"$regex": preferences["ingredient"], "$options": "i"}
+    return levels
+
+def _level_branch(query, level, limit):
+    """Pipeline stages answering one relaxation level: at most `limit` ids, tagged with the level"""
+    return [{"$match": query}, {"$limit": limit}, {"$project": {"_id": 1}}, {"$addFields": {"level": level}}]
+
+def _find_first_nonempty_level(collection, levels, limit=10):
+    """Evaluate every relaxation level in one aggregation and return the first hit
     
-    # Handle exclusions separately
-    if preferences.get("exclude_ingredient"):
-        exclude_regex = preferences["exclude_ingredient"]
-        # If we already have a complex query, add to $and
-        if "$and" in query:
-            query["$and"].append({"ingredients": {"$not": {"$regex": exclude_regex, "$options": "i"}}})
-        else:
-            # If we have $or but no $and
-            if "$or" in query:
-                # Save the existing $or
-                existing_or = query["$or"]
-                # Create a new $and that combines the existing $or with the exclusion
-                query = {
-                    "$and": [
-                        {"$or": existing_or},
-                        {"ingredients": {"$not": {"$regex": exclude_regex, "$options": "i"}}}
-                    ]
-                }
-                # Remove the original $or
-                del query["$or"]
-            else:
-                # Simple case - just add the exclusion
-                query["ingredients"] = {"$not": {"$regex": exclude_regex, "$options": "i"}}
+    Each level is its own $unionWith branch, so it can use an index and stops
+    after `limit` matches; the server reads at most `limit` recipes per level.
+    """
+    # Identical queries (e.g. relaxing "taste") share a branch
+    queries = {}
+    level_keys = []
+    unfiltered_relaxed = None
+    for level_preferences, relaxed in levels:
+        query = build_optimized_query(level_preferences)
+        if not query:
+            # Matches any recipe, so no later level can win; it is answered
+            # with a bounded find instead of an unfiltered branch
+            unfiltered_relaxed = relaxed
+            break
+        key = json.dumps(query, sort_keys=True, default=str)
+        if key not in queries:
+            queries[key] = query
+        level_keys.append(key)
     
-    # Handle time constraints
-    if preferences.get("time"):
-        time_value = preferences["time"].lower()
-        if "quick" in time_value or "fast" in time_value or "easy" in time_value:
-            # For quick recipes, look for TotalTimeInMins < 30
-            if "$and" in query:
-                query["$and"].append({"TotalTimeInMins": {"$lt": 30}})
-            else:
-                query["TotalTimeInMins"] = {"$lt": 30}
-        elif "under" in time_value or "less than" in time_value:
-            # Extract the number of minutes
-            time_match = re.search(r"(\d+)", time_value)
-            if time_match:
-                minutes = int(time_match.group(1))
-                if "$and" in query:
-                    query["$and"].append({"TotalTimeInMins": {"$lt": minutes}})
-                else:
-                    query["TotalTimeInMins"] = {"$lt": minutes}
+    if queries:
+        branch_of = {key: i for i, key in enumerate(queries)}
+        branches = [_level_branch(query, branch_of[key], limit) for key, query in queries.items()]
+        # Phase one only ships recipe ids back for every level
+        pipeline = branches[0] + [
+            {"$unionWith": {"coll": collection.name, "pipeline": branch}} for branch in branches[1:]
+        ]
+        matches = {}
+        try:
+            for doc in collection.aggregate(pipeline):
+                matches.setdefault(doc["level"], []).append(doc["_id"])
+        except OperationFailure as e:
+            # $unionWith needs MongoDB 4.4; older servers get one bounded find per level
+            logger.warning(f"Single-aggregation fallback search failed, querying each level: {e}")
+            for key, query in queries.items():
+                matches[branch_of[key]] = [doc["_id"] for doc in collection.find(query, {"_id": 1}).limit(limit)]
+                if matches[branch_of[key]]:
+                    break
+        
+        for (_, relaxed), key in zip(levels, level_keys):
+            recipe_ids = matches.get(branch_of[key])
+            if recipe_ids:
+                # Phase two hydrates full documents for the winning level only
+                return _fetch_recipes_by_id(recipe_ids), relaxed
     
-    return query
+    if unfiltered_relaxed is not None:
+        results = list(collection.find({}).limit(limit))
+        if results:
+            return results, unfiltered_relaxed
+    return [], None
+
+# Relevance score computed by MongoDB for $text queries
+TEXT_SCORE = {"$meta": "textScore"}
+
+def search_text(collection, text_query, preferences=None, limit=10):
+    """Keyword search on the recipe text index, best textScore first"""
+    if not query_compiler.vocabulary_loaded:
+        query_compiler.load_collection_vocabulary(collection)
+    query = query_compiler.compile_text(text_query, preferences)
+    cursor = collection.find(query, {"score": TEXT_SCORE}).sort([("score", TEXT_SCORE)])
+    return list(cursor.limit(limit))
+
+def filter_recipes_by_text(recipes, text_query, limit=None):
+    """Rank recipes by how many query keywords they contain (fallback method)"""
+    keywords = set(tokenize(text_query))
+    ranked = []
+    for position, recipe in enumerate(recipes):
+        recipe_tokens = set(tokenize([
+            recipe.get("name") or recipe.get("RecipeName") or "",
+            recipe.get("description") or recipe.get("Description") or "",
+            recipe.get("ingredients") or []
+        ]))
+        hits = len(keywords & recipe_tokens)
+        if hits:
+            ranked.append((-hits, position, recipe))
+    ranked.sort(key=lambda item: item[:2])
+    return [recipe for _, _, recipe in ranked[:limit]]
 
-def search_with_fallback(preferences, max_relaxations=3):
-    """Search for recipes with intelligent fallback mechanisms"""
+@search_cache.cached
+def search_with_fallback(preferences, max_relaxations=3, text_query=None):
+    """Search for recipes with intelligent fallback mechanisms
+    
+    With a text_query, keyword matches from the text index (filtered by diet,
+    cuisine, excluded ingredients and time) are returned first, with the other
+    preferences reported as relaxed; if there are none the keywords are dropped
+    and reported as relaxed ("text") before the usual preference relaxation.
+    """
     try:
-        if not collection:
-            # MongoDB unavailable, use local filtering
-            logger.warning("MongoDB unavailable, using local recipe filtering")
-            results = filter_recipes(SAMPLE_RECIPES, preferences)
-            if results:
-                return {"results": results, "relaxed": []}
-            else:
-                # Try relaxing constraints one by one
-                relaxed = []
-                relaxed_preferences = preferences.copy()
-                
-                # Priority of constraints to relax
-                relaxation_order = ["time", "taste", "exclude_ingredient", "ingredient", "course", "cuisine", "diet"]
-                
-                for constraint in relaxation_order:
-                    if constraint in relaxed_preferences:
-                        del relaxed_preferences[constraint]
-                        relaxed.append(constraint)
-                        
-                        results = filter_recipes(SAMPLE_RECIPES, relaxed_preferences)
-                        if results:
-                            return {"results": results, "relaxed": relaxed}
-                        
-                        # Stop after max_relaxations
-                        if len(relaxed) >= max_relaxations:
-                            break
-                
-                # If still no results, return any recipes
-                return {"results": SAMPLE_RECIPES[:5], "relaxed": list(preferences.keys())}
-        
-        # Try exact match first
-        query = build_optimized_query(preferences)
-        results = list(collection.find(query).limit(10))
-        
-        if results:
-            return {"results": results, "relaxed": []}
-        
-        # If no results, try relaxing constraints one by one
-        relaxed = []
-        relaxed_preferences = preferences.copy()
+        collection = get_collection()
+        levels = build_relaxation_levels(preferences, max_relaxations)
         
-        # Priority of constraints to relax
-        relaxation_order = ["time", "taste", "exclude_ingredient", "ingredient", "course", "cuisine", "diet"]
+        if text_query:
+            if collection is not None:
+                try:
+                    results = search_text(collection, text_query, preferences)
+                except Exception as e:
+                    # e.g. the text index has not been created yet
+                    logger.warning(f"Text search failed, using structured search: {e}")
+                    search_cache.mark_degraded()
+                    results = []
+            else:
+                search_cache.mark_degraded()
+                text_filters = {
+                    key: preferences[key] for key in query_compiler.TEXT_FILTER_FIELDS if preferences.get(key)
+                }
+                results = filter_recipes_by_text(filter_recipes(SAMPLE_RECIPES, text_filters), text_query, limit=10)
+            if results:
+                # The keywords replace the preferences the text search does not filter on
+                relaxed = [
+                    key for key, value in preferences.items()
+                    if value and key not in query_compiler.TEXT_FILTER_FIELDS
+                ]
+                return {"results": results, "relaxed": relaxed}
+            
+            # No keyword hits: fall back to the structured search
+            levels = [(level_preferences, ["text"] + relaxed) for level_preferences, relaxed in levels]
         
-        for constraint in relaxation_order:
-            if constraint in relaxed_preferences:
-                del relaxed_preferences[constraint]
-                relaxed.append(constraint)
-                
-                query = build_optimized_query(relaxed_preferences)
-                results = list(collection.find(query).limit(10))
-                
+        if collection is None:
+            # MongoDB unavailable, use local filtering
+            logger.warning("MongoDB unavailable, using local recipe filtering")
+            search_cache.mark_degraded()
+            for level_preferences, relaxed in levels:
+                results = filter_recipes(SAMPLE_RECIPES, level_preferences, limit=10)
                 if results:
                     return {"results": results, "relaxed": relaxed}
-                
-                # Stop after max_relaxations
-                if len(relaxed) >= max_relaxations:
-                    break
+            
+            # If still no results, return any recipes
+            return {"results": SAMPLE_RECIPES[:5], "relaxed": list(preferences.keys())}
         
-        # If still no results, try minimal constraints
-        if "diet" in preferences:
-            minimal_preferences = {"diet": preferences["diet"]}
-            query = build_optimized_query(minimal_preferences)
-            results = list(collection.find(query).limit(10))
-            if results:
-                for k in preferences.keys():
-                    if k != "diet" and k not in relaxed:
-                        relaxed.append(k)
-                return {"results": results, "relaxed": relaxed}
+        # Exact match and every relaxation level in a single round trip
+        results, relaxed = _find_first_nonempty_level(collection, levels)
+        if results:
+            return {"results": results, "relaxed": relaxed}
         
         # Absolute last resort: return any recipes
         results = list(collection.find({}).limit(10))
@@ -252,55 +274,19 @@ def search_with_fallback(preferences, max_relaxations=3):
         
     except Exception as e:
         logger.error(f"Error in search_with_fallback: {e}")
+        search_cache.mark_degraded()
         # Fall back to local filtering in case of any error
         logger.warning("Error occurred, falling back to local recipe filtering")
-        results = filter_recipes(SAMPLE_RECIPES, preferences)
+        results = filter_recipes(SAMPLE_RECIPES, preferences, limit=10)
         if results:
             return {"results": results, "relaxed": []}
         else:
             # Return any sample recipes as a last resort
             return {"results": SAMPLE_RECIPES[:5], "relaxed": list(preferences.keys())}
 
-def filter_recipes(recipes, preferences):
+def filter_recipes(recipes, preferences, limit=None):
     """Filter recipes based on preferences (fallback method)"""
-    filtered_recipes = []
-    for recipe in recipes:
-        match = True
-        
-        if preferences.get("diet") and preferences["diet"].lower() != recipe.get("diet", "").lower():
-            if preferences["diet"].lower() == "vegetarian" and recipe.get("diet") == "non-vegetarian":
-                match = False
-        
-        if preferences.get("cuisine") and preferences["cuisine"].lower() not in recipe.get("cuisine", "").lower():
-            match = False
-        
-        if preferences.get("course") and preferences["course"].lower() not in recipe.get("course", "").lower():
-            match = False
-        
-        if preferences.get("ingredient"):
-            ingredient_found = False
-            for recipe_ingredient in recipe.get("ingredients", []):
-                if preferences["ingredient"].lower() in recipe_ingredient.lower():
-                    ingredient_found = True
-                    break
-            if not ingredient_found:
-                match = False
-        
-        if preferences.get("exclude_ingredient"):
-            for recipe_ingredient in recipe.get("ingredients", []):
-                if preferences["exclude_ingredient"].lower() in recipe_ingredient.lower():
-                    match = False
-                    break
-        
-        if preferences.get("time") and "quick" in preferences["time"].lower():
-            recipe_time = recipe.get("time", "")
-            if "hour" in recipe_time.lower() or int(recipe_time.split()[0]) > 30:
-                match = False
-        
-        if match:
-            filtered_recipes.append(recipe)
-    
-    return filtered_recipes
+    return compile_preferences(preferences).apply(recipes, limit=limit)
 
 def format_recipe(recipe):
     """Format a recipe for display"""
@@ -319,45 +305,51 @@ def format_recipe(recipe):
 """
     return recipe_text
 
+def _needs_rebuild(derived, collection):
+    """Whether a derived structure is missing or still the local fallback"""
+    # Rebuild a local fallback once MongoDB becomes reachable
+    return not derived.built or (collection is not None and derived.source != "mongodb")
+
+# Serializes rebuilds of the shared pantry matrix; readers never take it
+_pantry_matcher_lock = threading.Lock()
+
+def get_pantry_matcher():
+    """Return the pantry incidence matrix, building it on first use
+    
+    A new matrix is built off to the side and swapped in once complete, so
+    concurrent searches never score against a half-built one.
+    """
+    global pantry_matcher
+    collection = get_collection()
+    matcher = pantry_matcher
+    if not _needs_rebuild(matcher, collection):
+        return matcher
+    
+    with _pantry_matcher_lock:
+        # Another request may have rebuilt it while we waited
+        matcher = pantry_matcher
+        if not _needs_rebuild(matcher, collection):
+            return matcher
+        
+        matcher = PantryMatcher()
+        if collection is not None:
+            matcher.build_from_collection(collection)
+        else:
+            matcher.build_from_recipes(SAMPLE_RECIPES)
+        pantry_matcher = matcher
+    return matcher
+
 def search_by_available_ingredients(available_ingredients, min_match_percentage=0.6):
     """Search for recipes based on ingredients the user has available"""
-    if not collection:
+    collection = get_collection()
+    if collection is None:
         return filter_by_available_ingredients(SAMPLE_RECIPES, available_ingredients, min_match_percentage)
     
     try:
-        # Convert ingredients to lowercase for case-insensitive matching
-        normalized_ingredients = [ing.lower().strip() for ing in available_ingredients]
-        
-        # Find recipes that contain at least some of these ingredients
-        ingredient_query = {"ingredients": {"$in": normalized_ingredients}}
-        potential_recipes = list(collection.find(ingredient_query))
+        # Score the pantry against every recipe at once
+        ranked_recipes = get_pantry_matcher().rank(available_ingredients, min_match_percentage)
         
-        # Rank recipes by percentage of matching ingredients
-        ranked_recipes = []
-        for recipe in potential_recipes:
-            recipe_ingredients = [ing.lower() for ing in recipe.get('ingredients', [])]
-            
-            # Count matching ingredients
-            matching_count = sum(1 for ing in recipe_ingredients if any(
-                available_ing in ing or ing in available_ing 
-                for available_ing in normalized_ingredients
-            ))
-            
-            # Calculate match percentage
-            match_percentage = matching_count / len(recipe_ingredients) if recipe_ingredients else 0
-            
-            # Only include recipes that meet the minimum match percentage
-            if match_percentage >= min_match_percentage:
-                ranked_recipes.append({
-                    "recipe": recipe,
-                    "match_percentage": match_percentage,
-                    "missing_ingredients": len(recipe_ingredients) - matching_count
-                })
-        
-        # Sort by match percentage (highest first)
-        ranked_recipes.sort(key=lambda x: x["match_percentage"], reverse=True)
-        
-        return [item["recipe"] for item in ranked_recipes]
+        return _fetch_recipes_by_id([item["recipe_id"] for item in ranked_recipes])
     
     except Exception as e:
         logger.error(f"Error searching by available ingredients: {e}")
@@ -365,57 +357,18 @@ def search_by_available_ingredients(available_ingredients, min_match_percentage=
 
 def filter_by_available_ingredients(recipes, available_ingredients, min_match_percentage=0.6):
     """Filter and rank recipes by available ingredients (local fallback)"""
-    normalized_ingredients = [ing.lower().strip() for ing in available_ingredients]
+    matcher = PantryMatcher().build_from_recipes(recipes)
+    ranked_recipes = matcher.rank(available_ingredients, min_match_percentage)
     
-    ranked_recipes = []
-    for recipe in recipes:
-        recipe_ingredients = [ing.lower() for ing in recipe.get('ingredients', [])]
-        
-        # Count matching ingredients
-        matching_count = sum(1 for ing in recipe_ingredients if any(
-            available_ing in ing or ing in available_ing 
-            for available_ing in normalized_ingredients
-        ))
-        
-        # Calculate match percentage
-        match_percentage = matching_count / len(recipe_ingredients) if recipe_ingredients else 0
-        
-        # Only include recipes that meet the minimum match percentage
-        if match_percentage >= min_match_percentage:
-            ranked_recipes.append({
-                "recipe": recipe,
-                "match_percentage": match_percentage,
-                "missing_ingredients": len(recipe_ingredients) - matching_count
-            })
-    
-    # Sort by match percentage (highest first)
-    ranked_recipes.sort(key=lambda x: x["match_percentage"], reverse=True)
-    
-    return [item["recipe"] for item in ranked_recipes]
+    return [matcher.recipes[item["recipe_id"]] for item in ranked_recipes]
 
 def suggest_ingredient_substitutions(recipe):
     """Suggest substitutions for ingredients in a recipe"""
     suggestions = []
     
+    # One automaton pass per ingredient finds keys and substitutes alike
     for ingredient in recipe.get('ingredients', []):
-        ingredient_lower = ingredient.lower()
-        
-        for main_ingredient, substitutes in INGREDIENT_SUBSTITUTIONS.items():
-            if main_ingredient in ingredient_lower:
-                suggestions.append({
-                    "original": ingredient,
-                    "substitutes": substitutes
-                })
-                break
-                
-            # Check if any substitute matches and suggest the main ingredient
-            for substitute in substitutes:
-                if substitute in ingredient_lower:
-                    suggestions.append({
-                        "original": ingredient,
-                        "substitutes": [main_ingredient]
-                    })
-                    break
+        suggestions.extend(substitution_matcher.suggest(ingredient))
     
     return suggestions
 
@@ -433,8 +386,113 @@ def format_recipe_with_substitutions(recipe):
     
     return recipe_text
 
-def search_with_weighted_scoring(preferences, weights=None):
-    """Search for recipes with weighted scoring based on user preferences"""
+# Serializes rebuilds of the shared index; readers never take it
+_recipe_index_lock = threading.Lock()
+
+def get_recipe_index():
+    """Return the in-memory recipe index, building it on first use
+    
+    A new index is built off to the side and swapped in once complete, so
+    concurrent searches see either the old index or the new one, never a
+    half-built one, and only one of them pays for the scan.
+    """
+    global recipe_index
+    collection = get_collection()
+    index = recipe_index
+    if not _needs_rebuild(index, collection):
+        return index
+    
+    with _recipe_index_lock:
+        # Another request may have rebuilt it while we waited
+        index = recipe_index
+        if not _needs_rebuild(index, collection):
+            return index
+        
+        index = RecipeIndex()
+        if collection is not None:
+            if not query_compiler.vocabulary_loaded:
+                query_compiler.load_collection_vocabulary(collection)
+            index.build_from_collection(collection, legacy_schema=not query_compiler.normalized_fields)
+        else:
+            index.build_from_recipes(SAMPLE_RECIPES)
+        recipe_index = index
+    return index
+
+def _reset_derived_state():
+    """Forget state derived from the collection so it is rebuilt on next use"""
+    global recipe_index, pantry_matcher
+    # Searches still holding the old index or matrix finish against it
+    with _recipe_index_lock:
+        recipe_index = RecipeIndex()
+    with _pantry_matcher_lock:
+        pantry_matcher = PantryMatcher()
+    query_compiler.vocabulary_loaded = False
+
+register_reload_listener(_reset_derived_state)
+
+def _fetch_recipes_by_id(recipe_ids):
+    """Fetch full recipe documents in one query, preserving the given order"""
+    collection = get_collection()
+    if not recipe_ids:
+        return []
+    documents = {doc["_id"]: doc for doc in collection.find({"_id": {"$in": recipe_ids}})}
+    return [documents[recipe_id] for recipe_id in recipe_ids if recipe_id in documents]
+
+def _hydrate_index_results(index, positions):
+    """Fetch full recipe documents for index positions, keyed by position
+    
+    Recipes deleted since the index was built are left out.
+    """
+    recipe_ids = {position: index.recipe_ids[position] for position in positions}
+    if index.source == "local":
+        return {position: index.recipes[recipe_id] for position, recipe_id in recipe_ids.items()}
+    collection = get_collection()
+    if not recipe_ids:
+        return {}
+    documents = {doc["_id"]: doc for doc in collection.find({"_id": {"$in": list(recipe_ids.values())}})}
+    return {
+        position: documents[recipe_id]
+        for position, recipe_id in recipe_ids.items() if recipe_id in documents
+    }
+
+RANGE_OPERATORS = {"$lt": operator.lt, "$lte": operator.le, "$gt": operator.gt, "$gte": operator.ge}
+
+def _matches_ranges(recipe, ranges):
+    """Check numeric range clauses against an in-memory recipe"""
+    for field, bounds in ranges.items():
+        value = recipe_total_minutes(recipe) if field == "total_minutes" else recipe.get(field)
+        if not isinstance(value, (int, float)):
+            return False
+        if not all(RANGE_OPERATORS[op](value, bound) for op, bound in bounds.items()):
+            return False
+    return True
+
+def _positions_in_ranges(index, ranges):
+    """Index positions satisfying numeric range clauses; None if they can't be checked"""
+    if index.source == "local":
+        return {
+            position for position, recipe_id in enumerate(index.recipe_ids)
+            if _matches_ranges(index.recipes[recipe_id], ranges)
+        }
+    
+    collection = get_collection()
+    missing = [field for field in ranges if not schema_capabilities.ensure(collection).has(field)]
+    if missing:
+        logger.warning(f"Collection has no {missing} fields; re-run import_recipes to filter by range")
+        return None
+    # Answered from the indexes on the numeric fields
+    return {
+        index.positions[doc["_id"]] for doc in collection.find(ranges, {"_id": 1})
+        if doc["_id"] in index.positions
+    }
+
+@search_cache.cached
+def search_with_weighted_scoring(preferences, weights=None, ranges=None):
+    """Search for recipes with weighted scoring based on user preferences
+    
+    ranges holds MongoDB range clauses on the numeric import fields, e.g.
+    {"total_minutes": {"$lte": 30}, "calories": {"$lte": 500}}; they are hard filters.
+    """
     # Default weights if none provided
     if weights is None:
         weights = {
@@ -448,112 +506,76 @@ def search_with_weighted_scoring(preferences, weights=None):
         }
     
     try:
-        # Get all potential recipes
-        if not collection:
-            all_recipes = SAMPLE_RECIPES
-        else:
-            # Use a minimal query to get potential matches
-            minimal_query = {}
-            
-            # Only add diet as a hard filter
-            if "diet" in preferences:
-                minimal_query["diet"] = {"$regex": preferences["diet"], "$options": "i"}
-            
-            # Only add exclude_ingredient as a hard filter
-            if "exclude_ingredient" in preferences:
-                exclude_ingredient = preferences["exclude_ingredient"]
-                minimal_query["ingredients"] = {"$not": {"$regex": exclude_ingredient, "$options": "i"}}
-            
-            all_recipes = list(collection.find(minimal_query))
+        index = get_recipe_index()
+        if index.source == "local":
+            # MongoDB unavailable: scored over the sample recipes
+            search_cache.mark_degraded()
         
-        # Score each recipe
-        scored_recipes = []
-        for recipe in all_recipes:
-            score = 0.0
-            matches = {}
-            
-            # Calculate score based on each preference
-            for pref, weight in weights.items():
-                if pref not in preferences:
-                    continue
-                
-                value = preferences[pref]
-                
-                # Different scoring logic based on preference type
-                if pref == "diet":
-                    if "diet" in recipe and value.lower() in recipe["diet"].lower():
-                        score += weight
-                        matches[pref] = True
-                
-                elif pref == "exclude_ingredient":
-                    # Check if excluded ingredient is not in recipe
-                    excluded = False
-                    for ingredient in recipe.get("ingredients", []):
-                        if value.lower() in ingredient.lower():
-                            excluded = True
-                            break
-                    
-                    if not excluded:
-                        score += weight
-                        matches[pref] = True
-                
-                elif pref == "cuisine":
-                    if "Cuisine" in recipe and value.lower() in recipe["Cuisine"].lower():
-                        score += weight
-                        matches[pref] = True
-                
-                elif pref == "course":
-                    # Check in name or description
-                    if (("RecipeName" in recipe and value.lower() in recipe["RecipeName"].lower()) or
-                        ("Description" in recipe and value.lower() in recipe["Description"].lower())):
-                        score += weight
-                        matches[pref] = True
-                
-                elif pref == "time":
-                    # Check if recipe mentions quick or time constraints
-                    if ("time" in recipe and value.lower() in recipe["time"].lower()) or \
-                       ("RecipeName" in recipe and "quick" in recipe["RecipeName"].lower()) or \
-                       ("Description" in recipe and "quick" in recipe["Description"].lower()):
-                        score += weight
-                        matches[pref] = True
-                
-                elif pref == "ingredient":
-                    # Check if ingredient is in recipe
-                    for ingredient in recipe.get("ingredients", []):
-                        if value.lower() in ingredient.lower():
-                            score += weight
-                            matches[pref] = True
-                            break
-                
-                elif pref == "taste":
-                    # Check if taste is mentioned in name or description
-                    if (("RecipeName" in recipe and value.lower() in recipe["RecipeName"].lower()) or
-                        ("Description" in recipe and value.lower() in recipe["Description"].lower()) or
-                        ("taste" in recipe and value.lower() in recipe["taste"].lower())):
-                        score += weight
-                        matches[pref] = True
+        # Hard filters: diet must match and excluded ingredients must be absent
+        candidates = index.all_positions()
+        if "diet" in preferences:
+            candidates &= index.match_preference("diet", preferences["diet"])
+        if "exclude_ingredient" in preferences:
+            candidates -= index.match_preference("exclude_ingredient", preferences["exclude_ingredient"])
+        if ranges:
+            in_range = _positions_in_ranges(index, ranges)
+            if in_range is not None:
+                candidates &= in_range
+        
+        # Posting lists of each scored preference, restricted to the candidates
+        matched_sets = []
+        for pref, weight in weights.items():
+            if pref not in preferences:
+                continue
             
-            # Add recipe with its score
-            scored_recipes.append({
+            if pref in ("diet", "exclude_ingredient"):
+                # Every candidate already satisfies the hard filters
+                matched = candidates
+            else:
+                matched = index.match_preference(pref, preferences[pref]) & candidates
+            matched_sets.append((pref, weight, matched))
+        
+        def score_of(position):
+            return sum((weight for _, weight, matched in matched_sets if position in matched), 0.0)
+        
+        # Stream the candidates through a bounded heap: highest score first,
+        # ties (including unmatched recipes) kept in collection order
+        top_positions = [
+            position for _, position in
+            heapq.nsmallest(WEIGHTED_TOP_K, ((-score_of(position), position) for position in candidates))
+        ]
+        scores = {position: score_of(position) for position in top_positions}
+        matches = {
+            position: {pref: True for pref, _, matched in matched_sets if position in matched}
+            for position in top_positions
+        }
+        
+        recipes = _hydrate_index_results(index, top_positions)
+        
+        detailed_results = []
+        for position in top_positions:
+            if position not in recipes:
+                continue
+            recipe = recipes[position]
+            recipe_matches = matches.get(position, {})
+            detailed_results.append({
                 "recipe": recipe,
-                "score": score,
-                "matches": matches,
-                "match_percentage": sum(1 for m in matches.values() if m) / len(preferences) if preferences else 0
+                "score": scores.get(position, 0.0),
+                "matches": recipe_matches,
+                "match_percentage": len(recipe_matches) / len(preferences) if preferences else 0
             })
         
-        # Sort by score (highest first)
-        scored_recipes.sort(key=lambda x: x["score"], reverse=True)
-        
         # Return top results with score information
         return {
-            "results": [item["recipe"] for item in scored_recipes[:10]],
-            "detailed_results": scored_recipes[:10],
-            "total_matches": len(scored_recipes),
+            "results": [item["recipe"] for item in detailed_results],
+            "detailed_results": detailed_results,
+            "total_matches": len(candidates),
             "relaxed": []  # No relaxation needed with scoring approach
         }
     
     except Exception as e:
         logger.error(f"Error in search_with_weighted_scoring: {e}")
+        search_cache.mark_degraded()
         # Fall back to basic search
         return search_with_fallback(preferences)
 
@@ -580,36 +602,13 @@ def extract_nutritional_preferences(text):
 
 # Add database optimization functions
 def create_optimized_indexes():
-    """Create optimized indexes for better performance"""
-    if not collection:
+    """Create optimized indexes for better performance (forces a rebuild)"""
+    collection = get_collection()
+    if collection is None:
         logger.warning("MongoDB not available, skipping index creation")
         return
     
     try:
-        # Text index for full-text search
-        collection.create_index([
-            ("RecipeName", "text"), 
-            ("Description", "text"),
-            ("ingredients", "text")
-        ])
-        
-        # Single field indexes for common queries
-        collection.create_index([("Cuisine", 1)])
-        collection.create_index([("diet", 1)])
-        collection.create_index([("course", 1)])
-        collection.create_index([("time", 1)])
-        
-        # Compound indexes for common combinations
-        collection.create_index([("diet", 1), ("Cuisine", 1)])
-        collection.create_index([("diet", 1), ("course", 1)])
-        
-        logger.info("Created optimized MongoDB indexes")
+        bootstrap_indexes(collection, force=True)
     except Exception as e:
-        logger.error(f"Error creating indexes: {e}")
-
-# Call this function during initialization
-create_optimized_indexes()
-
-# Initialize the database when the module is imported
-if collection:
-    initialize_db() 
\ No newline at end of file
+        logger.error(f"Error creating indexes: {e}")
\ No newline at end of file
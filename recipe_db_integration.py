@@ -2,7 +2,7 @@ from recipe_complexity import complexity_analyzer
 from recipe_substitution import substitution_engine
 from recipe_scaling import recipe_scaler
 from recipe_filter import recipe_filter
-from nutritional_analysis import extract_nutritional_requirements, meets_nutritional_requirements, get_nutritional_summary
+from nutritional_analysis import extract_nutritional_requirements, meets_nutritional_requirements, get_nutritional_summary, nutrition_range_query
 
 def get_enhanced_recipe(recipe_id: str, options: Dict[str, Any] = None) -> Dict[str, Any]:
     """Get a recipe with enhanced information"""
@@ -48,15 +48,7 @@ def search_recipes_advanced(query: Dict[str, Any]) -> Dict[str, Any]:
     nutritional_text = query.get("nutritional_text", "")
     nutritional_requirements = extract_nutritional_requirements(nutritional_text)
     
-    # Perform basic search
-    search_results = search_with_weighted_scoring(preferences)
-    recipes = search_results.get("results", [])
-    
-    # Apply nutritional filtering
-    if nutritional_requirements:
-        recipes = [r for r in recipes if meets_nutritional_requirements(r, nutritional_requirements)]
-    
-    # Apply additional filtering
+    # Additional filtering
     filters = {}
     if "max_time" in query:
         filters["max_time"] = int(query["max_time"])
@@ -67,6 +59,18 @@ def search_recipes_advanced(query: Dict[str, Any]) -> Dict[str, Any]:
     if "min_rating" in query:
         filters["rating"] = float(query["min_rating"])
     
+    # Numeric limits run as indexed range queries inside the search
+    ranges = nutrition_range_query(nutritional_requirements)
+    ranges.update(recipe_filter.range_query(filters))
+    
+    # Perform basic search
+    search_results = search_with_weighted_scoring(preferences, ranges=ranges or None)
+    recipes = search_results.get("results", [])
+    
+    # Apply nutritional filtering (cheap on the precomputed fields; covers legacy imports)
+    if nutritional_requirements:
+        recipes = [r for r in recipes if meets_nutritional_requirements(r, nutritional_requirements)]
+    
     if filters:
         recipes = recipe_filter.filter_recipes(recipes, filters)
     
@@ -1,8 +1,10 @@
 import logging
 from typing import Dict, List, Any, Optional, Callable
-import re
 from datetime import datetime
 
+from preference_filter import recipe_total_minutes
+from recipe_complexity import complexity_analyzer
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -43,8 +45,9 @@ class RecipeFilter:
             "name": lambda r: r.get("RecipeName", "").lower(),
             "time": RecipeFilter._extract_time_minutes,
             "rating": lambda r: r.get("rating", 0),
-            "calories": lambda r: r.get("nutrition", {}).get("calories", 1000),
-            "protein": lambda r: r.get("nutrition", {}).get("protein", 0),
+            "calories": lambda r: RecipeFilter._nutrient(r, "calories", 1000),
+            "protein": lambda r: RecipeFilter._nutrient(r, "protein", 0),
+            "complexity": complexity_analyzer.complexity_score,
             "date_added": lambda r: datetime.fromisoformat(r.get("date_added", "2000-01-01T00:00:00"))
         }
         
@@ -113,7 +116,7 @@ class RecipeFilter:
         if not max_calories:
             return recipes
         
-        return [r for r in recipes if r.get("nutrition", {}).get("calories", 1000) <= max_calories]
+        return [r for r in recipes if RecipeFilter._nutrient(r, "calories", 1000) <= max_calories]
     
     @staticmethod
     def filter_by_min_protein(recipes: List[Dict[str, Any]], min_protein: int) -> List[Dict[str, Any]]:
@@ -121,7 +124,7 @@ class RecipeFilter:
         if not min_protein:
             return recipes
         
-        return [r for r in recipes if r.get("nutrition", {}).get("protein", 0) >= min_protein]
+        return [r for r in recipes if RecipeFilter._nutrient(r, "protein", 0) >= min_protein]
     
     @staticmethod
     def filter_by_course(recipes: List[Dict[str, Any]], course: str) -> List[Dict[str, Any]]:
@@ -149,25 +152,31 @@ class RecipeFilter:
         
         return [r for r in recipes if r.get("rating", 0) >= min_rating]
     
+    @staticmethod
+    def range_query(filters: Dict[str, Any]) -> Dict[str, Any]:
+        """MongoDB range clauses for the numeric filters, on the fields written at import"""
+        query = {}
+        if filters.get("max_time"):
+            query["total_minutes"] = {"$lte": filters["max_time"]}
+        if filters.get("max_calories"):
+            query["calories"] = {"$lte": filters["max_calories"]}
+        if filters.get("min_protein"):
+            query["protein"] = {"$gte": filters["min_protein"]}
+        return query
+    
+    @staticmethod
+    def _nutrient(recipe: Dict[str, Any], nutrient: str, default: float) -> float:
+        """Per-serving nutrient from the imported field, else the nested nutrition dict"""
+        value = recipe.get(nutrient)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return value
+        return recipe.get("nutrition", {}).get(nutrient, default)
+    
     @staticmethod
     def _extract_time_minutes(recipe: Dict[str, Any]) -> int:
         """Extract cooking time in minutes from recipe"""
-        time_str = recipe.get("time", "")
-        if not time_str:
-            return 60  # Default to 60 minutes
-        
-        # Try to extract minutes
-        minutes_match = re.search(r'(\d+)\s*min', time_str.lower())
-        if minutes_match:
-            return int(minutes_match.group(1))
-        
-        # Try to extract hours and convert to minutes
-        hours_match = re.search(r'(\d+)\s*hour', time_str.lower())
-        if hours_match:
-            return int(hours_match.group(1)) * 60
-        
-        # If no match, return default
-        return 60
+        minutes = recipe_total_minutes(recipe)
+        return 60 if minutes is None else minutes  # Default to 60 minutes
 
 # Create a filter instance
 recipe_filter = RecipeFilter() 
\ No newline at end of file
@@ -0,0 +1,193 @@
+import logging
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, List, Any, Optional, Set, Iterable
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Words are kept together across hyphens so labels like "gluten-free" stay one token
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+def normalize_token(token: str) -> str:
+    """Reduce a token to a simple singular form ("tomatoes" -> "tomato", "eggs" -> "egg")"""
+    if len(token) > 4 and token.endswith("oes"):
+        return token[:-2]
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+def tokenize(value: Any) -> List[str]:
+    """Split a string (or list of strings) into normalized search tokens"""
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        value = " ".join(str(v) for v in value if v)
+    return [normalize_token(token) for token in TOKEN_PATTERN.findall(str(value).lower())]
+
+def normalize_label(value: Any) -> str:
+    """Normalize a categorical label such as a diet ("Gluten Free" -> "gluten-free")"""
+    return "-".join(str(value).lower().split())
+
+class RecipeIndex:
+    """Memory-resident inverted index over recipe search fields"""
+
+    # Posting lists kept per field; "text" covers recipe name and description
+    FIELDS = ["diet", "cuisine", "course", "ingredient", "taste", "time", "text"]
+
+    # Scoring fields fetched from MongoDB to build the index; long fields such as
+    # instructions, Description and URL stay on the server
+    INDEX_PROJECTION = {
+        "RecipeName": 1,
+        "Cuisine": 1,
+        "diet": 1,
+        "cleaned_ingredients": 1,
+        "TotalTimeInMins": 1,
+        "course": 1,
+        "taste": 1,
+        "time": 1,
+        # Precomputed at import from ingredients and name/description
+        "ingredient_tokens": 1,
+        "search_tokens": 1
+    }
+
+    # Collections imported before the token fields existed need the raw text
+    LEGACY_INDEX_PROJECTION = dict(INDEX_PROJECTION, Description=1, ingredients=1)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.invalidate()
+
+    def invalidate(self):
+        """Drop the index so it is rebuilt on next use"""
+        self.postings: Dict[str, Dict[str, Set[int]]] = {field: defaultdict(set) for field in self.FIELDS}
+        self.recipe_ids: List[Any] = []
+        self.positions: Dict[Any, int] = {}
+        self.recipes: Dict[Any, Dict[str, Any]] = {}
+        self.source: Optional[str] = None
+        self.built = False
+
+    def build_from_collection(self, collection, legacy_schema: bool = False) -> "RecipeIndex":
+        """Build the index with a single projected scan of the recipe collection"""
+        projection = self.LEGACY_INDEX_PROJECTION if legacy_schema else self.INDEX_PROJECTION
+        with self._lock:
+            self.invalidate()
+            for recipe in collection.find({}, projection):
+                self.add_recipe(recipe["_id"], recipe)
+            self.source = "mongodb"
+            self.built = True
+        logger.info(f"Built recipe index over {len(self.recipe_ids)} recipes")
+        return self
+
+    def build_from_recipes(self, recipes: Iterable[Dict[str, Any]]) -> "RecipeIndex":
+        """Build the index over an in-memory recipe list (keeps the documents)"""
+        with self._lock:
+            self.invalidate()
+            for position, recipe in enumerate(recipes):
+                recipe_id = recipe.get("_id", position)
+                self.recipes[recipe_id] = recipe
+                self.add_recipe(recipe_id, recipe)
+            self.source = "local"
+            self.built = True
+        return self
+
+    def add_recipe(self, recipe_id: Any, recipe: Dict[str, Any]):
+        """Add a single recipe's tokens to the posting lists"""
+        position = len(self.recipe_ids)
+        self.recipe_ids.append(recipe_id)
+        self.positions[recipe_id] = position
+
+        diets = recipe.get("diet") or []
+        if isinstance(diets, str):
+            diets = [diets]
+        for diet in diets:
+            self.postings["diet"][normalize_label(diet)].add(position)
+
+        # Prefer the base ingredient names produced at import time
+        ingredients = recipe.get("cleaned_ingredients") or recipe.get("ingredients") or []
+
+        fields = {
+            "cuisine": recipe.get("Cuisine") or recipe.get("cuisine"),
+            "course": recipe.get("course"),
+            "ingredient": ingredients,
+            "taste": recipe.get("taste"),
+            "time": recipe.get("time"),
+            "text": [recipe.get("RecipeName") or recipe.get("name") or "", recipe.get("Description") or ""]
+        }
+        # Token fields written at import are already normalized
+        pretokenized = {
+            "ingredient": recipe.get("ingredient_tokens"),
+            "text": recipe.get("search_tokens")
+        }
+        for field, value in fields.items():
+            tokens = pretokenized.get(field) or tokenize(value)
+            for token in tokens:
+                self.postings[field][token].add(position)
+
+    def lookup(self, field: str, value: Any) -> Set[int]:
+        """Return positions whose field contains every token of value"""
+        if field == "diet":
+            return set(self.postings["diet"].get(normalize_label(value), ()))
+
+        tokens = tokenize(value)
+        if not tokens:
+            return set()
+
+        postings = self.postings[field]
+        # Intersect the shortest posting lists first
+        lists = sorted((postings.get(token, set()) for token in set(tokens)), key=len)
+        result = set(lists[0])
+        for posting in lists[1:]:
+            if not result:
+                break
+            result &= posting
+        return result
+
+    def lookup_substring(self, field: str, value: Any) -> Set[int]:
+        """Return positions whose field has, for every token of value, a token containing it
+
+        Scans the field's token vocabulary, so "nut" also finds "walnut" and
+        "peanut" as the substring $regex did.
+        """
+        postings = self.postings[field]
+        result: Optional[Set[int]] = None
+        for needle in set(tokenize(value)):
+            matched = set()
+            for token, positions in postings.items():
+                if needle in token:
+                    matched |= positions
+            result = matched if result is None else result & matched
+            if not result:
+                break
+        return result or set()
+
+    def match_preference(self, preference: str, value: Any) -> Set[int]:
+        """Return positions matching a chat preference"""
+        if preference == "diet":
+            return self.lookup("diet", value)
+        if preference == "ingredient":
+            return self.lookup("ingredient", value)
+        if preference == "exclude_ingredient":
+            # A hard filter: leave out anything whose ingredients merely contain the value
+            return self.lookup_substring("ingredient", value)
+        if preference == "cuisine":
+            return self.lookup("cuisine", value)
+        if preference == "course":
+            return self.lookup("course", value) | self.lookup("text", value)
+        if preference == "taste":
+            return self.lookup("taste", value) | self.lookup("text", value)
+        if preference == "time":
+            # Recipes whose time mentions the value, or that advertise themselves as quick
+            return self.lookup("time", value) | self.lookup("text", "quick")
+        return set()
+
+    def all_positions(self) -> Set[int]:
+        """Return every indexed position"""
+        return set(range(len(self.recipe_ids)))
+
+# Create an index instance (built lazily by recipe_db)
+recipe_index = RecipeIndex()
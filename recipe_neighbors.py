@@ -0,0 +1,334 @@
+import hashlib
+import logging
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Saved next to data/recipe_features.json
+NEIGHBOR_INDEX_PATH = os.path.join("data", "recipe_neighbors.npz")
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest finite scores, best first (ties by position)"""
+    candidates = np.flatnonzero(np.isfinite(scores))
+    if len(candidates) > k:
+        # Keep every candidate tied with the k-th score so ties resolve by position
+        threshold = np.partition(scores[candidates], len(candidates) - k)[len(candidates) - k]
+        candidates = candidates[scores[candidates] >= threshold]
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order][:k]
+
+def weakest_kept_scores(table: sparse.csr_matrix, k: int) -> np.ndarray:
+    """Lowest score in each neighbor table row holding k or more neighbors (0 in the other rows)"""
+    counts = np.diff(table.indptr)
+    weakest = np.zeros(table.shape[0], dtype=np.float32)
+    nonempty = counts > 0
+    if nonempty.any():
+        # reduceat spans run from one start to the next, so every non-empty row needs its own
+        minima = np.zeros(table.shape[0], dtype=np.float32)
+        minima[nonempty] = np.minimum.reduceat(table.data, table.indptr[:-1][nonempty])
+        full_rows = counts >= k
+        weakest[full_rows] = minima[full_rows]
+    return weakest
+
+def fingerprint(vectors: sparse.csr_matrix, recipe_ids: List[str]) -> str:
+    """Digest of the vectors and their ids, used to tell whether a saved index still applies"""
+    digest = hashlib.sha1()
+    for array in (vectors.indptr, vectors.indices, vectors.data):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    digest.update("\0".join(recipe_ids).encode())
+    return digest.hexdigest()
+
+class NeighborIndex:
+    """Top-k cosine neighbors over L2-normalized recipe vectors
+
+    Catalogs of up to exact_limit recipes are searched exactly, one sparse
+    product per query. Larger catalogs use random-projection LSH: each of
+    n_tables tables hashes a vector to the signs of n_bits random projections,
+    and only recipes sharing a bucket with the query are scored.
+    """
+
+    def __init__(self, exact_limit: int = 20000, n_tables: int = 8, n_bits: Optional[int] = None,
+                 block_size: int = 256, seed: int = 42):
+        self.exact_limit = exact_limit
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.block_size = block_size
+        self.seed = seed
+        self.vectors: Optional[sparse.csr_matrix] = None
+        self.fingerprint: Optional[str] = None
+        self._reset()
+
+    def _reset(self):
+        # LSH tables: per table, the sorted distinct signatures, where each
+        # bucket starts in members, and the recipe positions sorted by signature
+        self.planes: Optional[np.ndarray] = None
+        self.signatures: Optional[np.ndarray] = None
+        self.bucket_keys: List[np.ndarray] = []
+        self.bucket_starts: List[np.ndarray] = []
+        self.bucket_members: List[np.ndarray] = []
+        # Cached top-k neighbor table (see neighbor_table)
+        self.table: Optional[sparse.csr_matrix] = None
+        self.table_k = 0
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0] if self.vectors is not None else 0
+
+    @property
+    def approximate(self) -> bool:
+        """Whether queries go through the LSH tables"""
+        return self.planes is not None
+
+    def build(self, vectors: sparse.csr_matrix, recipe_ids: List[str]):
+        """Index row-normalized vectors (row i belongs to recipe_ids[i])"""
+        self.vectors = sparse.csr_matrix(vectors)
+        self.fingerprint = fingerprint(self.vectors, recipe_ids)
+        self._reset()
+        if len(self) > self.exact_limit:
+            self._build_lsh()
+        logger.info(f"Built {'LSH' if self.approximate else 'exact'} neighbor index for {len(self)} recipes")
+
+    def _build_lsh(self):
+        n, dimensions = self.vectors.shape
+        # Aim for a few dozen recipes per bucket
+        n_bits = self.n_bits or int(np.clip(np.log2(max(n, 1) / 32), 4, 24))
+        rng = np.random.default_rng(self.seed)
+        self.planes = rng.standard_normal((dimensions, self.n_tables * n_bits)).astype(np.float32)
+
+        self.signatures = self._signatures(self.vectors)
+        self._index_signatures()
+
+    def _index_signatures(self):
+        """Group positions into buckets by signature, one sorted array per table"""
+        n = len(self.signatures)
+        self.bucket_keys, self.bucket_starts, self.bucket_members = [], [], []
+        for table in range(self.n_tables):
+            order = np.argsort(self.signatures[:, table], kind="stable")
+            keys, starts = np.unique(self.signatures[order, table], return_index=True)
+            self.bucket_keys.append(keys)
+            self.bucket_starts.append(np.append(starts, n))
+            self.bucket_members.append(order)
+
+    def update(self, vectors: sparse.csr_matrix, recipe_ids: List[str], positions: np.ndarray):
+        """Re-index changed or appended rows (positions) of vectors without rebuilding the index
+
+        vectors may have gained rows and feature columns since the last build.
+        """
+        n_before = len(self)
+        self.vectors = sparse.csr_matrix(vectors)
+        self.fingerprint = fingerprint(self.vectors, recipe_ids)
+
+        if not self.approximate and len(self) > self.exact_limit:
+            # Crossed into LSH territory; the neighbor table is rebuilt on next use
+            self._reset()
+            self._build_lsh()
+            logger.info(f"Switched neighbor index to LSH at {len(self)} recipes")
+            return
+
+        if self.approximate:
+            # Features first seen since the build get their own random projections
+            new_features = self.vectors.shape[1] - self.planes.shape[0]
+            if new_features > 0:
+                rng = np.random.default_rng((self.seed, self.planes.shape[0]))
+                extra = rng.standard_normal((new_features, self.planes.shape[1])).astype(np.float32)
+                self.planes = np.vstack([self.planes, extra])
+            signatures = np.zeros((len(self), self.n_tables), dtype=np.int64)
+            signatures[:n_before] = self.signatures
+            signatures[positions] = self._signatures(self.vectors[positions])
+            self.signatures = signatures
+            self._index_signatures()
+
+        if self.table is not None:
+            self._update_table(n_before, positions)
+
+    def _update_table(self, n_before: int, positions: np.ndarray):
+        """Recompute the neighbor table rows affected by the changed recipes"""
+        n = len(self)
+        changed = np.zeros(n, dtype=bool)
+        changed[positions] = True
+        changed[n_before:] = True
+        changed_positions = np.flatnonzero(changed)
+        table = self.table.copy()
+        table.resize((n, n))
+
+        # Stale rows: the changed recipes, rows that listed one of them, and rows
+        # where one now beats the weakest kept neighbor (an n x m product)
+        stale = changed.copy()
+        stale[np.unique(table[:, changed_positions].tocoo().row)] = True
+        weakest = weakest_kept_scores(table, self.table_k)
+        scores = (self.vectors @ self.vectors[changed_positions].T).toarray()
+        stale |= (scores > weakest[:, None]).any(axis=1)
+
+        keep = sparse.diags((~stale).astype(np.float32))
+        table = sparse.csr_matrix(keep @ table)
+        rows, columns, values = [], [], []
+        for position in np.flatnonzero(stale):
+            for neighbor, score in self.neighbors(int(position), self.table_k):
+                rows.append(position)
+                columns.append(neighbor)
+                values.append(score)
+        if rows:
+            table = table + sparse.csr_matrix(
+                (np.asarray(values, dtype=np.float32), (np.asarray(rows), np.asarray(columns))), shape=(n, n)
+            )
+        self.table = sparse.csr_matrix(table)
+        self.table.eliminate_zeros()
+
+    def _signatures(self, vectors: sparse.csr_matrix) -> np.ndarray:
+        """LSH bucket of each row in each table, as an (rows, n_tables) integer array"""
+        n_bits = self.planes.shape[1] // self.n_tables
+        weights = np.left_shift(1, np.arange(n_bits, dtype=np.int64))
+        signatures = np.empty((vectors.shape[0], self.n_tables), dtype=np.int64)
+        for start in range(0, vectors.shape[0], self.block_size):
+            projected = np.asarray(vectors[start:start + self.block_size] @ self.planes)
+            bits = (projected > 0).reshape(-1, self.n_tables, n_bits)
+            signatures[start:start + self.block_size] = bits.astype(np.int64) @ weights
+        return signatures
+
+    def _candidates(self, signature: np.ndarray) -> np.ndarray:
+        """Positions sharing at least one bucket with a signature"""
+        found = []
+        for table, key in enumerate(signature):
+            keys = self.bucket_keys[table]
+            i = np.searchsorted(keys, key)
+            if i < len(keys) and keys[i] == key:
+                starts = self.bucket_starts[table]
+                found.append(self.bucket_members[table][starts[i]:starts[i + 1]])
+        # A mask is cheaper than np.unique for merging the buckets
+        mask = np.zeros(len(self), dtype=bool)
+        for members in found:
+            mask[members] = True
+        return np.flatnonzero(mask)
+
+    def query(self, vector: sparse.csr_matrix, k: int, exclude: Optional[int] = None,
+              signature: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """(position, similarity) of the k recipes most similar to a normalized 1 x d vector"""
+        if not len(self) or k <= 0:
+            return []
+
+        candidates = None
+        if self.approximate:
+            candidates = self._candidates(signature if signature is not None else self._signatures(vector)[0])
+        if candidates is None or len(candidates) <= k:
+            # Exact search (also the fallback when the buckets are too sparse)
+            candidates = np.arange(len(self))
+            scores = (self.vectors @ vector.T).toarray().ravel()
+        else:
+            scores = (self.vectors[candidates] @ vector.T).toarray().ravel()
+        if exclude is not None:
+            scores[candidates == exclude] = -np.inf
+
+        best = top_k(scores, k)
+        return [(int(candidates[i]), float(scores[i])) for i in best]
+
+    def neighbors(self, position: int, k: int) -> List[Tuple[int, float]]:
+        """The k nearest neighbors of an indexed recipe, excluding itself"""
+        signature = self.signatures[position] if self.approximate else None
+        return self.query(self.vectors[position], k, exclude=position, signature=signature)
+
+    def neighbor_table(self, k: int) -> sparse.csr_matrix:
+        """Each recipe's top-k similarities as a sparse n x n matrix (self excluded)
+
+        Exact indexes score one block of rows against all recipes at a time, so
+        at most block_size x n similarities are held in memory.
+        """
+        if self.table is not None and self.table_k == k:
+            return self.table
+
+        n = len(self)
+        k = max(min(k, n - 1), 0)
+        rows, columns, values = [], [], []
+        for start in range(0, n if k else 0, self.block_size):
+            stop = min(start + self.block_size, n)
+            if self.approximate:
+                for position in range(start, stop):
+                    found = self.neighbors(position, k)
+                    rows.extend([position] * len(found))
+                    columns.extend(p for p, _ in found)
+                    values.extend(s for _, s in found)
+                continue
+
+            scores = (self.vectors[start:stop] @ self.vectors.T).toarray()
+            scores[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+            best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            rows.append(np.repeat(np.arange(start, stop), k))
+            columns.append(best.ravel())
+            values.append(np.take_along_axis(scores, best, axis=1).ravel())
+
+        if rows and not self.approximate:
+            rows, columns, values = np.concatenate(rows), np.concatenate(columns), np.concatenate(values)
+        table = sparse.csr_matrix(
+            (np.asarray(values, dtype=np.float32), (np.asarray(rows, dtype=np.int64), np.asarray(columns, dtype=np.int64))),
+            shape=(n, n)
+        )
+        table.eliminate_zeros()
+        self.table, self.table_k = table, k
+        return table
+
+    def save(self, path: str = NEIGHBOR_INDEX_PATH):
+        """Write the index to disk (atomically replacing any previous one)"""
+        arrays = {"fingerprint": np.array(self.fingerprint or "")}
+        if self.approximate:
+            arrays["planes"] = self.planes
+            arrays["signatures"] = self.signatures
+            for table in range(self.n_tables):
+                arrays[f"keys_{table}"] = self.bucket_keys[table]
+                arrays[f"starts_{table}"] = self.bucket_starts[table]
+                arrays[f"members_{table}"] = self.bucket_members[table]
+        if self.table is not None:
+            arrays["table_k"] = np.array(self.table_k)
+            arrays["table_indptr"] = self.table.indptr
+            arrays["table_indices"] = self.table.indices
+            arrays["table_data"] = self.table.data
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(temp_path, path)
+
+    def load(self, vectors: sparse.csr_matrix, recipe_ids: List[str], path: str = NEIGHBOR_INDEX_PATH) -> bool:
+        """Restore a saved index if it was built from exactly these vectors; False otherwise"""
+        if not os.path.exists(path):
+            return False
+        vectors = sparse.csr_matrix(vectors)
+        expected = fingerprint(vectors, recipe_ids)
+        try:
+            with np.load(path) as saved:
+                # Stale if the recipes changed or the catalog crossed exact_limit since
+                approximate = vectors.shape[0] > self.exact_limit
+                if str(saved["fingerprint"]) != expected or ("planes" in saved) != approximate:
+                    logger.info(f"Neighbor index at {path} is stale")
+                    return False
+                self.vectors = vectors
+                self.fingerprint = expected
+                self._reset()
+                if "planes" in saved:
+                    self.planes = saved["planes"]
+                    self.signatures = saved["signatures"]
+                    self.n_tables = len([name for name in saved.files if name.startswith("keys_")])
+                    for table in range(self.n_tables):
+                        self.bucket_keys.append(saved[f"keys_{table}"])
+                        self.bucket_starts.append(saved[f"starts_{table}"])
+                        self.bucket_members.append(saved[f"members_{table}"])
+                if "table_k" in saved:
+                    n = len(self)
+                    self.table = sparse.csr_matrix(
+                        (saved["table_data"], saved["table_indices"], saved["table_indptr"]), shape=(n, n)
+                    )
+                    self.table_k = int(saved["table_k"])
+        except Exception as e:
+            logger.error(f"Error loading neighbor index from {path}: {e}")
+            self.vectors = None
+            self._reset()
+            return False
+
+        logger.info(f"Loaded neighbor index for {len(self)} recipes from {path}")
+        return True
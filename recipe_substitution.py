@@ -2,6 +2,7 @@ import logging
 from typing import Dict, List, Any, Optional, Tuple
 import json
 import os
+from substitution_matcher import SubstitutionMatcher
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -13,6 +14,8 @@ class RecipeSubstitutionEngine:
     def __init__(self):
         self.substitutions = {}
         self.dietary_substitutions = {}
+        self.substitution_matcher = SubstitutionMatcher({})
+        self.dietary_matchers = {}
         self.load_substitution_data()
     
     def load_substitution_data(self):
@@ -31,6 +34,16 @@ class RecipeSubstitutionEngine:
                 logger.info(f"Loaded dietary substitutions for {len(self.dietary_substitutions)} diets")
         except Exception as e:
             logger.error(f"Error loading substitution data: {e}")
+        
+        self.compile_matchers()
+    
+    def compile_matchers(self):
+        """Compile the substitution vocabularies into multi-pattern matchers"""
+        self.substitution_matcher = SubstitutionMatcher(self.substitutions)
+        self.dietary_matchers = {
+            diet: SubstitutionMatcher(diet_subs)
+            for diet, diet_subs in self.dietary_substitutions.items()
+        }
     
     def find_substitutions(self, ingredient: str) -> List[Dict[str, Any]]:
         """Find substitutions for a specific ingredient"""
@@ -45,9 +58,8 @@ class RecipeSubstitutionEngine:
         
         # Partial match
         matches = []
-        for key in self.substitutions:
-            if key in ingredient or ingredient in key:
-                matches.extend(self.substitutions[key])
+        for key in self.substitution_matcher.related_keys(ingredient):
+            matches.extend(self.substitutions[key])
         
         return matches
     
@@ -71,9 +83,8 @@ class RecipeSubstitutionEngine:
         
         # Partial match
         matches = []
-        for key in diet_subs:
-            if key in ingredient or ingredient in key:
-                matches.extend(diet_subs[key])
+        for key in self.dietary_matchers[diet].related_keys(ingredient):
+            matches.extend(diet_subs[key])
         
         return matches
     
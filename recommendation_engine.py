@@ -1,158 +1,471 @@
 import logging
 import numpy as np
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Set, Tuple
 import os
 import json
+import time
 from collections import defaultdict
 
+from scipy import sparse
+
+from preference_filter import recipe_total_minutes
+from recipe_neighbors import NeighborIndex, top_k
+from recommender_store import RecommenderStore, read_jsonl
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Above this many recipes only each recipe's top neighbors are kept instead of all pairs
+DENSE_SIMILARITY_LIMIT = int(os.environ.get("RECOMMENDER_DENSE_LIMIT", "2000"))
+NEIGHBORS_PER_RECIPE = int(os.environ.get("RECOMMENDER_NEIGHBORS", "50"))
+
+# Updates are appended to the store's logs; the binary store is rewritten after this many of either
+FEATURES_COMPACT_EVERY = int(os.environ.get("RECOMMENDER_COMPACT_EVERY", "1000"))
+RATINGS_COMPACT_EVERY = int(os.environ.get("RECOMMENDER_RATINGS_COMPACT_EVERY", "10000"))
+
+# Files written before the binary store; read once and migrated
+LEGACY_PREFERENCES_PATH = os.path.join("data", "user_preferences.json")
+LEGACY_FEATURES_PATH = os.path.join("data", "recipe_features.json")
+LEGACY_FEATURES_LOG_PATH = os.path.join("data", "recipe_features.jsonl")
+
+# Precomputed top-N lists (precompute_recommendations), served by get_personalized_recommendations
+RECOMMENDATIONS_PATH = os.path.join("data", "recommendations.json")
+# Users scored per sparse product in batch predictions
+USER_BLOCK_SIZE = 256
+
+def row_norms(matrix: sparse.csr_matrix) -> np.ndarray:
+    """L2 norm of each row"""
+    return np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1), dtype=np.float64).ravel()).astype(np.float32)
+
+def normalize_rows(matrix: sparse.csr_matrix, norms: Optional[np.ndarray] = None) -> sparse.csr_matrix:
+    """Scale each row to unit L2 norm (all-zero rows stay zero)"""
+    norms = np.array(row_norms(matrix) if norms is None else norms, dtype=np.float64)
+    norms[norms == 0] = 1.0
+    return sparse.csr_matrix(sparse.diags(1.0 / norms) @ matrix, dtype=np.float32)
+
 class RecipeRecommender:
     """Recipe recommendation engine using collaborative filtering"""
     
     def __init__(self):
-        self.user_preferences = {}
-        self.recipe_features = {}
-        self.recipe_similarity = {}
+        self.store = RecommenderStore()
+        # Row-normalized feature matrix (and each row's original norm) and the cosine similarities derived from it
+        self.recipe_ids: List[str] = []
+        self.recipe_positions: Dict[str, int] = {}
+        self.feature_names: Dict[str, int] = {}
+        self.feature_matrix: Optional[sparse.csr_matrix] = None
+        self.feature_norms = np.zeros(0, dtype=np.float32)
+        self.neighbor_index = NeighborIndex(exact_limit=int(os.environ.get("RECOMMENDER_EXACT_LIMIT", "20000")))
+        # Dense all-pairs array for small catalogs, sparse top-k neighbor table for large ones
+        self.recipe_similarity = None
+        self._similarity_buffer: Optional[np.ndarray] = None
+        self._features_logged = 0
+        # Saved user x rated-recipe ratings, plus the ratings logged since (applied on top)
+        self.user_ids: List[str] = []
+        self.user_positions: Dict[str, int] = {}
+        self.rated_recipe_ids: List[str] = []
+        self.rated_recipe_columns: Dict[str, int] = {}
+        self.ratings: Optional[sparse.csr_matrix] = None
+        self._rating_updates: Dict[str, Dict[str, float]] = {}
+        self._ratings_logged = 0
+        # User x recipe-position ratings used for prediction, rebuilt after changes
+        self._position_ratings: Optional[sparse.csr_matrix] = None
+        self._ratings_dirty = True
+        self.recommendation_cache: Dict[str, List[str]] = {}
+        self.recommendation_cache_size = 0
+        # The nightly job rewrites the file from another process; reloaded when its mtime changes
+        self._recommendations_mtime: Optional[float] = None
+        # Users whose ratings may be newer than the precomputed file; scored live instead
+        self._stale_recommendations: Set[str] = set()
         self.load_data()
     
     def load_data(self):
         """Load user preferences and recipe features"""
         try:
-            # Load user preferences if available
-            if os.path.exists("data/user_preferences.json"):
-                with open("data/user_preferences.json", "r") as f:
-                    self.user_preferences = json.load(f)
-                logger.info(f"Loaded preferences for {len(self.user_preferences)} users")
+            migrate = False
+            if self.store.exists():
+                self._load_store()
+            else:
+                migrate = self._load_json()
             
-            # Load recipe features if available
-            if os.path.exists("data/recipe_features.json"):
-                with open("data/recipe_features.json", "r") as f:
-                    self.recipe_features = json.load(f)
-                logger.info(f"Loaded features for {len(self.recipe_features)} recipes")
+            # Replay updates made since the last save
+            logged_features = self.store.read_log("features")
+            self._place_feature_rows({entry["id"]: entry["features"] for entry in logged_features})
+            self._features_logged = len(logged_features)
+            logged_ratings = self.store.read_log("ratings")
+            for entry in logged_ratings:
+                self._set_rating(entry["user"], entry["recipe"], entry["rating"])
+            self._ratings_logged = len(logged_ratings)
+            self._stale_recommendations.update(entry["user"] for entry in logged_ratings)
+            if logged_features or logged_ratings:
+                logger.info(f"Replayed {len(logged_features)} feature and {len(logged_ratings)} rating updates")
             
             # Compute recipe similarity matrix
             self._compute_recipe_similarity()
+            if migrate:
+                self.save()
+            
+            # Load precomputed recommendations if available
+            self._load_recommendations()
         except Exception as e:
             logger.error(f"Error loading recommendation data: {e}")
     
-    def _compute_recipe_similarity(self):
-        """Compute similarity between recipes based on features"""
-        if not self.recipe_features:
+    def _load_recommendations(self):
+        """Load the precomputed recommendations if the file changed since the last load"""
+        try:
+            mtime = os.path.getmtime(RECOMMENDATIONS_PATH)
+        except OSError:
+            return
+        if mtime == self._recommendations_mtime:
             return
         
-        # Convert features to vectors
-        recipe_ids = list(self.recipe_features.keys())
-        feature_names = set()
+        try:
+            with open(RECOMMENDATIONS_PATH, "r") as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error loading precomputed recommendations: {e}")
+            return
+        recommendations = saved["recommendations"]
+        for user_id in self._stale_recommendations:
+            recommendations.pop(user_id, None)
+        self.recommendation_cache = recommendations
+        self.recommendation_cache_size = saved["n"]
+        self._recommendations_mtime = mtime
+        logger.info(f"Loaded precomputed recommendations for {len(self.recommendation_cache)} users")
+    
+    def _load_store(self):
+        """Map the saved arrays; nothing is parsed beyond the ID lists"""
+        state = self.store.load()
+        ids = state["ids"]
+        self.recipe_ids = ids["recipes"]
+        self.recipe_positions = {recipe_id: i for i, recipe_id in enumerate(self.recipe_ids)}
+        self.feature_names = {feature: i for i, feature in enumerate(ids["features"])}
+        self.feature_matrix = state["matrices"]["features"]
+        self.feature_norms = state["arrays"]["feature_norms"]
+        self.user_ids = ids["users"]
+        self.user_positions = {user_id: i for i, user_id in enumerate(self.user_ids)}
+        self.rated_recipe_ids = ids["rated_recipes"]
+        self.rated_recipe_columns = {recipe_id: i for i, recipe_id in enumerate(self.rated_recipe_ids)}
+        self.ratings = state["matrices"]["ratings"]
+        logger.info(f"Loaded features for {len(self.recipe_ids)} recipes and preferences for {len(self.user_ids)} users")
+    
+    def _load_json(self) -> bool:
+        """Read the JSON files used before the binary store; True if there was anything to migrate"""
+        preferences = {}
+        features = {}
+        if os.path.exists(LEGACY_PREFERENCES_PATH):
+            with open(LEGACY_PREFERENCES_PATH, "r") as f:
+                preferences = json.load(f)
+            logger.info(f"Loaded preferences for {len(preferences)} users")
+        if os.path.exists(LEGACY_FEATURES_PATH):
+            with open(LEGACY_FEATURES_PATH, "r") as f:
+                features = json.load(f)
+        for entry in read_jsonl(LEGACY_FEATURES_LOG_PATH):
+            features[entry["id"]] = entry["features"]
+        if features:
+            logger.info(f"Loaded features for {len(features)} recipes")
         
-        # Collect all possible feature names
-        for features in self.recipe_features.values():
-            feature_names.update(features.keys())
+        self._place_feature_rows(features)
+        for user_id, user_ratings in preferences.items():
+            for recipe_id, rating in user_ratings.items():
+                self._set_rating(user_id, recipe_id, rating)
+        return bool(features or preferences)
+    
+    @property
+    def recipe_features(self) -> Dict[str, Dict[str, float]]:
+        """Feature dicts per recipe, rebuilt from the feature matrix"""
+        if self.feature_matrix is None:
+            return {}
+        names = list(self.feature_names)
+        matrix = sparse.csr_matrix(sparse.diags(self.feature_norms) @ self.feature_matrix)
+        return {
+            recipe_id: {
+                names[j]: float(value)
+                for j, value in zip(matrix.indices[matrix.indptr[i]:matrix.indptr[i + 1]], matrix.data[matrix.indptr[i]:matrix.indptr[i + 1]])
+            }
+            for i, recipe_id in enumerate(self.recipe_ids)
+        }
+    
+    def _feature_rows(self, feature_dicts: List[Dict[str, float]]) -> sparse.csr_matrix:
+        """Feature dicts as sparse rows, adding unseen features as new columns"""
+        indptr = [0]
+        indices = []
+        data = []
+        for features in feature_dicts:
+            for feature, value in features.items():
+                indices.append(self.feature_names.setdefault(feature, len(self.feature_names)))
+                data.append(value)
+            indptr.append(len(indices))
         
-        feature_names = list(feature_names)
+        return sparse.csr_matrix(
+            (np.array(data, dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+            shape=(len(feature_dicts), len(self.feature_names))
+        )
+    
+    def _place_feature_rows(self, features: Dict[str, Dict[str, float]]) -> Tuple[np.ndarray, sparse.csr_matrix]:
+        """Write normalized feature rows into the feature matrix; returns their positions and the rows"""
+        if not features:
+            return np.zeros(0, dtype=np.int64), sparse.csr_matrix((0, len(self.feature_names)), dtype=np.float32)
         
-        # Create feature vectors
-        vectors = {}
-        for recipe_id in recipe_ids:
-            vector = []
-            features = self.recipe_features.get(recipe_id, {})
-            
-            for feature in feature_names:
-                vector.append(features.get(feature, 0))
-            
-            vectors[recipe_id] = np.array(vector)
+        replaced = [self.recipe_positions[recipe_id] for recipe_id in features if recipe_id in self.recipe_positions]
+        for recipe_id in features:
+            if recipe_id not in self.recipe_positions:
+                self.recipe_positions[recipe_id] = len(self.recipe_ids)
+                self.recipe_ids.append(recipe_id)
+        positions = np.array([self.recipe_positions[recipe_id] for recipe_id in features])
+        n = len(self.recipe_ids)
         
-        # Compute cosine similarity
-        similarity = {}
-        for i, recipe1 in enumerate(recipe_ids):
-            similarity[recipe1] = {}
-            vec1 = vectors[recipe1]
-            
-            for j, recipe2 in enumerate(recipe_ids):
-                if i == j:
-                    similarity[recipe1][recipe2] = 1.0
-                    continue
-                
-                vec2 = vectors[recipe2]
-                
-                # Compute cosine similarity
-                dot_product = np.dot(vec1, vec2)
-                norm1 = np.linalg.norm(vec1)
-                norm2 = np.linalg.norm(vec2)
-                
-                if norm1 == 0 or norm2 == 0:
-                    similarity[recipe1][recipe2] = 0.0
-                else:
-                    similarity[recipe1][recipe2] = dot_product / (norm1 * norm2)
-        
-        self.recipe_similarity = similarity
-        logger.info("Computed recipe similarity matrix")
+        raw = self._feature_rows(list(features.values()))
+        norms = row_norms(raw)
+        rows = normalize_rows(raw, norms)
+        
+        # Clear replaced rows, widen for new features and lengthen for new recipes, then place the rows
+        matrix = self.feature_matrix
+        if matrix is None:
+            matrix = sparse.csr_matrix((0, rows.shape[1]), dtype=np.float32)
+        if replaced:
+            keep = np.ones(matrix.shape[0], dtype=np.float32)
+            keep[replaced] = 0
+            matrix = sparse.csr_matrix(sparse.diags(keep) @ matrix)
+            matrix.eliminate_zeros()
+        matrix = sparse.csr_matrix((matrix.data, matrix.indices, matrix.indptr), shape=(matrix.shape[0], rows.shape[1]))
+        matrix.resize((n, rows.shape[1]))
+        placement = sparse.csr_matrix(
+            (np.ones(len(positions), dtype=np.float32), (positions, np.arange(len(positions)))),
+            shape=(n, len(positions))
+        )
+        self.feature_matrix = sparse.csr_matrix(matrix + placement @ rows)
+        
+        feature_norms = np.zeros(n, dtype=np.float32)
+        feature_norms[:len(self.feature_norms)] = self.feature_norms
+        feature_norms[positions] = norms
+        self.feature_norms = feature_norms
+        return positions, rows
+    
+    def _compute_recipe_similarity(self):
+        """Compute cosine similarity between recipes based on features"""
+        if self.feature_matrix is None or not self.recipe_ids:
+            return
+        
+        # Rows are normalized; cosine similarity is then a single sparse product
+        saved = self.neighbor_index.load(self.feature_matrix, self.recipe_ids)
+        if not saved:
+            self.neighbor_index.build(self.feature_matrix, self.recipe_ids)
+        
+        if len(self.recipe_ids) <= DENSE_SIMILARITY_LIMIT:
+            similarity = (self.feature_matrix @ self.feature_matrix.T).toarray().astype(np.float32)
+            np.fill_diagonal(similarity, 1.0)
+            self.recipe_similarity = self._similarity_buffer = similarity
+        else:
+            saved = saved and self.neighbor_index.table_k == NEIGHBORS_PER_RECIPE
+            self.recipe_similarity = self.neighbor_index.neighbor_table(NEIGHBORS_PER_RECIPE)
+        logger.info(f"Computed recipe similarity matrix for {len(self.recipe_ids)} recipes")
+        
+        if not saved:
+            try:
+                self.neighbor_index.save()
+            except Exception as e:
+                logger.error(f"Error saving neighbor index: {e}")
+    
+    def _update_recipe_similarity(self, features: Dict[str, Dict[str, float]]):
+        """Recompute only the rows and columns of changed or added recipes"""
+        positions, rows = self._place_feature_rows(features)
+        n = len(self.recipe_ids)
+        self.neighbor_index.update(self.feature_matrix, self.recipe_ids, positions)
+        
+        if n <= DENSE_SIMILARITY_LIMIT:
+            # Similarity of every recipe to each changed one: an n x m product
+            columns = (self.feature_matrix @ rows.T).toarray()
+            similarity = self._grow_similarity(n)
+            similarity[:, positions] = columns
+            similarity[positions, :] = columns.T
+            similarity[positions, positions] = 1.0
+        else:
+            self.recipe_similarity = self.neighbor_index.neighbor_table(NEIGHBORS_PER_RECIPE)
+        logger.info(f"Updated recipe similarity for {len(features)} recipes")
+    
+    def _grow_similarity(self, n: int) -> np.ndarray:
+        """View of the dense similarity array sized for n recipes; capacity doubles so appends are amortized"""
+        buffer = self._similarity_buffer
+        if buffer.shape[0] < n:
+            capacity = min(max(n, 2 * buffer.shape[0]), max(n, DENSE_SIMILARITY_LIMIT))
+            grown = np.zeros((capacity, capacity), dtype=np.float32)
+            size = self.recipe_similarity.shape[0]
+            grown[:size, :size] = self.recipe_similarity
+            self._similarity_buffer = buffer = grown
+        self.recipe_similarity = buffer[:n, :n]
+        return self.recipe_similarity
+    
+    def _set_rating(self, user_id: str, recipe_id: str, rating: float):
+        """Record a rating on top of the saved ratings"""
+        if user_id not in self.user_positions:
+            self.user_positions[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+        self._rating_updates.setdefault(user_id, {})[recipe_id] = rating
+        self._ratings_dirty = True
     
     def update_user_preferences(self, user_id: str, recipe_id: str, rating: float):
         """Update user preferences with a new rating"""
-        if user_id not in self.user_preferences:
-            self.user_preferences[user_id] = {}
-        
-        self.user_preferences[user_id][recipe_id] = rating
+        self._set_rating(user_id, recipe_id, rating)
+        self._stale_recommendations.add(user_id)
+        self.recommendation_cache.pop(user_id, None)
         
-        # Save updated preferences
+        # Append the rating; the store is only rewritten on compaction
         try:
-            os.makedirs("data", exist_ok=True)
-            with open("data/user_preferences.json", "w") as f:
-                json.dump(self.user_preferences, f)
+            self.store.append_log("ratings", [{"user": user_id, "recipe": recipe_id, "rating": rating}])
+            self._ratings_logged += 1
         except Exception as e:
             logger.error(f"Error saving user preferences: {e}")
+        
+        if self._ratings_logged >= RATINGS_COMPACT_EVERY:
+            self.save()
+    
+    def _user_row(self, user_id: str) -> Dict[str, float]:
+        """A user's ratings by recipe ID"""
+        row = {}
+        user = self.user_positions.get(user_id)
+        if user is not None and self.ratings is not None and user < self.ratings.shape[0]:
+            start, end = self.ratings.indptr[user], self.ratings.indptr[user + 1]
+            row = {
+                self.rated_recipe_ids[column]: float(rating)
+                for column, rating in zip(self.ratings.indices[start:end], self.ratings.data[start:end])
+            }
+        row.update(self._rating_updates.get(user_id, {}))
+        return row
+    
+    @property
+    def user_preferences(self) -> Dict[str, Dict[str, float]]:
+        """Ratings per user, rebuilt from the rating matrix and logged updates"""
+        return {user_id: self._user_row(user_id) for user_id in self.user_ids}
+    
+    def _merged_ratings(self) -> sparse.csr_matrix:
+        """All ratings (users x rated recipe IDs): the saved matrix with logged updates applied"""
+        base = self.ratings if self.ratings is not None else sparse.csr_matrix((0, 0), dtype=np.float32)
+        coo = base.tocoo()
+        keep = ~np.isin(coo.row, [self.user_positions[user_id] for user_id in self._rating_updates])
+        rows, columns, values = [coo.row[keep]], [coo.col[keep]], [coo.data[keep]]
+        
+        for user_id in self._rating_updates:
+            row = self._user_row(user_id)
+            for recipe_id in row:
+                if recipe_id not in self.rated_recipe_columns:
+                    self.rated_recipe_columns[recipe_id] = len(self.rated_recipe_ids)
+                    self.rated_recipe_ids.append(recipe_id)
+            rows.append(np.full(len(row), self.user_positions[user_id], dtype=np.int64))
+            columns.append(np.array([self.rated_recipe_columns[recipe_id] for recipe_id in row], dtype=np.int64))
+            values.append(np.array(list(row.values()), dtype=np.float32))
+        
+        return sparse.csr_matrix(
+            (np.concatenate(values).astype(np.float32), (np.concatenate(rows), np.concatenate(columns))),
+            shape=(len(self.user_ids), len(self.rated_recipe_ids))
+        )
+    
+    def _ratings_matrix(self) -> sparse.csr_matrix:
+        """The user x recipe rating matrix used for predictions, rebuilt if ratings or recipes changed"""
+        shape = (len(self.user_ids), len(self.recipe_ids))
+        if not self._ratings_dirty and self._position_ratings is not None and self._position_ratings.shape == shape:
+            return self._position_ratings
+        
+        # Ratings of recipes without features cannot be used
+        merged = self._merged_ratings().tocoo()
+        positions = np.array([self.recipe_positions.get(recipe_id, -1) for recipe_id in self.rated_recipe_ids], dtype=np.int64)
+        known = positions[merged.col] >= 0 if merged.nnz else np.zeros(0, dtype=bool)
+        self._position_ratings = sparse.csr_matrix(
+            (merged.data[known], (merged.row[known], positions[merged.col[known]])), shape=shape
+        )
+        self._ratings_dirty = False
+        return self._position_ratings
     
     def get_similar_recipes(self, recipe_id: str, n: int = 5) -> List[str]:
         """Get n most similar recipes to the given recipe"""
-        if recipe_id not in self.recipe_similarity:
+        position = self.recipe_positions.get(recipe_id)
+        if position is None or not len(self.neighbor_index):
             return []
         
-        # Get similarity scores
-        similarities = self.recipe_similarity[recipe_id]
+        return [self.recipe_ids[i] for i, _ in self.neighbor_index.neighbors(position, n)]
+    
+    def _user_ratings(self, user_id: str) -> sparse.csr_matrix:
+        """One user's ratings as a 1 x recipes row"""
+        rated = [(self.recipe_positions[r], rating) for r, rating in self._user_row(user_id).items() if r in self.recipe_positions]
+        return sparse.csr_matrix(
+            (np.array([rating for _, rating in rated], dtype=np.float32),
+             (np.zeros(len(rated), dtype=np.int64), np.array([position for position, _ in rated], dtype=np.int64))),
+            shape=(1, len(self.recipe_ids))
+        )
+    
+    def _predict(self, ratings: sparse.csr_matrix) -> np.ndarray:
+        """Predicted ratings for a block of users: R.S / B.|S| with B the rated-recipe indicator
+        
+        Rated recipes and recipes with no similar rated recipe come out as -inf.
+        """
+        # Only the similarity rows of recipes someone in the block rated take part
+        rated_positions = np.unique(ratings.indices)
+        similarity = self.recipe_similarity[rated_positions]
+        ratings = ratings[:, rated_positions]
+        indicator = ratings.copy()
+        indicator.data[:] = 1.0
         
-        # Sort by similarity (descending)
-        similar_recipes = sorted(similarities.items(), key=lambda x: x[1], reverse=True)
+        numerator = ratings @ similarity
+        denominator = indicator @ abs(similarity)
+        if sparse.issparse(numerator):
+            numerator, denominator = numerator.toarray(), denominator.toarray()
         
-        # Return top n (excluding the recipe itself)
-        return [r[0] for r in similar_recipes[1:n+1]]
+        predicted = np.full(numerator.shape, -np.inf, dtype=np.float32)
+        np.divide(numerator, denominator, out=predicted, where=denominator > 0)
+        # Skip already rated recipes
+        coo = indicator.tocoo()
+        predicted[coo.row, rated_positions[coo.col]] = -np.inf
+        return predicted
     
     def get_personalized_recommendations(self, user_id: str, n: int = 5) -> List[str]:
         """Get personalized recipe recommendations for a user"""
-        if user_id not in self.user_preferences:
+        if user_id not in self.user_positions or self.recipe_similarity is None:
             return []
         
-        # Get user ratings
-        user_ratings = self.user_preferences[user_id]
+        self._load_recommendations()
+        cached = self.recommendation_cache.get(user_id)
+        if cached is not None and n <= self.recommendation_cache_size:
+            return cached[:n]
         
-        # Calculate predicted ratings for unrated recipes
-        predicted_ratings = {}
+        # Item-based collaborative filtering: similarity-weighted average of the user's ratings
+        ratings = self._user_ratings(user_id)
+        if not ratings.nnz:
+            return []
         
-        for recipe_id in self.recipe_features:
-            # Skip already rated recipes
-            if recipe_id in user_ratings:
-                continue
-            
-            # Calculate predicted rating using item-based collaborative filtering
-            numerator = 0
-            denominator = 0
-            
-            for rated_recipe, rating in user_ratings.items():
-                if rated_recipe in self.recipe_similarity and recipe_id in self.recipe_similarity[rated_recipe]:
-                    similarity = self.recipe_similarity[rated_recipe][recipe_id]
-                    numerator += similarity * rating
-                    denominator += abs(similarity)
-            
-            if denominator > 0:
-                predicted_ratings[recipe_id] = numerator / denominator
+        # Return top n recipe IDs
+        return [self.recipe_ids[i] for i in top_k(self._predict(ratings)[0], n)]
+    
+    def recommend_for_all_users(self, n: int = 10) -> Dict[str, List[str]]:
+        """Top n recommendations for every user with ratings, scoring USER_BLOCK_SIZE users per product"""
+        if self.recipe_similarity is None:
+            return {}
         
-        # Sort by predicted rating (descending)
-        recommendations = sorted(predicted_ratings.items(), key=lambda x: x[1], reverse=True)
+        ratings = self._ratings_matrix()
+        active = np.flatnonzero(np.diff(ratings.indptr))
+        recommendations = {}
+        for start in range(0, len(active), USER_BLOCK_SIZE):
+            block = active[start:start + USER_BLOCK_SIZE]
+            for user, predicted in zip(block, self._predict(ratings[block])):
+                recommendations[self.user_ids[user]] = [self.recipe_ids[i] for i in top_k(predicted, n)]
+        return recommendations
+    
+    def precompute_recommendations(self, n: int = 10):
+        """Recompute every user's top n and save them for get_personalized_recommendations"""
+        started = time.time()
+        self.recommendation_cache = self.recommend_for_all_users(n)
+        self.recommendation_cache_size = n
+        # Every known rating went into these lists
+        self._stale_recommendations = set()
+        logger.info(f"Precomputed recommendations for {len(self.recommendation_cache)} users in {time.time() - started:.1f}s")
         
-        # Return top n recipe IDs
-        return [r[0] for r in recommendations[:n]]
+        try:
+            os.makedirs("data", exist_ok=True)
+            with open(RECOMMENDATIONS_PATH + ".tmp", "w") as f:
+                json.dump({"n": n, "generated_at": time.time(), "recommendations": self.recommendation_cache}, f)
+            os.replace(RECOMMENDATIONS_PATH + ".tmp", RECOMMENDATIONS_PATH)
+            self._recommendations_mtime = os.path.getmtime(RECOMMENDATIONS_PATH)
+        except Exception as e:
+            logger.error(f"Error saving precomputed recommendations: {e}")
     
     def extract_recipe_features(self, recipe: Dict[str, Any]) -> Dict[str, float]:
         """Extract features from a recipe for similarity calculation"""
@@ -190,36 +503,71 @@ class RecipeRecommender:
             features[f"ingredient_{ingredient}"] = min(count, 3) / 3.0  # Normalize
         
         # Extract cooking time if available
-        time_str = recipe.get("time", "")
-        if time_str:
-            try:
-                # Try to extract minutes
-                import re
-                time_match = re.search(r'(\d+)\s*min', time_str.lower())
-                if time_match:
-                    minutes = int(time_match.group(1))
-                    # Normalize time: 0-30 min -> 0-0.5, 30-60 min -> 0.5-1.0, >60 min -> >1.0
-                    features["time"] = min(minutes / 60.0, 2.0)
-            except:
-                pass
+        minutes = recipe_total_minutes(recipe)
+        if minutes is not None:
+            # Normalize time: 0-30 min -> 0-0.5, 30-60 min -> 0.5-1.0, >60 min -> >1.0
+            features["time"] = min(minutes / 60.0, 2.0)
         
         return features
     
     def update_recipe_features(self, recipe_id: str, recipe: Dict[str, Any]):
         """Update features for a recipe"""
-        features = self.extract_recipe_features(recipe)
-        self.recipe_features[recipe_id] = features
+        self.update_many_recipe_features({recipe_id: recipe})
+    
+    def update_many_recipe_features(self, recipes: Dict[str, Dict[str, Any]]):
+        """Update features for several recipes, recomputing only their similarities"""
+        if not recipes:
+            return
+        features = {recipe_id: self.extract_recipe_features(recipe) for recipe_id, recipe in recipes.items()}
         
         # Update similarity matrix
-        self._compute_recipe_similarity()
+        if self.recipe_similarity is None:
+            self._place_feature_rows(features)
+            self._compute_recipe_similarity()
+        else:
+            self._update_recipe_similarity(features)
         
-        # Save updated features
+        # Append updated features; the store is only rewritten on compaction
         try:
-            os.makedirs("data", exist_ok=True)
-            with open("data/recipe_features.json", "w") as f:
-                json.dump(self.recipe_features, f)
+            self.store.append_log("features", [{"id": recipe_id, "features": f} for recipe_id, f in features.items()])
+            self._features_logged += len(features)
         except Exception as e:
             logger.error(f"Error saving recipe features: {e}")
+        
+        if self._features_logged >= FEATURES_COMPACT_EVERY:
+            self.save()
+    
+    def save(self):
+        """Write features and ratings to the binary store, truncate the update logs and save the neighbor index"""
+        try:
+            self.ratings = self._merged_ratings()
+            self._rating_updates = {}
+            feature_matrix = self.feature_matrix
+            if feature_matrix is None:
+                feature_matrix = sparse.csr_matrix((0, len(self.feature_names)), dtype=np.float32)
+            self.store.save(
+                ids={
+                    "recipes": self.recipe_ids,
+                    "features": list(self.feature_names),
+                    "users": self.user_ids,
+                    "rated_recipes": self.rated_recipe_ids
+                },
+                matrices={"features": feature_matrix, "ratings": self.ratings},
+                arrays={"feature_norms": self.feature_norms}
+            )
+            self.store.truncate_log("features")
+            self.store.truncate_log("ratings")
+            self._features_logged = 0
+            self._ratings_logged = 0
+            if len(self.neighbor_index):
+                self.neighbor_index.save()
+            logger.info(f"Saved features for {len(self.recipe_ids)} recipes and preferences for {len(self.user_ids)} users")
+        except Exception as e:
+            logger.error(f"Error saving recommendation data: {e}")
 
 # Initialize the recommender
-recommender = RecipeRecommender() 
\ No newline at end of file
+recommender = RecipeRecommender()
+
+if __name__ == "__main__":
+    # Nightly job: refresh the precomputed recommendations served from the cache
+    recommender.precompute_recommendations()
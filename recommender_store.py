@@ -0,0 +1,135 @@
+import json
+import logging
+import os
+import shutil
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+from scipy import sparse
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+RECOMMENDER_STORE_DIR = os.path.join("data", "recommender")
+
+def read_jsonl(path: str) -> List[Dict[str, Any]]:
+    """Entries of a JSON-lines log, oldest first; a torn last line is skipped"""
+    entries = []
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # A torn last line from an interrupted write
+                        logger.warning(f"Skipping unreadable line in {path}")
+    return entries
+
+class RecommenderStore:
+    """Recommender state as memory-mapped NumPy arrays plus append-only update logs
+
+    A save writes one generation directory of .npy files (CSR matrices are
+    stored as their data/indices/indptr arrays) and then atomically replaces
+    manifest.json, which holds the ID lists, the matrix shapes and the current
+    generation. Updates made since the last save go to JSON-lines logs that
+    are replayed on load and truncated by the next save.
+    """
+
+    def __init__(self, directory: str = RECOMMENDER_STORE_DIR):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, "manifest.json")
+
+    def exists(self) -> bool:
+        """Whether a saved state is present"""
+        return os.path.exists(self.manifest_path)
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        if not self.exists():
+            return None
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """{"ids", "matrices", "arrays"} from the current generation, memory-mapped; None if nothing is saved"""
+        manifest = self._read_manifest()
+        if manifest is None:
+            return None
+        generation_dir = os.path.join(self.directory, f"gen-{manifest['generation']}")
+
+        def mapped(name: str) -> np.ndarray:
+            path = os.path.join(generation_dir, f"{name}.npy")
+            try:
+                return np.load(path, mmap_mode="r")
+            except ValueError:
+                # Empty arrays cannot be mapped
+                return np.load(path)
+
+        matrices = {
+            name: sparse.csr_matrix(
+                (mapped(f"{name}_data"), mapped(f"{name}_indices"), mapped(f"{name}_indptr")), shape=tuple(shape)
+            )
+            for name, shape in manifest["matrices"].items()
+        }
+        arrays = {name: mapped(name) for name in manifest["arrays"]}
+        return {"ids": manifest["ids"], "matrices": matrices, "arrays": arrays}
+
+    def save(self, ids: Dict[str, List[str]], matrices: Dict[str, sparse.csr_matrix], arrays: Dict[str, np.ndarray]):
+        """Write a new generation and switch the manifest to it"""
+        manifest = self._read_manifest()
+        generation = manifest["generation"] + 1 if manifest else 1
+        generation_dir = os.path.join(self.directory, f"gen-{generation}")
+        # Left over from an interrupted save
+        shutil.rmtree(generation_dir, ignore_errors=True)
+        os.makedirs(generation_dir)
+
+        files = dict(arrays)
+        for name, matrix in matrices.items():
+            files[f"{name}_data"] = matrix.data
+            files[f"{name}_indices"] = matrix.indices
+            files[f"{name}_indptr"] = matrix.indptr
+        for name, array in files.items():
+            with open(os.path.join(generation_dir, f"{name}.npy"), "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+                f.flush()
+                os.fsync(f.fileno())
+
+        manifest = {
+            "generation": generation,
+            "ids": ids,
+            "matrices": {name: list(matrix.shape) for name, matrix in matrices.items()},
+            "arrays": list(arrays)
+        }
+        with open(self.manifest_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.manifest_path + ".tmp", self.manifest_path)
+
+        # Older generations may still be mapped (e.g. on Windows); they go on a later save
+        for entry in os.listdir(self.directory):
+            if entry.startswith("gen-") and entry != f"gen-{generation}":
+                shutil.rmtree(os.path.join(self.directory, entry), ignore_errors=True)
+
+    def log_path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.jsonl")
+
+    def append_log(self, name: str, entries: List[Dict[str, Any]]):
+        """Append entries to an update log and fsync them"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.log_path(name), "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def read_log(self, name: str) -> List[Dict[str, Any]]:
+        """Entries of an update log, oldest first"""
+        return read_jsonl(self.log_path(name))
+
+    def truncate_log(self, name: str):
+        """Empty an update log (after its entries were saved)"""
+        if os.path.exists(self.log_path(name)):
+            open(self.log_path(name), "w").close()
@@ -0,0 +1,70 @@
+import logging
+import threading
+from typing import Dict, List, Any, Set
+
+from search_cache import register_reload_listener
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Fields only some imports carry; query builders pick a strategy by their presence
+OPTIONAL_FIELDS = [
+    "cleaned_ingredients", "TotalTimeInMins",
+    # Normalized fields (import_recipes.main)
+    "cuisine_normalized", "ingredient_tokens", "search_tokens",
+    # Numeric fields (import_recipes.derive_numeric_fields)
+    "total_minutes", "calories", "protein", "carbs", "fat", "complexity_score"
+]
+
+NUTRITION_FIELDS = ["calories", "protein", "carbs", "fat"]
+
+class SchemaCapabilities:
+    """Which optional fields the recipe collection carries, probed once per import"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.invalidate()
+
+    def invalidate(self):
+        """Forget the probed fields so they are probed again on next use"""
+        self.fields: Set[str] = set()
+        self.loaded = False
+
+    def refresh(self, collection) -> "SchemaCapabilities":
+        """Probe every optional field with one bounded lookup each"""
+        with self._lock:
+            try:
+                # find_one stops at the first match (or walks the field's index)
+                self.fields = {
+                    field for field in OPTIONAL_FIELDS
+                    if collection.find_one({field: {"$exists": True}}, {"_id": 1}) is not None
+                }
+                self.loaded = True
+                logger.info(f"Recipe collection fields: {sorted(self.fields)}")
+            except Exception as e:
+                logger.error(f"Error probing recipe collection fields: {e}")
+        return self
+
+    def ensure(self, collection) -> "SchemaCapabilities":
+        """Probe the collection if that has not happened since the last import"""
+        if not self.loaded:
+            self.refresh(collection)
+        return self
+
+    def has(self, field: str) -> bool:
+        """Whether at least one recipe carries the field"""
+        return field in self.fields
+
+    @property
+    def nutrition(self) -> bool:
+        """Whether the per-serving nutrition fields were derived at import"""
+        return all(field in self.fields for field in NUTRITION_FIELDS)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Capabilities as a plain dict (for health and debug endpoints)"""
+        return {field: field in self.fields for field in OPTIONAL_FIELDS}
+
+# Create the shared registry; re-imports change which fields exist
+schema_capabilities = SchemaCapabilities()
+register_reload_listener(schema_capabilities.invalidate)
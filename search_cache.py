@@ -0,0 +1,186 @@
+import copy
+import inspect
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Dict, List, Any, Optional, Callable, Tuple
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def canonicalize_value(value: Any) -> Any:
+    """Lowercase, trim and collapse whitespace so equivalent values share a key"""
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), canonicalize_value(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(canonicalize_value(v) for v in value)
+    return value
+
+def drop_empty_preferences(preferences: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Preferences without unset (None or "") values"""
+    if not preferences:
+        return preferences
+    return {key: value for key, value in preferences.items() if value not in (None, "")}
+
+def canonicalize_preferences(preferences: Optional[Dict[str, Any]]) -> Tuple:
+    """Canonical, hashable form of a preferences dict (sorted keys, normalized values)
+    
+    Keys are kept as given: the searches look preferences up by exact key.
+    """
+    if not preferences:
+        return ()
+    return tuple(sorted(
+        (key, canonicalize_value(value))
+        for key, value in drop_empty_preferences(preferences).items()
+    ))
+
+def _copy_result(result: Any) -> Any:
+    """Deep-copy a search result so callers cannot mutate the cached entry"""
+    # Recipe dicts shared between "results" and "detailed_results" stay shared
+    return copy.deepcopy(result)
+
+class SearchCache:
+    """Bounded LRU cache with a TTL for recipe search results"""
+
+    def __init__(self, max_size: int = 256, ttl_seconds: float = 300, degraded_ttl_seconds: float = 10):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # Results computed without MongoDB are only kept long enough to absorb bursts
+        self.degraded_ttl_seconds = degraded_ttl_seconds
+        # key -> (expires_at, degraded, value)
+        self._entries: "OrderedDict[Any, Tuple[float, bool, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Any) -> Tuple[bool, Any]:
+        """Return (hit, value) for a key, dropping it if expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, degraded, value = entry
+                if time.monotonic() <= expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    if degraded:
+                        self.mark_degraded()
+                    return True, _copy_result(value)
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key: Any, value: Any, degraded: bool = False):
+        """Store a value, evicting the least recently used entry when full"""
+        ttl_seconds = self.degraded_ttl_seconds if degraded else self.ttl_seconds
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, degraded, _copy_result(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def mark_degraded(self):
+        """Flag the result being computed on this thread as degraded (e.g. MongoDB unavailable)"""
+        self._local.degraded = True
+
+    def invalidate(self):
+        """Drop every cached entry"""
+        with self._lock:
+            self._entries.clear()
+        logger.info("Search cache invalidated")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "degraded_ttl_seconds": self.degraded_ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def cached(self, func: Callable) -> Callable:
+        """Decorate a search function taking a preferences dict as first argument"""
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        def wrapper(preferences, *args, **kwargs):
+            # The search sees what the key sees, so {"diet": ""} and {} agree on "relaxed"
+            preferences = drop_empty_preferences(preferences)
+            # Bind defaults so f(p) and f(p, 3) share an entry when 3 is the default
+            bound = signature.bind(preferences, *args, **kwargs)
+            bound.apply_defaults()
+            arguments = list(bound.arguments.items())[1:]
+            key = (
+                func.__name__,
+                canonicalize_preferences(preferences),
+                canonicalize_value(dict(arguments))
+            )
+
+            # e.g. notice a re-import by another process before serving its stale results
+            for check in _freshness_checks:
+                try:
+                    check()
+                except Exception as e:
+                    logger.error(f"Error in search cache freshness check {check}: {e}")
+
+            # Degradation inside a nested cached search propagates outwards
+            outer_degraded = getattr(self._local, "degraded", False)
+            self._local.degraded = False
+            try:
+                hit, value = self.get(key)
+                if hit:
+                    return value
+
+                value = func(preferences, *args, **kwargs)
+                self.set(key, value, degraded=self._local.degraded)
+                return _copy_result(value)
+            finally:
+                self._local.degraded = outer_degraded or self._local.degraded
+
+        wrapper.cache = self
+        return wrapper
+
+# Callbacks run whenever the recipe collection is reloaded
+_reload_listeners: List[Callable[[], None]] = []
+
+# Callbacks run before every cached lookup; they may call notify_recipes_reloaded
+_freshness_checks: List[Callable[[], None]] = []
+
+def register_freshness_check(check: Callable[[], None]):
+    """Register a callback to run before cached search results are served"""
+    if check not in _freshness_checks:
+        _freshness_checks.append(check)
+
+def register_reload_listener(listener: Callable[[], None]):
+    """Register a callback to run when recipes are re-imported"""
+    if listener not in _reload_listeners:
+        _reload_listeners.append(listener)
+
+def notify_recipes_reloaded():
+    """Invalidate search results and derived state after a recipe import"""
+    search_cache.invalidate()
+    for listener in _reload_listeners:
+        try:
+            listener()
+        except Exception as e:
+            logger.error(f"Error in recipe reload listener {listener}: {e}")
+
+# Create a cache instance shared by the search functions
+search_cache = SearchCache(
+    max_size=int(os.environ.get("SEARCH_CACHE_SIZE", "256")),
+    ttl_seconds=float(os.environ.get("SEARCH_CACHE_TTL", "300")),
+    degraded_ttl_seconds=float(os.environ.get("SEARCH_CACHE_DEGRADED_TTL", "10"))
+)
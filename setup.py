@@ -80,6 +80,7 @@ def setup_environment():
         "pyyaml>=5.3.1,<6.0",
         "scikit-learn==1.1.3",
         "numpy==1.24.3",
+        "scipy==1.10.1",
         "pandas==2.0.1",
         "fastapi==0.95.1",
         "uvicorn==0.22.0",
@@ -0,0 +1,128 @@
+import logging
+from collections import deque
+from typing import Dict, List, Any, Iterable, Set, Tuple
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class AhoCorasick:
+    """Multi-pattern substring matcher that scans text in a single linear pass"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+
+        for pattern in patterns:
+            self._add_pattern(pattern)
+        self._build_failure_links()
+
+    def _add_pattern(self, pattern: str):
+        """Insert a pattern into the trie"""
+        pattern_id = len(self.patterns)
+        self.patterns.append(pattern)
+
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(pattern_id)
+
+    def _build_failure_links(self):
+        """Breadth-first construction of failure links and merged outputs"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find_all(self, text: str) -> Set[int]:
+        """Return the ids of every pattern occurring in text"""
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            if self._output[state]:
+                found.update(self._output[state])
+        return found
+
+class SubstitutionMatcher:
+    """Substitution vocabulary (keys and their substitutes) compiled into one automaton"""
+
+    def __init__(self, substitutions: Dict[str, List[Any]]):
+        self.keys: List[str] = list(substitutions)
+        self.substitutions = substitutions
+
+        # Each pattern may be a key, a substitute of some key, or both
+        targets: Dict[str, List[Tuple[int, bool]]] = {}
+        for key_index, key in enumerate(self.keys):
+            targets.setdefault(key.lower(), []).append((key_index, True))
+            for substitute in substitutions[key] or []:
+                name = self._substitute_name(substitute)
+                if name:
+                    targets.setdefault(name.lower(), []).append((key_index, False))
+
+        self._automaton = AhoCorasick(targets)
+        self._targets = [targets[pattern] for pattern in self._automaton.patterns]
+
+        # Every substring of every key, for "ingredient is part of a key" lookups
+        self._key_substrings: Dict[str, Set[int]] = {}
+        for key_index, key in enumerate(self.keys):
+            key = key.lower()
+            for start in range(len(key)):
+                for end in range(start + 1, len(key) + 1):
+                    self._key_substrings.setdefault(key[start:end], set()).add(key_index)
+
+    @staticmethod
+    def _substitute_name(substitute: Any) -> str:
+        """Substitutes are plain names or {"name": ..., "notes": ...} entries"""
+        if isinstance(substitute, dict):
+            return substitute.get("name", "")
+        return str(substitute)
+
+    def scan(self, text: str) -> Tuple[Set[int], Set[int]]:
+        """Return (keys found in text, keys whose substitute is found in text)"""
+        key_hits, substitute_hits = set(), set()
+        for pattern_id in self._automaton.find_all(text.lower()):
+            for key_index, is_key in self._targets[pattern_id]:
+                (key_hits if is_key else substitute_hits).add(key_index)
+        return key_hits, substitute_hits
+
+    def related_keys(self, text: str) -> List[str]:
+        """Keys contained in text or containing text, in vocabulary order"""
+        text = text.lower()
+        key_hits, _ = self.scan(text)
+        key_hits |= self._key_substrings.get(text, set())
+        return [self.keys[key_index] for key_index in sorted(key_hits)]
+
+    def suggest(self, ingredient: str) -> List[Dict[str, Any]]:
+        """Suggest substitutes for an ingredient line, in either direction"""
+        key_hits, substitute_hits = self.scan(ingredient)
+
+        suggestions = []
+        for key_index in sorted(key_hits | substitute_hits):
+            key = self.keys[key_index]
+            if key_index in key_hits:
+                # The ingredient names a key: offer its substitutes and stop
+                suggestions.append({"original": ingredient, "substitutes": self.substitutions[key]})
+                break
+            # The ingredient names a substitute: offer the key
+            suggestions.append({"original": ingredient, "substitutes": [key]})
+        return suggestions
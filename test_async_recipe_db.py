@@ -0,0 +1,63 @@
+import asyncio
+import logging
+import time
+
+import async_recipe_db
+import recipe_db
+from search_cache import search_cache
+from testing_db import connect_test_collection, run_tests
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+async def check_same_results():
+    preferences = {"diet": "vegetarian", "cuisine": "indian"}
+    search_cache.invalidate()
+    result = await async_recipe_db.search_with_fallback(preferences)
+    assert result == recipe_db.search_with_fallback(preferences)
+
+    result = await async_recipe_db.search_with_weighted_scoring(preferences, ranges={"total_minutes": {"$lte": 20}})
+    assert [recipe["RecipeName"] for recipe in result["results"]] == ["Quick Paneer Tikka", "Masala Omelette"]
+
+    recipes = await async_recipe_db.search_by_available_ingredients(["tomatoes", "basil", "onion"])
+    assert recipes == recipe_db.search_by_available_ingredients(["tomatoes", "basil", "onion"])
+
+async def check_loop_not_blocked():
+    original_search = recipe_db.search_by_available_ingredients
+
+    def slow_search(*args, **kwargs):
+        time.sleep(0.3)
+        return original_search(*args, **kwargs)
+
+    ticks = []
+
+    async def ticker():
+        for _ in range(5):
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.02)
+
+    recipe_db.search_by_available_ingredients = slow_search
+    try:
+        await asyncio.gather(async_recipe_db.search_by_available_ingredients(["eggs"]), ticker())
+    finally:
+        recipe_db.search_by_available_ingredients = original_search
+    # The ticker kept running while the search slept on a worker thread
+    assert ticks[-1] - ticks[0] < 0.25
+
+def test_same_results_as_sync():
+    """The coroutines return what the synchronous searches return"""
+    connect_test_collection()
+    asyncio.run(check_same_results())
+    logger.info("Async results OK")
+
+def test_loop_not_blocked():
+    """Searches run on the worker pool, leaving the event loop free"""
+    asyncio.run(check_loop_not_blocked())
+    logger.info("Event loop stays responsive")
+
+if __name__ == "__main__":
+    logger.info("Testing the async data access layer...")
+    run_tests(test_same_results_as_sync, test_loop_not_blocked)
+    async_recipe_db.shutdown()
+    logger.info("Testing complete!")
@@ -0,0 +1,68 @@
+import logging
+import os
+import time
+
+from db_connection import RecipeDatabase, bootstrap_indexes, record_import, read_import_generation
+from testing_db import connect_test_collection, run_tests
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Nothing listens here, so connecting fails fast
+UNREACHABLE_URI = "mongodb://127.0.0.1:1/"
+
+def test_unreachable_server_is_not_retried_per_call():
+    """A failed connection returns None and is retried only after retry_interval"""
+    database = RecipeDatabase(uri=UNREACHABLE_URI, retry_interval=60)
+    assert database.client is None
+
+    timeout = os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS")
+    os.environ["MONGO_SERVER_SELECTION_TIMEOUT_MS"] = "300"
+    try:
+        assert database.get_collection() is None
+    finally:
+        if timeout is None:
+            del os.environ["MONGO_SERVER_SELECTION_TIMEOUT_MS"]
+        else:
+            os.environ["MONGO_SERVER_SELECTION_TIMEOUT_MS"] = timeout
+    started = time.monotonic()
+    for _ in range(100):
+        assert database.get_collection() is None
+    assert time.monotonic() - started < 0.1
+    assert database.ping() is False
+    logger.info("Unreachable server OK")
+
+def test_indexes_bootstrapped_once_per_schema_version():
+    """Indexes are created on the first connect only, unless forced"""
+    collection = connect_test_collection()
+
+    collection.database["schema_info"].delete_many({})
+    assert bootstrap_indexes(collection) is True
+    assert bootstrap_indexes(collection) is False
+    assert bootstrap_indexes(collection, force=True) is True
+    index_names = set(collection.index_information())
+    assert "recipe_text" in index_names and "ingredient_tokens_1" in index_names
+    logger.info("Index bootstrap OK")
+
+def test_import_generation():
+    """Every import stamps a new generation in schema_info"""
+    collection = connect_test_collection()
+
+    assert read_import_generation(collection) is None
+    first = record_import(collection)
+    assert read_import_generation(collection) == first
+    second = record_import(collection)
+    assert second != first and read_import_generation(collection) == second
+    # The schema version recorded by bootstrap_indexes is kept
+    assert bootstrap_indexes(collection) is False
+    logger.info("Import generation OK")
+
+if __name__ == "__main__":
+    logger.info("Testing the database connection...")
+    run_tests(
+        test_unreachable_server_is_not_retried_per_call,
+        test_indexes_bootstrapped_once_per_schema_version,
+        test_import_generation
+    )
+    logger.info("Testing complete!")
@@ -0,0 +1,84 @@
+import logging
+
+from facet_service import FacetService, facet_service
+from search_cache import notify_recipes_reloaded
+from testing_db import connect_test_collection, run_tests
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class AggregateCounter:
+    """Wraps a collection and counts aggregate calls"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.name = collection.name
+        self.aggregations = 0
+
+    def aggregate(self, pipeline, *args, **kwargs):
+        self.aggregations += 1
+        return self.collection.aggregate(pipeline, *args, **kwargs)
+
+def values(entries):
+    return [entry["value"] for entry in entries]
+
+def test_values_match_distinct():
+    """Facet values are the sorted distinct values /cuisines and /diets returned"""
+    collection = connect_test_collection()
+
+    facets = FacetService().get_facets(collection)["facets"]
+    assert values(facets["cuisines"]) == sorted(c for c in collection.distinct("Cuisine") if c)
+    assert values(facets["diets"]) == sorted(d for d in collection.distinct("diet") if d)
+    for entry in facets["cuisines"]:
+        assert entry["count"] == collection.count_documents({"Cuisine": entry["value"]})
+    for entry in facets["diets"]:
+        assert entry["count"] == collection.count_documents({"diet": entry["value"]})
+    logger.info("Facet values OK")
+
+def test_selection_aware_counts():
+    """Each facet is counted over the recipes matching the other selection"""
+    collection = connect_test_collection()
+
+    service = FacetService()
+    cuisines = service.get_facets(collection, diet="vegan, Gluten-Free")["facets"]["cuisines"]
+    assert cuisines == [{"value": "Continental", "count": 1}, {"value": "Thai", "count": 1}]
+    diets = service.get_facets(collection, cuisine="indian")["facets"]["diets"]
+    counts = {entry["value"]: entry["count"] for entry in diets}
+    assert counts == {"vegetarian": 2, "gluten-free": 3, "non-vegetarian": 1}
+    logger.info("Selection-aware counts OK")
+
+def test_cached_until_reload():
+    """Repeated requests reuse one aggregation until the recipes are reloaded"""
+    collection = connect_test_collection()
+
+    counter = AggregateCounter(collection)
+    # The shared service is cleared by the reload listener
+    service = facet_service
+    service.invalidate()
+
+    first = service.get_facets(counter)
+    assert service.get_facets(counter) == first
+    assert service.get_facets(counter, diet=" Vegan ") is not None
+    assert service.get_facets(counter, diet="vegan") is not None
+    assert counter.aggregations == 2
+
+    # The same facets give the same validator
+    assert FacetService().get_facets(collection)["etag"] == first["etag"]
+
+    collection.delete_many({"Cuisine": "Thai"})
+    notify_recipes_reloaded()
+    second = service.get_facets(counter)
+    assert counter.aggregations == 3
+    assert "Thai" not in values(second["facets"]["cuisines"])
+    assert second["etag"] != first["etag"]
+    logger.info("Facet cache OK")
+
+if __name__ == "__main__":
+    logger.info("Testing recipe facets...")
+    run_tests(
+        test_values_match_distinct,
+        test_selection_aware_counts,
+        test_cached_until_reload
+    )
+    logger.info("Testing complete!")
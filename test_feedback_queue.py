@@ -0,0 +1,244 @@
+import asyncio
+import contextlib
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+
+from db_connection import recipe_database
+from feedback_analyzer import FEEDBACK_SNAPSHOT_PATH, FeedbackAnalyzer
+from feedback_queue import FEEDBACK_LOG_PATH, FeedbackQueue, append_feedback_log
+from recommender_store import read_jsonl
+from testing_db import connect_test_collection, run_tests
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+@contextlib.contextmanager
+def data_directory():
+    """Run in an empty working directory, so data/ files don't touch the repo's"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            yield directory
+        finally:
+            os.chdir(cwd)
+
+@contextlib.contextmanager
+def database_unavailable():
+    """Make the shared connection report MongoDB as unreachable"""
+    get_database = recipe_database.get_database
+    recipe_database.get_database = lambda: None
+    try:
+        yield
+    finally:
+        recipe_database.get_database = get_database
+
+def feedback_entry(number, rating=4):
+    return {"rating": rating, "message": f"feedback {number}", "timestamp": "2026-01-01T12:00:00"}
+
+def test_batches_written_to_mongodb():
+    """Buffered entries reach the feedback collection on flush"""
+    collection = connect_test_collection()
+    feedback = collection.database["feedback"]
+    feedback.drop()
+
+    queue = FeedbackQueue(flush_size=10)
+    entries = [feedback_entry(number) for number in range(25)]
+    for entry in entries:
+        assert queue.put(entry)
+    assert queue.stats()["pending"] == 25
+    assert queue.flush() == 25 and queue.flush() == 0
+    assert [doc["message"] for doc in feedback.find({}, {"_id": 0}).sort("message", 1)] == sorted(e["message"] for e in entries)
+    # The caller's entries are not modified by insert_many
+    assert all("_id" not in entry for entry in entries)
+    assert queue.stats()["flushed"] == 25 and queue.stats()["flushes"] == 1
+    logger.info("Batched inserts OK")
+
+def test_backpressure():
+    """put refuses entries once the buffer is full"""
+    queue = FeedbackQueue(max_pending=3)
+    assert all(queue.put(feedback_entry(number)) for number in range(3))
+    assert not queue.put(feedback_entry(3))
+    stats = queue.stats()
+    assert stats["rejected"] == 1 and stats["utilization"] == 1.0 and stats["high_water_mark"] == 3
+    logger.info("Backpressure OK")
+
+def test_log_fallback_and_shutdown():
+    """Without MongoDB, batches and the buffer left at shutdown go to the log"""
+    with data_directory(), database_unavailable():
+        queue = FeedbackQueue()
+        for number in range(3):
+            queue.put(feedback_entry(number))
+        assert queue.flush() == 3
+        queue.put(feedback_entry(3))
+        asyncio.run(queue.stop())
+        assert [entry["message"] for entry in read_jsonl(FEEDBACK_LOG_PATH)] == [f"feedback {n}" for n in range(4)]
+        assert queue.stats()["pending"] == 0
+    logger.info("Log fallback OK")
+
+def test_only_failed_inserts_are_logged():
+    """Documents MongoDB accepted are not appended to the log again"""
+    collection = connect_test_collection()
+    feedback = collection.database["feedback"]
+    feedback.drop()
+    feedback.create_index("number", unique=True)
+    feedback.insert_one({"number": 2})
+
+    with data_directory():
+        queue = FeedbackQueue()
+        for number in range(4):
+            queue.put({"number": number})
+        assert queue.flush() == 4
+        assert feedback.count_documents({}) == 4
+        assert [entry["number"] for entry in read_jsonl(FEEDBACK_LOG_PATH)] == [2]
+    feedback.drop()
+    logger.info("Partial insert failure OK")
+
+def test_analyzer_round_trip():
+    """Feedback added through the log reloads and compacts to the same entries"""
+    with data_directory(), database_unavailable():
+        analyzer = FeedbackAnalyzer()
+        entries = [feedback_entry(number, rating=number % 5 + 1) for number in range(10)]
+        for entry in entries:
+            analyzer.add_feedback(entry)
+        assert all("feedback_id" in entry for entry in entries)
+        assert FeedbackAnalyzer().feedback_data == entries
+
+        analyzer.save_feedback()
+        assert not os.path.exists(FEEDBACK_LOG_PATH)
+        assert FeedbackAnalyzer().feedback_data == entries
+    logger.info("Analyzer round trip OK")
+
+def test_compaction_snapshots_only_logged_entries():
+    """Observed feedback is not copied into the snapshot; identical entries stay distinct"""
+    with data_directory(), database_unavailable():
+        analyzer = FeedbackAnalyzer()
+        analyzer.observe_feedback(feedback_entry("observed"))
+        for _ in range(2):
+            analyzer.add_feedback(feedback_entry("logged"))
+        analyzer.save_feedback()
+        assert len(analyzer.feedback_data) == 3
+
+        with open(FEEDBACK_SNAPSHOT_PATH) as f:
+            assert [entry["message"] for entry in json.load(f)] == ["feedback logged"] * 2
+        assert [entry["message"] for entry in FeedbackAnalyzer().feedback_data] == ["feedback logged"] * 2
+    logger.info("Snapshot contents OK")
+
+def test_legacy_entries_keep_stable_ids():
+    """Entries written without a feedback_id load with the same ids before and after compaction"""
+    with data_directory(), database_unavailable():
+        os.makedirs("data")
+        with open(FEEDBACK_SNAPSHOT_PATH, "w") as f:
+            json.dump([feedback_entry(0), feedback_entry(0)], f)
+        with open(FEEDBACK_LOG_PATH, "w") as f:
+            f.write(json.dumps(feedback_entry(1)) + "\n")
+
+        analyzer = FeedbackAnalyzer()
+        ids = [entry["feedback_id"] for entry in analyzer.feedback_data]
+        assert len(set(ids)) == 3
+        analyzer.save_feedback()
+        assert [entry["feedback_id"] for entry in analyzer.feedback_data] == ids
+        assert [entry["feedback_id"] for entry in FeedbackAnalyzer().feedback_data] == ids
+    logger.info("Legacy ids OK")
+
+def test_compaction_scheduled_from_flusher():
+    """The flusher runs its listeners, which compact the log once it is large enough"""
+    async def run_flusher(queue, seconds):
+        queue.start()
+        await asyncio.sleep(seconds)
+        await queue.stop()
+
+    with data_directory(), database_unavailable():
+        analyzer = FeedbackAnalyzer()
+        assert not analyzer.compact_if_needed()
+        queue = FeedbackQueue(flush_interval=0.05)
+        queue.add_flush_listener(lambda: analyzer.compact_if_needed(max_log_bytes=200))
+        for number in range(10):
+            queue.put(feedback_entry(number))
+        asyncio.run(run_flusher(queue, 0.3))
+
+        assert not os.path.exists(FEEDBACK_LOG_PATH)
+        assert len(FeedbackAnalyzer().feedback_data) == 10
+    logger.info("Scheduled compaction OK")
+
+def test_compaction_keeps_concurrent_appends():
+    """Entries appended while save_feedback compacts the log are not lost"""
+    with data_directory(), database_unavailable():
+        analyzer = FeedbackAnalyzer()
+        for number in range(5):
+            analyzer.add_feedback(feedback_entry(number))
+        # Logged by another process, so not in this analyzer's memory
+        append_feedback_log([feedback_entry("from another process", rating=1)])
+
+        stop = threading.Event()
+        appended = []
+
+        def writer():
+            while not stop.is_set():
+                entry = feedback_entry(f"concurrent {len(appended)}", rating=3)
+                append_feedback_log([entry])
+                appended.append(entry)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            for _ in range(20):
+                analyzer.save_feedback()
+        finally:
+            stop.set()
+            thread.join()
+
+        messages = [entry["message"] for entry in FeedbackAnalyzer().feedback_data]
+        assert len(messages) == 6 + len(appended)
+        assert "feedback from another process" in messages
+        assert all(entry["message"] in messages for entry in appended)
+    logger.info("Concurrent compaction OK")
+
+def append_entries(count):
+    """Log entries the way another worker process would"""
+    for number in range(count):
+        append_feedback_log([feedback_entry(f"process {os.getpid()} entry {number}", rating=2)])
+
+def compact_repeatedly(times):
+    """Compact the log the way another worker process would"""
+    with database_unavailable():
+        analyzer = FeedbackAnalyzer()
+        for _ in range(times):
+            analyzer.save_feedback()
+
+def test_compaction_across_processes():
+    """Worker processes appending to and compacting the same log lose nothing"""
+    with data_directory(), database_unavailable():
+        processes = [multiprocessing.Process(target=append_entries, args=(50,)) for _ in range(2)]
+        processes += [multiprocessing.Process(target=compact_repeatedly, args=(10,)) for _ in range(2)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        assert [process.exitcode for process in processes] == [0, 0, 0, 0]
+
+        messages = [entry["message"] for entry in FeedbackAnalyzer().feedback_data]
+        assert len(messages) == len(set(messages)) == 100
+        assert not [name for name in os.listdir("data") if name.endswith(".tmp")]
+    logger.info("Cross-process compaction OK")
+
+if __name__ == "__main__":
+    logger.info("Testing the feedback queue and log...")
+    run_tests(
+        test_batches_written_to_mongodb,
+        test_backpressure,
+        test_log_fallback_and_shutdown,
+        test_only_failed_inserts_are_logged,
+        test_analyzer_round_trip,
+        test_compaction_snapshots_only_logged_entries,
+        test_legacy_entries_keep_stable_ids,
+        test_compaction_scheduled_from_flusher,
+        test_compaction_keeps_concurrent_appends,
+        test_compaction_across_processes
+    )
+    logger.info("Testing complete!")
@@ -0,0 +1,169 @@
+import contextlib
+import logging
+import os
+import tempfile
+from collections import Counter, defaultdict
+from datetime import date, datetime
+
+from feedback_analyzer import FeedbackAnalyzer
+from feedback_queue import FEEDBACK_LOG_PATH, FeedbackQueue
+from feedback_store import FeedbackStore
+from test_feedback_queue import database_unavailable
+from test_feedback_store import random_feedback
+from testing_db import connect_test_collection, run_tests
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+@contextlib.contextmanager
+def data_directory():
+    """Run in an empty working directory, so data/ files don't touch the repo's"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            yield directory
+        finally:
+            os.chdir(cwd)
+
+def post_feedback(queue, analyzer, rating):
+    """What POST /feedback does: buffer the entry for MongoDB and count it in the live stats"""
+    entry = {"user_id": "anonymous", "rating": rating, "message": "", "conversation_id": "",
+             "timestamp": datetime.now().isoformat()}
+    assert queue.put(entry)
+    analyzer.observe_feedback(entry)
+
+def ratings_by_day(entries):
+    """Ratings grouped by local calendar day, recomputed from every entry"""
+    days = defaultdict(list)
+    for entry in entries:
+        if "rating" in entry:
+            days[datetime.fromisoformat(entry["timestamp"]).date().toordinal()].append(entry["rating"])
+    return days
+
+def test_rating_distribution():
+    """Bucket histograms give the counts a pass over every entry gave"""
+    entries = random_feedback(1000)
+    expected = Counter(entry["rating"] for entry in entries if entry.get("rating") is not None)
+    assert FeedbackStore(entries).rating_counts() == dict(sorted(expected.items()))
+    logger.info("Rating distribution OK")
+
+def test_daily_stats():
+    """Per-day counts and averages match grouping the entries by day"""
+    entries = random_feedback(1000)
+    days = ratings_by_day(entries)
+    first_day = date.today().toordinal() - 14 + 1
+    expected = [
+        {"date": date.fromordinal(day).isoformat(), "count": len(days[day]), "average": round(sum(days[day]) / len(days[day]), 2)}
+        for day in sorted(days) if day >= first_day
+    ]
+    assert FeedbackStore(entries).daily_stats(14) == expected
+    logger.info("Daily stats OK")
+
+def test_moving_average():
+    """The sliding sum equals a 7-calendar-day average recomputed per day"""
+    entries = random_feedback(1000)
+    days = ratings_by_day(entries)
+    store = FeedbackStore(entries)
+    series = store.buckets.moving_average(7)
+    assert [day for day, _ in series] == sorted(days)
+    for day, average in series:
+        window = [rating for d in days if day - 7 < d <= day for rating in days[d]]
+        assert abs(average - sum(window) / len(window)) < 1e-9, day
+    logger.info("Moving average OK")
+
+def test_incremental_buckets():
+    """Buckets updated on every append equal buckets built in one load"""
+    entries = random_feedback(400)
+    appended = FeedbackStore()
+    for entry in entries:
+        appended.append(entry)
+    loaded = FeedbackStore(entries)
+    assert appended.buckets.days == loaded.buckets.days
+    assert appended.buckets.counts == loaded.buckets.counts
+    assert all(abs(appended.buckets.sums[day] - loaded.buckets.sums[day]) < 1e-9 for day in loaded.buckets.days)
+    assert appended.daily_stats(60) == loaded.daily_stats(60)
+    logger.info("Incremental buckets OK")
+
+def test_observed_feedback_in_stats():
+    """observe_feedback updates the stats without writing to the log"""
+    with data_directory(), database_unavailable():
+        analyzer = FeedbackAnalyzer()
+        for rating in [5, 4, 3]:
+            analyzer.observe_feedback({"rating": rating, "message": "observed"})
+        assert not os.path.exists(FEEDBACK_LOG_PATH)
+
+        stats = analyzer.get_stats(days=7)
+        assert stats["total_feedback"] == 3
+        assert stats["average_rating"]["all"] == 4.0 and stats["average_rating"]["day"] == 4.0
+        assert stats["rating_distribution"] == {3: 1, 4: 1, 5: 1}
+        assert stats["daily"] == [{"date": date.today().isoformat(), "count": 3, "average": 4.0}]
+        assert stats["moving_average_7d"] == [{"date": date.today().isoformat(), "average": 4.0}]
+    logger.info("Feedback stats OK")
+
+def test_posted_feedback_survives_reload():
+    """Feedback stored in MongoDB or, while it is down, in the log is counted once after a reload"""
+    collection = connect_test_collection()
+    feedback = collection.database["feedback"]
+    feedback.drop()
+
+    with data_directory():
+        analyzer = FeedbackAnalyzer()
+        queue = FeedbackQueue()
+        for rating in [5, 4, 3]:
+            post_feedback(queue, analyzer, rating)
+        assert queue.flush() == 3 and feedback.count_documents({}) == 3
+        with database_unavailable():
+            post_feedback(queue, analyzer, 1)
+            assert queue.flush() == 1 and os.path.exists(FEEDBACK_LOG_PATH)
+
+        stats = analyzer.get_stats()
+        assert stats["total_feedback"] == 4 and stats["rating_distribution"] == {1: 1, 3: 1, 4: 1, 5: 1}
+        reloaded = FeedbackAnalyzer().get_stats()
+        assert reloaded["total_feedback"] == 4
+        assert reloaded["rating_distribution"] == stats["rating_distribution"]
+
+        # Compaction keeps MongoDB's entries out of the snapshot, so nothing is counted twice
+        analyzer.save_feedback()
+        assert FeedbackAnalyzer().get_stats()["total_feedback"] == 4
+    feedback.drop()
+    logger.info("Feedback survives reload OK")
+
+def test_refresh_reads_other_workers_feedback():
+    """refresh adds what other processes wrote to MongoDB, once"""
+    collection = connect_test_collection()
+    feedback = collection.database["feedback"]
+    feedback.drop()
+
+    with data_directory():
+        worker = FeedbackAnalyzer()
+        other_worker = FeedbackAnalyzer()
+        queue = FeedbackQueue()
+        for rating in [5, 3]:
+            post_feedback(queue, other_worker, rating)
+        queue.flush()
+
+        assert worker.refresh(min_interval=0) == 2
+        assert worker.refresh(min_interval=0) == 0
+        assert other_worker.refresh(min_interval=0) == 0
+        assert worker.get_stats() == other_worker.get_stats()
+        # Throttled right after a read
+        post_feedback(queue, other_worker, 1)
+        queue.flush()
+        assert worker.refresh() == 0
+    feedback.drop()
+    logger.info("Feedback refresh OK")
+
+if __name__ == "__main__":
+    logger.info("Testing the rolling feedback aggregates...")
+    run_tests(
+        test_rating_distribution,
+        test_daily_stats,
+        test_moving_average,
+        test_incremental_buckets,
+        test_observed_feedback_in_stats,
+        test_posted_feedback_survives_reload,
+        test_refresh_reads_other_workers_feedback
+    )
+    logger.info("Testing complete!")
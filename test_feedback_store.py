@@ -0,0 +1,97 @@
+import logging
+import random
+from datetime import datetime, timedelta
+
+from feedback_store import FeedbackStore, parse_timestamp, seconds_ago
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+PERIOD_DAYS = {"day": 1, "week": 7, "month": 30}
+
+def random_feedback(count, seed=11):
+    """Feedback spread over the last 60 days, in random order, some entries without a rating"""
+    generator = random.Random(seed)
+    now = datetime.now()
+    entries = []
+    for number in range(count):
+        entry = {
+            "message": f"feedback {number}",
+            "timestamp": (now - timedelta(seconds=generator.uniform(60, 60 * 86400))).isoformat()
+        }
+        if generator.random() < 0.9:
+            entry["rating"] = generator.randint(1, 5)
+        entries.append(entry)
+    return entries
+
+def linear_average_rating(entries, time_period=None):
+    """Scan every entry, as FeedbackAnalyzer.get_average_rating did before the store"""
+    filtered = entries
+    if time_period:
+        now = datetime.now()
+        filtered = [
+            entry for entry in entries
+            if (now - datetime.fromisoformat(entry["timestamp"])).days <= PERIOD_DAYS[time_period]
+        ]
+    ratings = [entry["rating"] for entry in filtered if "rating" in entry]
+    return sum(ratings) / len(ratings) if ratings else 0.0
+
+def test_entries_kept_in_time_order():
+    """Appends in any order and bulk loads give the same time-sorted store"""
+    entries = random_feedback(500)
+    appended = FeedbackStore()
+    for entry in entries:
+        appended.append(entry)
+    loaded = FeedbackStore(entries)
+
+    expected = sorted(entries, key=lambda entry: entry["timestamp"])
+    assert appended.entries == expected and loaded.entries == expected
+    assert list(appended.timestamps) == sorted(parse_timestamp(e["timestamp"]) for e in entries)
+    assert list(appended.timestamps) == list(loaded.timestamps)
+    assert appended.rating_counts() == loaded.rating_counts()
+    logger.info("Time order OK")
+
+def test_averages_match_linear_scan():
+    """Window averages equal the per-entry scan for every period"""
+    entries = random_feedback(2000)
+    store = FeedbackStore(entries)
+    assert abs(store.average_rating() - linear_average_rating(entries)) < 1e-9
+    for period, days in PERIOD_DAYS.items():
+        expected = linear_average_rating(entries, period)
+        assert abs(store.average_rating(since=seconds_ago(days + 1)) - expected) < 1e-9, period
+    assert FeedbackStore().average_rating() == 0.0
+    logger.info("Window averages OK")
+
+def test_windows_and_recent():
+    """Windows bisect the timestamp column; recent returns the newest entries first"""
+    entries = random_feedback(300)
+    store = FeedbackStore(entries)
+    since = seconds_ago(7)
+    lo, hi = store.window(since=since)
+    assert store.entries[lo:hi] == [e for e in store.entries if parse_timestamp(e["timestamp"]) > since]
+
+    newest = sorted(entries, key=lambda entry: entry["timestamp"], reverse=True)
+    assert store.recent(20) == newest[:20]
+    assert store.recent(0) == []
+    # Entries without a rating are NaN in the column
+    column = store.rating_column(lo, hi)
+    assert [rating for rating in column if rating == rating] == [e["rating"] for e in store.entries[lo:hi] if "rating" in e]
+    logger.info("Windows OK")
+
+def test_unreadable_timestamps_sort_first():
+    """Entries without a readable timestamp are kept, as the oldest"""
+    store = FeedbackStore([{"rating": 5, "timestamp": "2026-01-02T00:00:00"}])
+    store.append({"rating": 1, "timestamp": "yesterday"})
+    store.append({"rating": 3})
+    assert [entry["rating"] for entry in store.entries] == [1, 3, 5]
+    assert store.average_rating() == 3.0
+    logger.info("Unreadable timestamps OK")
+
+if __name__ == "__main__":
+    logger.info("Testing the feedback store...")
+    test_entries_kept_in_time_order()
+    test_averages_match_linear_scan()
+    test_windows_and_recent()
+    test_unreadable_timestamps_sort_first()
+    logger.info("Testing complete!")
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import os
+
+import db_connection
+from db_connection import DatabaseHealthProbe, RecipeDatabase, recipe_database
+from testing_db import connect_test_collection, run_tests
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class PingCounter:
+    """Stands in for RecipeDatabase and counts pings"""
+
+    def __init__(self, connected=True):
+        self.connected = connected
+        self.pings = 0
+
+    def ping(self):
+        self.pings += 1
+        return self.connected
+
+async def check_probe():
+    database = PingCounter()
+    probe = DatabaseHealthProbe(database, interval=0.05)
+    assert probe.status["database_connected"] is False and probe.status["checked_at"] is None
+
+    probe.start()
+    probe.start()
+    await asyncio.sleep(0.22)
+    # Reading the status never reaches the database
+    for _ in range(100):
+        assert probe.status["database_connected"] is True
+    pings = database.pings
+    assert pings >= 2
+    assert probe.status["checked_at"] and probe.status["latency_ms"] is not None
+
+    database.connected = False
+    await asyncio.sleep(0.1)
+    assert probe.status["database_connected"] is False
+
+    await probe.stop()
+    pings = database.pings
+    await asyncio.sleep(0.12)
+    assert database.pings == pings
+
+def test_health_reads_cached_status():
+    """The probe pings on its interval; health reads only its last result"""
+    asyncio.run(check_probe())
+    logger.info("Health probe OK")
+
+def test_one_pooled_client():
+    """Every request reuses the shared client instead of opening its own"""
+    connect_test_collection()
+
+    created = []
+    mongo_client = db_connection.MongoClient
+
+    def counting_client(*args, **kwargs):
+        created.append(kwargs)
+        return mongo_client(*args, **kwargs)
+
+    db_connection.MongoClient = counting_client
+    try:
+        databases = [recipe_database.get_database() for _ in range(20)]
+    finally:
+        db_connection.MongoClient = mongo_client
+    assert created == []
+    assert all(database is databases[0] for database in databases)
+    assert recipe_database.ping() is True
+    logger.info("Pooled client OK")
+
+def test_pool_options():
+    """Pool sizes come from the environment"""
+    saved = {name: os.environ.get(name) for name in ("MONGO_MAX_POOL_SIZE", "MONGO_MIN_POOL_SIZE")}
+    os.environ["MONGO_MAX_POOL_SIZE"] = "20"
+    os.environ["MONGO_MIN_POOL_SIZE"] = "2"
+    try:
+        options = RecipeDatabase()._client_options()
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                del os.environ[name]
+            else:
+                os.environ[name] = value
+    assert options["maxPoolSize"] == 20 and options["minPoolSize"] == 2
+    logger.info("Pool options OK")
+
+if __name__ == "__main__":
+    logger.info("Testing the pooled client and health probe...")
+    run_tests(
+        test_health_reads_cached_status,
+        test_one_pooled_client,
+        test_pool_options
+    )
+    logger.info("Testing complete!")
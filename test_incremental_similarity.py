@@ -0,0 +1,97 @@
+import logging
+import os
+
+import numpy as np
+
+import recommendation_engine
+from recommendation_engine import RecipeRecommender
+from recommender_store import RecommenderStore
+from test_recipe_similarity import data_directory, random_recipes
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def update_in_batches(recommender):
+    """Add recipes, then re-featurize some of them and add more, in several batches"""
+    recommender.update_many_recipe_features(random_recipes(30, seed=1))
+    recommender.update_many_recipe_features(random_recipes(10, seed=2))
+    recommender.update_many_recipe_features(random_recipes(15, seed=3, prefix="added"))
+    for recipe_id, recipe in random_recipes(3, seed=4, prefix="single").items():
+        recommender.update_recipe_features(recipe_id, recipe)
+
+def rebuilt(recommender):
+    """A recommender built from scratch with the same features, in the same order"""
+    fresh = RecipeRecommender()
+    features = recommender.recipe_features
+    fresh._place_feature_rows({recipe_id: features[recipe_id] for recipe_id in recommender.recipe_ids})
+    fresh._compute_recipe_similarity()
+    return fresh
+
+def brute_force_top(recommender, position, k):
+    """The k best similarities to one recipe, from the full product"""
+    scores = (recommender.feature_matrix @ recommender.feature_matrix[position].T).toarray().ravel()
+    scores[position] = -np.inf
+    return np.sort(scores)[::-1][:k]
+
+def test_dense_updates_match_full_recompute():
+    """Updating changed rows and columns gives the all-pairs similarity of a rebuild"""
+    with data_directory():
+        recommender = RecipeRecommender()
+        update_in_batches(recommender)
+        assert len(recommender.recipe_ids) == 48
+        fresh = rebuilt(recommender)
+        assert fresh.recipe_ids == recommender.recipe_ids
+        assert np.allclose(recommender.recipe_similarity, fresh.recipe_similarity, atol=1e-5)
+        assert recommender.get_similar_recipes("recipe-3") == fresh.get_similar_recipes("recipe-3")
+    logger.info("Dense updates OK")
+
+def test_neighbor_table_updates():
+    """Past the dense limit only the affected neighbor rows are recomputed, and they stay exact"""
+    dense_limit = recommendation_engine.DENSE_SIMILARITY_LIMIT
+    neighbors = recommendation_engine.NEIGHBORS_PER_RECIPE
+    recommendation_engine.DENSE_SIMILARITY_LIMIT = 20
+    recommendation_engine.NEIGHBORS_PER_RECIPE = 5
+    try:
+        with data_directory():
+            recommender = RecipeRecommender()
+            update_in_batches(recommender)
+            table = recommender.recipe_similarity
+            assert table.shape == (48, 48)
+            for position in range(48):
+                row = np.sort(table[position].toarray().ravel())[::-1][:5]
+                assert np.allclose(row, brute_force_top(recommender, position, 5), atol=1e-5), position
+    finally:
+        recommendation_engine.DENSE_SIMILARITY_LIMIT = dense_limit
+        recommendation_engine.NEIGHBORS_PER_RECIPE = neighbors
+    logger.info("Neighbor table updates OK")
+
+def test_updates_survive_restart():
+    """Logged updates are replayed on load and folded into the store on compaction"""
+    with data_directory():
+        recommender = RecipeRecommender()
+        update_in_batches(recommender)
+        features = recommender.recipe_features
+        assert os.path.getsize(RecommenderStore().log_path("features")) > 0
+
+        restarted = RecipeRecommender()
+        assert restarted.recipe_ids == recommender.recipe_ids
+        assert restarted.recipe_features.keys() == features.keys()
+        assert np.allclose(restarted.recipe_similarity, recommender.recipe_similarity, atol=1e-5)
+
+        compact_every = recommendation_engine.FEATURES_COMPACT_EVERY
+        recommendation_engine.FEATURES_COMPACT_EVERY = 1
+        try:
+            restarted.update_recipe_features("recipe-0", random_recipes(1, seed=9)["recipe-0"])
+        finally:
+            recommendation_engine.FEATURES_COMPACT_EVERY = compact_every
+        assert RecommenderStore().read_log("features") == []
+        assert RecipeRecommender().recipe_features == restarted.recipe_features
+    logger.info("Restart OK")
+
+if __name__ == "__main__":
+    logger.info("Testing incremental similarity updates...")
+    test_dense_updates_match_full_recompute()
+    test_neighbor_table_updates()
+    test_updates_survive_restart()
+    logger.info("Testing complete!")
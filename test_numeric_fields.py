@@ -0,0 +1,94 @@
+import logging
+
+import recipe_db
+from import_recipes import derive_numeric_fields
+from nutritional_analysis import (
+    NUTRIENT_FIELDS, analyze_recipe_nutrition, meets_nutritional_requirements, nutrition_range_query
+)
+from preference_filter import parse_time_minutes, recipe_total_minutes
+from recipe_complexity import complexity_analyzer
+from recipe_filter import recipe_filter
+from testing_db import connect_test_collection, run_tests
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# A row as import_recipes has it before the numeric fields are derived
+RAW_RECIPE = {
+    "RecipeName": "Palak Paneer",
+    "TotalTimeInMins": 40,
+    "Servings": 4,
+    "ingredients": ["250 grams paneer", "2 cups spinach", "1 onion", "2 tablespoons butter"],
+    "instructions": ["Blanch the spinach.", "Blend it.", "Fry the onion in butter.", "Simmer with the paneer."]
+}
+
+def test_total_minutes_precedence():
+    """The stored field wins, then TotalTimeInMins, then the time text"""
+    assert recipe_total_minutes({"total_minutes": 15, "TotalTimeInMins": 40, "time": "1 hour"}) == 15
+    assert recipe_total_minutes({"TotalTimeInMins": 40, "time": "1 hour"}) == 40
+    assert recipe_total_minutes({"TotalTimeInMins": float("nan"), "time": "1 hour"}) == 60
+    assert recipe_total_minutes({"total_minutes": float("nan"), "time": "25 mins"}) == 25
+    assert recipe_total_minutes({"time": "overnight"}) is None
+    logger.info("Total minutes OK")
+
+def test_derived_fields_match_the_parsers():
+    """Import stores what the text parsers and analyzers computed per request"""
+    fields = derive_numeric_fields(RAW_RECIPE)
+    assert fields["total_minutes"] == parse_time_minutes(RAW_RECIPE["TotalTimeInMins"])
+    per_serving = analyze_recipe_nutrition(RAW_RECIPE).get("per_serving", {})
+    for nutrient in NUTRIENT_FIELDS:
+        assert fields.get(nutrient) == per_serving.get(nutrient), nutrient
+    assert fields["complexity_score"] == complexity_analyzer.analyze_recipe(RAW_RECIPE)["score"]
+
+    # Missing values are left out rather than stored as NaN
+    fields = derive_numeric_fields(dict(RAW_RECIPE, TotalTimeInMins=float("nan")))
+    assert "total_minutes" not in fields
+    assert all(value == value for value in fields.values())
+    logger.info("Derived fields OK")
+
+def test_nutrition_requirements():
+    """Stored nutrients are read directly and requirements become range clauses"""
+    requirements = {"calories": {"max": 400}, "protein": {"min": 20}, "fiber": {"min": 5}}
+    assert nutrition_range_query(requirements) == {"calories": {"$lte": 400}, "protein": {"$gte": 20}}
+    stored = {"calories": 350, "protein": 22, "carbs": 10, "fat": 25}
+    assert meets_nutritional_requirements(stored, {"calories": {"max": 400}, "protein": {"min": 20}})
+    assert not meets_nutritional_requirements(stored, {"calories": {"max": 300}})
+    logger.info("Nutrition requirements OK")
+
+def test_sort_by_complexity():
+    """The stored complexity_score orders recipes; rows without it are analyzed"""
+    stored = [
+        {"RecipeName": "Hard", "complexity_score": 0.8},
+        {"RecipeName": "Easy", "complexity_score": 0.1}
+    ]
+    assert complexity_analyzer.complexity_score(stored[0]) == 0.8
+    raw_score = complexity_analyzer.analyze_recipe(RAW_RECIPE)["score"]
+    assert complexity_analyzer.complexity_score(RAW_RECIPE) == raw_score
+    assert 0.1 < raw_score < 0.8
+
+    ranked = recipe_filter.sort_recipes(stored + [RAW_RECIPE], "complexity")
+    assert [recipe["RecipeName"] for recipe in ranked] == ["Easy", "Palak Paneer", "Hard"]
+    logger.info("Complexity sort OK")
+
+def test_weighted_scoring_ranges():
+    """Range clauses on the stored fields are hard filters"""
+    connect_test_collection()
+
+    result = recipe_db.search_with_weighted_scoring(
+        {"diet": "vegetarian"}, ranges={"calories": {"$lte": 350}, "protein": {"$gte": 20}}
+    )
+    assert [recipe["RecipeName"] for recipe in result["results"]] == ["Quick Paneer Tikka", "Masala Omelette"]
+    assert result["total_matches"] == 2
+    logger.info("Range filters OK")
+
+if __name__ == "__main__":
+    logger.info("Testing the numeric import fields...")
+    run_tests(
+        test_total_minutes_precedence,
+        test_derived_fields_match_the_parsers,
+        test_nutrition_requirements,
+        test_sort_by_complexity,
+        test_weighted_scoring_ranges
+    )
+    logger.info("Testing complete!")
@@ -0,0 +1,126 @@
+import logging
+
+from bson import ObjectId
+
+from pagination import InvalidCursor, cached_count, decode_cursor, encode_cursor, fetch_page
+from search_cache import notify_recipes_reloaded
+from testing_db import connect_test_collection, run_tests
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def skip_pages(collection, query, limit, sort=None):
+    """Every page fetched with skip/limit, as /recipes paginated before cursors"""
+    pages = []
+    page = 1
+    while True:
+        cursor = collection.find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        documents = list(cursor.skip((page - 1) * limit).limit(limit))
+        if not documents:
+            return pages
+        pages.append(documents)
+        page += 1
+
+def cursor_pages(collection, query, limit, sort=None):
+    """Every page fetched by following next_cursor"""
+    pages = []
+    cursor = None
+    while True:
+        documents, cursor = fetch_page(collection, query, limit, cursor=cursor, sort=sort)
+        pages.append(documents)
+        if cursor is None:
+            return pages
+
+def test_cursor_round_trip():
+    """Cursors are opaque tokens that decode back to their position"""
+    position = {"after": ObjectId()}
+    assert decode_cursor(encode_cursor(position)) == position
+    for token in ["not a cursor", encode_cursor({"after": 1})[:-2] + "!!", "WzFd"]:
+        try:
+            decode_cursor(token)
+        except InvalidCursor:
+            continue
+        raise AssertionError(f"{token} decoded")
+    logger.info("Cursor tokens OK")
+
+def test_keyset_pages_match_skip_pages():
+    """Following cursors returns the pages skip/limit returned"""
+    collection = connect_test_collection()
+
+    for query in [{}, {"diet": "vegetarian"}, {"Cuisine": "Indian"}]:
+        for limit in [1, 2, 4, 10]:
+            assert cursor_pages(collection, query, limit) == skip_pages(collection, query, limit), (query, limit)
+    logger.info("Keyset pages OK")
+
+def test_sorted_pages_use_offsets():
+    """Sorted results page by offset, like the legacy page numbers"""
+    collection = connect_test_collection()
+
+    sort = [("total_minutes", -1)]
+    assert cursor_pages(collection, {}, 4, sort=sort) == skip_pages(collection, {}, 4, sort=sort)
+    documents, cursor = fetch_page(collection, {}, 2, sort=sort, skip=2)
+    assert [recipe["total_minutes"] for recipe in documents] == [30, 25]
+    assert decode_cursor(cursor) == {"offset": 4}
+    try:
+        fetch_page(collection, {}, 2, cursor=encode_cursor({"offset": -1}), sort=sort)
+    except InvalidCursor:
+        pass
+    else:
+        raise AssertionError("negative offset accepted")
+    logger.info("Sorted pages OK")
+
+def test_sorted_pages_stop_at_max_offset():
+    """Offset pages end at max_offset instead of skipping ever deeper"""
+    collection = connect_test_collection()
+
+    sort = [("total_minutes", -1)]
+    documents, cursor = fetch_page(collection, {}, 2, sort=sort, max_offset=3)
+    assert len(documents) == 2 and decode_cursor(cursor) == {"offset": 2}
+    documents, cursor = fetch_page(collection, {}, 2, cursor=cursor, sort=sort, max_offset=3)
+    assert [recipe["total_minutes"] for recipe in documents] == [30] and cursor is None
+    for position in [{"offset": 3}, {"offset": 4}]:
+        try:
+            fetch_page(collection, {}, 2, cursor=encode_cursor(position), sort=sort, max_offset=3)
+        except InvalidCursor:
+            continue
+        raise AssertionError(f"{position} accepted")
+    logger.info("Sorted page depth OK")
+
+def test_legacy_page_number():
+    """skip applies to the first request only"""
+    collection = connect_test_collection()
+
+    pages = skip_pages(collection, {}, 2)
+    documents, cursor = fetch_page(collection, {}, 2, skip=2)
+    assert documents == pages[1]
+    documents, cursor = fetch_page(collection, {}, 2, cursor=cursor, skip=2)
+    assert documents == pages[2] and cursor is None
+    logger.info("Legacy page numbers OK")
+
+def test_cached_count():
+    """Totals are cached until the recipes are reloaded"""
+    collection = connect_test_collection()
+
+    assert cached_count(collection, {}) == 6
+    assert cached_count(collection, {"diet": "vegan"}) == 2
+    collection.delete_many({"diet": "vegan"})
+    assert cached_count(collection, {"diet": "vegan"}) == 2
+    notify_recipes_reloaded()
+    assert cached_count(collection, {"diet": "vegan"}) == 0
+    assert cached_count(collection, {}) == 4
+    logger.info("Cached counts OK")
+
+if __name__ == "__main__":
+    logger.info("Testing keyset pagination...")
+    run_tests(
+        test_cursor_round_trip,
+        test_keyset_pages_match_skip_pages,
+        test_sorted_pages_use_offsets,
+        test_sorted_pages_stop_at_max_offset,
+        test_legacy_page_number,
+        test_cached_count
+    )
+    logger.info("Testing complete!")
@@ -0,0 +1,97 @@
+import logging
+import threading
+import time
+
+import recipe_db
+from pantry_matcher import PantryMatcher
+from testing_db import TEST_RECIPES, connect_test_collection, run_tests
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+TEST_PANTRIES = [
+    ["tomatoes", "basil", "onion"],
+    ["Paneer", " chilli powder ", "curd"],
+    ["eggs", "onion"],
+    ["chicken"],
+    ["coconut milk", "vegetables", "curry paste"],
+    [],
+]
+
+def linear_rank(recipes, available_ingredients, min_match_percentage=0.6):
+    """Per-recipe substring scan, as recipe_db ranked pantries before the matrix"""
+    pantry = [ing.lower().strip() for ing in available_ingredients if ing and ing.strip()]
+    ranked = []
+    for position, recipe in enumerate(recipes):
+        ingredients = [ing.lower() for ing in recipe["cleaned_ingredients"]]
+        matching = sum(1 for ing in ingredients if any(item in ing or ing in item for item in pantry))
+        match_percentage = matching / len(ingredients) if ingredients else 0
+        if match_percentage >= min_match_percentage:
+            ranked.append((position, match_percentage, len(ingredients) - matching))
+    ranked.sort(key=lambda item: item[1], reverse=True)
+    return ranked
+
+def test_rank_matches_linear_scan():
+    """The sparse product ranks pantries exactly as the per-recipe scan did"""
+    matcher = PantryMatcher().build_from_recipes(TEST_RECIPES)
+    for pantry in TEST_PANTRIES:
+        for threshold in (0.3, 0.6, 1.0):
+            expected = linear_rank(TEST_RECIPES, pantry, threshold)
+            actual = [
+                (item["recipe_id"], item["match_percentage"], item["missing_ingredients"])
+                for item in matcher.rank(pantry, threshold)
+            ]
+            assert [position for position, _, _ in actual] == [position for position, _, _ in expected], pantry
+            for (_, percentage, missing), (_, expected_percentage, expected_missing) in zip(actual, expected):
+                assert abs(percentage - expected_percentage) < 1e-6 and missing == expected_missing
+    logger.info("Pantry ranking matches the linear scan")
+
+def test_search_by_available_ingredients():
+    """Ranked recipes come back as full documents, best match first"""
+    connect_test_collection()
+
+    recipes = recipe_db.search_by_available_ingredients(["tomatoes", "basil", "onion", "eggs"])
+    assert [recipe["RecipeName"] for recipe in recipes] == ["Tomato Basil Soup", "Masala Omelette"]
+    assert recipes[0]["instructions"]
+    assert recipe_db.search_by_available_ingredients(["saffron"]) == []
+    logger.info("Pantry search OK")
+
+def test_concurrent_first_use_builds_once():
+    """Concurrent first pantry searches share one matrix build"""
+    connect_test_collection()
+
+    builds = []
+    original_build = PantryMatcher.build_from_collection
+
+    def slow_build(self, *args, **kwargs):
+        builds.append(self)
+        time.sleep(0.2)
+        return original_build(self, *args, **kwargs)
+
+    counts = []
+    PantryMatcher.build_from_collection = slow_build
+    try:
+        threads = [
+            threading.Thread(target=lambda: counts.append(len(recipe_db.search_by_available_ingredients(["tomatoes", "basil", "onion"]))))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        PantryMatcher.build_from_collection = original_build
+
+    assert len(builds) == 1
+    assert counts == [1] * 8
+    logger.info("Concurrent matrix build OK")
+
+if __name__ == "__main__":
+    logger.info("Testing pantry matching...")
+    run_tests(
+        test_rank_matches_linear_scan,
+        test_search_by_available_ingredients,
+        test_concurrent_first_use_builds_once
+    )
+    logger.info("Testing complete!")
@@ -0,0 +1,87 @@
+import logging
+import os
+import random
+import subprocess
+import sys
+
+import numpy as np
+
+from recommendation_engine import RECOMMENDATIONS_PATH, RecipeRecommender
+from test_recipe_similarity import data_directory, loop_predictions, pairwise_similarity, random_recipes
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# The nightly job is recommendation_engine.py run as a script
+NIGHTLY_JOB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recommendation_engine.py")
+
+def rated_recommender(users=6, seed=8):
+    """A recommender with random recipes and a few ratings per user, saved to the store"""
+    recommender = RecipeRecommender()
+    recommender.update_many_recipe_features(random_recipes(40))
+    generator = random.Random(seed)
+    ratings = {}
+    for user in range(users):
+        user_id = f"user-{user}"
+        ratings[user_id] = {r: generator.randint(1, 5) for r in generator.sample(recommender.recipe_ids, 5)}
+        for recipe_id, rating in ratings[user_id].items():
+            recommender.update_user_preferences(user_id, recipe_id, rating)
+    recommender.save()
+    return recommender, ratings
+
+def test_batch_matches_loop_predictions():
+    """Block-wise batch scoring picks the recipes the per-user loop predicts highest"""
+    with data_directory():
+        recommender, ratings = rated_recommender()
+        similarity = pairwise_similarity(recommender.recipe_features)
+        recommendations = recommender.recommend_for_all_users(n=5)
+        assert sorted(recommendations) == sorted(ratings)
+        for user_id, user_ratings in ratings.items():
+            predicted = loop_predictions(similarity, user_ratings)
+            best = sorted(predicted.values(), reverse=True)[:5]
+            assert np.allclose([predicted[r] for r in recommendations[user_id]], best, atol=1e-4), user_id
+    logger.info("Batch scoring OK")
+
+def test_nightly_file_is_reloaded():
+    """A running recommender serves the lists the nightly job writes from another process"""
+    with data_directory():
+        rated_recommender()
+        server = RecipeRecommender()
+        assert server.recommendation_cache == {}
+
+        subprocess.run([sys.executable, NIGHTLY_JOB], check=True, capture_output=True)
+        assert os.path.exists(RECOMMENDATIONS_PATH)
+        recommendations = server.get_personalized_recommendations("user-0", n=3)
+        assert len(server.recommendation_cache) == 6 and server.recommendation_cache_size == 10
+        assert recommendations == server.recommendation_cache["user-0"][:3]
+        assert server.get_personalized_recommendations("user-1", n=10) == server.recommend_for_all_users(10)["user-1"]
+    logger.info("Nightly reload OK")
+
+def test_users_with_newer_ratings_are_scored_live():
+    """Precomputed lists are not served to users who rated something since"""
+    with data_directory():
+        recommender, ratings = rated_recommender()
+        recommender.precompute_recommendations()
+        newly_rated = recommender.recommendation_cache["user-1"][0]
+
+        recommender.update_user_preferences("user-1", newly_rated, 5)
+        assert "user-1" not in recommender.recommendation_cache
+        assert newly_rated not in recommender.get_personalized_recommendations("user-1", n=10)
+
+        # After a restart the logged rating is replayed and still newer than the file
+        restarted = RecipeRecommender()
+        assert "user-1" not in restarted.recommendation_cache and "user-0" in restarted.recommendation_cache
+        assert newly_rated not in restarted.get_personalized_recommendations("user-1", n=10)
+
+        restarted.precompute_recommendations()
+        assert "user-1" in restarted.recommendation_cache
+        assert newly_rated not in restarted.recommendation_cache["user-1"]
+    logger.info("Stale users OK")
+
+if __name__ == "__main__":
+    logger.info("Testing precomputed recommendations...")
+    test_batch_matches_loop_predictions()
+    test_nightly_file_is_reloaded()
+    test_users_with_newer_ratings_are_scored_live()
+    logger.info("Testing complete!")
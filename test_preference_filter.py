@@ -0,0 +1,103 @@
+import logging
+
+from preference_filter import compile_preferences, parse_time_minutes, parse_time_bound
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Recipes in the shape of recipe_db.SAMPLE_RECIPES (the local fallback data)
+LOCAL_RECIPES = [
+    {"name": "Paneer Butter Masala", "cuisine": "North Indian", "course": "main course", "diet": "vegetarian",
+     "time": "40 mins", "ingredients": ["paneer", "butter", "tomato puree", "cream"]},
+    {"name": "Chicken Tikka", "cuisine": "Indian", "course": "starter", "diet": "non-vegetarian",
+     "time": "25 mins", "ingredients": ["chicken", "yogurt", "chilli powder"]},
+    {"name": "Caprese Salad", "cuisine": "Italian", "course": "salad", "diet": "vegetarian",
+     "time": "10 mins", "ingredients": ["tomatoes", "mozzarella", "basil"]},
+    {"name": "Beef Ragu", "cuisine": "Italian", "course": "main course", "diet": "non-vegetarian",
+     "time": "1 hour 30 mins", "ingredients": ["beef", "tomatoes", "red wine"]},
+    {"name": "Vegan Pad Thai", "cuisine": "Thai", "course": "main course", "diet": "vegan",
+     "time": "30 mins", "ingredients": ["rice noodles", "tofu", "peanuts"]},
+]
+
+TEST_PREFERENCES = [
+    {},
+    {"diet": "vegetarian"},
+    {"diet": "vegan"},
+    {"cuisine": "indian"},
+    {"cuisine": "Italian", "course": "main"},
+    {"ingredient": "tomato"},
+    {"exclude_ingredient": "tomato"},
+    {"diet": "vegetarian", "time": "quick"},
+    {"cuisine": "italian", "ingredient": "basil", "exclude_ingredient": "beef"},
+]
+
+def loop_filter(recipes, preferences):
+    """Preference checks re-evaluated per recipe, as filter_recipes did before compiling them"""
+    filtered = []
+    for recipe in recipes:
+        match = True
+        if preferences.get("diet") and preferences["diet"].lower() != recipe.get("diet", "").lower():
+            if preferences["diet"].lower() == "vegetarian" and recipe.get("diet") == "non-vegetarian":
+                match = False
+        if preferences.get("cuisine") and preferences["cuisine"].lower() not in recipe.get("cuisine", "").lower():
+            match = False
+        if preferences.get("course") and preferences["course"].lower() not in recipe.get("course", "").lower():
+            match = False
+        if preferences.get("ingredient"):
+            if not any(preferences["ingredient"].lower() in ing.lower() for ing in recipe.get("ingredients", [])):
+                match = False
+        if preferences.get("exclude_ingredient"):
+            if any(preferences["exclude_ingredient"].lower() in ing.lower() for ing in recipe.get("ingredients", [])):
+                match = False
+        if preferences.get("time") and "quick" in preferences["time"].lower():
+            recipe_time = recipe.get("time", "")
+            if "hour" in recipe_time.lower() or int(recipe_time.split()[0]) > 30:
+                match = False
+        if match:
+            filtered.append(recipe)
+    return filtered
+
+def test_matches_loop_filter():
+    """Compiled predicates keep the recipes the per-recipe checks kept"""
+    for preferences in TEST_PREFERENCES:
+        expected = [recipe["name"] for recipe in loop_filter(LOCAL_RECIPES, preferences)]
+        actual = [recipe["name"] for recipe in compile_preferences(preferences).apply(LOCAL_RECIPES)]
+        assert actual == expected, preferences
+    logger.info("Compiled predicates match the loop filter")
+
+def test_limit_stops_early():
+    """apply stops once limit matches are found"""
+    seen = []
+
+    def recipes():
+        for recipe in LOCAL_RECIPES:
+            seen.append(recipe["name"])
+            yield recipe
+
+    matches = compile_preferences({"diet": "vegetarian"}).apply(recipes(), limit=2)
+    assert [recipe["name"] for recipe in matches] == ["Paneer Butter Masala", "Caprese Salad"]
+    assert len(seen) == 3
+    logger.info("Limit OK")
+
+def test_time_parsing():
+    """Times parse from text, numbers and the typed import field"""
+    assert parse_time_minutes("25 mins") == 25
+    assert parse_time_minutes("1 hour 10 minutes") == 70
+    assert parse_time_minutes("1.5 hours") == 90
+    assert parse_time_minutes(45) == 45
+    assert parse_time_minutes(float("nan")) is None
+    assert parse_time_minutes("overnight") is None
+    assert parse_time_bound("something quick") == 30
+    assert parse_time_bound("under 20 minutes") == 20
+    assert parse_time_bound("for dinner") is None
+    # Unreadable times are kept rather than guessed at
+    assert compile_preferences({"time": "quick"})({"time": "overnight"})
+    logger.info("Time parsing OK")
+
+if __name__ == "__main__":
+    logger.info("Testing preference predicates...")
+    test_matches_loop_filter()
+    test_limit_stops_early()
+    test_time_parsing()
+    logger.info("Testing complete!")
@@ -0,0 +1,145 @@
+import json
+import logging
+import re
+
+import recipe_db
+from query_compiler import QueryCompiler
+from testing_db import CONTAINED_INGREDIENT_RECIPES, TEST_RECIPES, connect_test_collection, run_tests
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Preferences whose exact-match query must select what the old $regex query selected
+TEST_PREFERENCES = [
+    {"diet": "vegan"},
+    {"diet": "vegetarian", "cuisine": "indian"},
+    {"cuisine": "italian"},
+    {"ingredient": "tomatoes"},
+    {"ingredient": "coconut milk"},
+    {"exclude_ingredient": "onion"},
+    {"diet": "gluten-free", "time": "quick"},
+    {"diet": "vegetarian", "time": "under 25 minutes"},
+]
+
+def regex_query(preferences):
+    """The $regex query recipe_db built before the query compiler
+    
+    The diet is anchored here: unanchored, "vegetarian" also matched "non-vegetarian"
+    (see test_diet_is_exact).
+    """
+    query = {}
+    if preferences.get("diet"):
+        query["diet"] = {"$regex": "^" + preferences["diet"].lower() + "$", "$options": "i"}
+    if preferences.get("cuisine"):
+        query["Cuisine"] = {"$regex": preferences["cuisine"], "$options": "i"}
+    if preferences.get("ingredient"):
+        query["ingredients"] = {"$regex": preferences["ingredient"], "$options": "i"}
+    if preferences.get("exclude_ingredient"):
+        query["ingredients"] = {"$not": re.compile(preferences["exclude_ingredient"], re.IGNORECASE)}
+    if preferences.get("time"):
+        time_value = preferences["time"].lower()
+        if "quick" in time_value:
+            query["TotalTimeInMins"] = {"$lt": 30}
+        elif "under" in time_value:
+            query["TotalTimeInMins"] = {"$lt": int("".join(c for c in time_value if c.isdigit()))}
+    return query
+
+def new_compiler():
+    """A compiler with a known cuisine vocabulary (no database needed)"""
+    compiler = QueryCompiler()
+    compiler.cuisines = {"indian", "south indian recipes", "italian", "thai"}
+    compiler.ingredient_vocabulary = {"chilli", "chili", "onion", "tomato", "nut", "walnut", "peanut", "butter", "milk", "buttermilk"}
+    compiler.vocabulary_loaded = True
+    return compiler
+
+def test_exact_clauses():
+    """Known values compile to exact, index-friendly clauses"""
+    compiler = new_compiler()
+    assert compiler.compile({"diet": "Vegetarian", "cuisine": "indian"}) == {
+        "diet": "vegetarian",
+        "cuisine_normalized": {"$in": ["indian", "south indian recipes"]}
+    }
+    # Misspellings are corrected against the vocabulary
+    assert compiler.compile({"diet": "vegitarian"}) == {"diet": "vegetarian"}
+    assert compiler.compile({"cuisine": "itallian"}) == {"cuisine_normalized": {"$in": ["italian"]}}
+    assert compiler.compile({"ingredient": "tomatoes"}) == {"ingredient_tokens": {"$all": ["tomato"]}}
+
+    query = compiler.compile({"diet": "vegan", "cuisine": "thai", "ingredient": "basil", "course": "soup"})
+    assert "$regex" not in json.dumps(query)
+    logger.info("Exact clauses OK")
+
+def test_ingredient_spellings():
+    """A corrected ingredient still matches recipes stored with the typed spelling"""
+    compiler = new_compiler()
+    assert compiler.compile({"exclude_ingredient": "chilli"}) == {"ingredient_tokens": {"$nin": ["chilli", "chili"]}}
+    assert compiler.compile({"ingredient": "chilli"}) == {"ingredient_tokens": {"$in": ["chilli", "chili"]}}
+    # Nothing searchable: no clause rather than one matching nothing
+    assert compiler.compile({"ingredient": "!!"}) == {}
+    assert compiler.compile({"exclude_ingredient": "!!"}) == {}
+    assert compiler.compile({"course": "!!"}) == {}
+    logger.info("Ingredient spellings OK")
+
+def test_diet_is_exact():
+    """A diet no longer matches labels that merely contain it"""
+    collection = connect_test_collection()
+
+    names = sorted(doc["RecipeName"] for doc in collection.find(recipe_db.build_optimized_query({"diet": "vegetarian"})))
+    assert "Chicken Curry" not in names and len(names) == 5
+    logger.info("Exact diet OK")
+
+def test_excluded_spellings():
+    """Excluding "chilli" drops what the regex dropped plus the "chili" spelling"""
+    collection = connect_test_collection()
+
+    names = sorted(doc["RecipeName"] for doc in collection.find(recipe_db.build_optimized_query({"exclude_ingredient": "chilli"})))
+    assert names == ["Pasta Primavera", "Tomato Basil Soup", "Vegan Thai Green Curry"]
+    names = sorted(doc["RecipeName"] for doc in collection.find(recipe_db.build_optimized_query({"ingredient": "chilli"})))
+    assert names == ["Chicken Curry", "Masala Omelette", "Quick Paneer Tikka"]
+    logger.info("Excluded spellings OK")
+
+def test_exclusions_match_substrings():
+    """Excluding "nut" or "milk" also drops walnut, peanut and buttermilk recipes, as the regex did"""
+    compiler = new_compiler()
+    assert compiler.compile({"exclude_ingredient": "nuts"}) == {"ingredient_tokens": {"$nin": ["nut", "peanut", "walnut"]}}
+    assert compiler.compile({"exclude_ingredient": "peanut butter"}) == {"$nor": [{"$and": [
+        {"ingredient_tokens": "peanut"}, {"ingredient_tokens": {"$in": ["butter", "buttermilk"]}}
+    ]}]}
+    # Positive matches stay exact
+    assert compiler.compile({"ingredient": "nut"}) == {"ingredient_tokens": {"$all": ["nut"]}}
+    # Without the token vocabulary the substring $regex is the last resort
+    compiler.ingredient_vocabulary = set()
+    assert compiler.compile({"exclude_ingredient": "milk"}) == {"ingredients": {"$not": {"$regex": "milk", "$options": "i"}}}
+
+    collection = connect_test_collection(TEST_RECIPES + CONTAINED_INGREDIENT_RECIPES)
+    for preferences in [{"exclude_ingredient": "nut"}, {"exclude_ingredient": "milk"}, {"exclude_ingredient": "peanut butter"}]:
+        expected = sorted(doc["RecipeName"] for doc in collection.find(regex_query(preferences)))
+        actual = sorted(doc["RecipeName"] for doc in collection.find(recipe_db.build_optimized_query(preferences)))
+        assert actual == expected, (preferences, actual, expected)
+    names = sorted(doc["RecipeName"] for doc in collection.find(recipe_db.build_optimized_query({"exclude_ingredient": "nut"})))
+    assert not {"Walnut Brownies", "Peanut Noodles", "Cashew Pulao"} & set(names)
+    names = sorted(doc["RecipeName"] for doc in collection.find(recipe_db.build_optimized_query({"exclude_ingredient": "milk"})))
+    assert "Buttermilk Pancakes" not in names
+    logger.info("Substring exclusions OK")
+
+def test_matches_regex_queries():
+    """Compiled queries select the same recipes as the old $regex queries"""
+    collection = connect_test_collection()
+
+    for preferences in TEST_PREFERENCES:
+        expected = sorted(doc["RecipeName"] for doc in collection.find(regex_query(preferences)))
+        actual = sorted(doc["RecipeName"] for doc in collection.find(recipe_db.build_optimized_query(preferences)))
+        assert actual == expected, (preferences, actual, expected)
+    logger.info("Compiled queries match the regex queries")
+
+if __name__ == "__main__":
+    logger.info("Testing the query compiler...")
+    run_tests(
+        test_exact_clauses,
+        test_ingredient_spellings,
+        test_diet_is_exact,
+        test_excluded_spellings,
+        test_exclusions_match_substrings,
+        test_matches_regex_queries
+    )
+    logger.info("Testing complete!")
@@ -0,0 +1,119 @@
+import logging
+import threading
+import time
+
+import recipe_db
+from recipe_index import RecipeIndex
+from search_cache import search_cache
+from testing_db import CONTAINED_INGREDIENT_RECIPES, TEST_RECIPES, prepare_recipe, connect_test_collection, run_tests
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def scores_by_name(result):
+    """Map recipe name -> weighted score from a search_with_weighted_scoring result"""
+    return {item["recipe"]["RecipeName"]: item["score"] for item in result["detailed_results"]}
+
+def test_index_lookup():
+    """Posting lists answer token, label and quick-time lookups"""
+    index = RecipeIndex().build_from_recipes([prepare_recipe(recipe) for recipe in TEST_RECIPES])
+    names = lambda positions: sorted(TEST_RECIPES[p]["RecipeName"] for p in positions)
+
+    assert names(index.lookup("ingredient", "tomatoes")) == ["Pasta Primavera", "Tomato Basil Soup"]
+    assert names(index.lookup("ingredient", "coconut milk")) == ["Vegan Thai Green Curry"]
+    assert len(index.lookup("diet", "Gluten Free")) == 5
+    assert names(index.match_preference("time", "quick")) == ["Quick Paneer Tikka", "Tomato Basil Soup"]
+    assert index.lookup("ingredient", "!!") == set()
+    logger.info("Index lookups OK")
+
+def test_exclusions_match_substrings():
+    """Excluding "nut" or "milk" also leaves out walnut, peanut and buttermilk recipes"""
+    recipes = TEST_RECIPES + CONTAINED_INGREDIENT_RECIPES
+    index = RecipeIndex().build_from_recipes([prepare_recipe(recipe) for recipe in recipes])
+    names = lambda positions: sorted(recipes[p]["RecipeName"] for p in positions)
+
+    assert names(index.lookup("ingredient", "nut")) == ["Cashew Pulao"]
+    assert names(index.match_preference("exclude_ingredient", "nut")) == [
+        "Cashew Pulao", "Peanut Noodles", "Vegan Thai Green Curry", "Walnut Brownies"
+    ]
+    assert names(index.match_preference("exclude_ingredient", "milk")) == ["Buttermilk Pancakes", "Vegan Thai Green Curry"]
+    assert names(index.match_preference("exclude_ingredient", "peanut butter")) == ["Peanut Noodles"]
+    assert index.match_preference("exclude_ingredient", "!!") == set()
+
+    connect_test_collection(recipes)
+    result = recipe_db.search_with_weighted_scoring({"exclude_ingredient": "nut"})
+    assert not {"Walnut Brownies", "Peanut Noodles", "Cashew Pulao"} & set(scores_by_name(result))
+    logger.info("Substring exclusions OK")
+
+def test_weighted_scoring():
+    """Diet is a hard filter and matching preferences add their weights"""
+    connect_test_collection()
+
+    result = recipe_db.search_with_weighted_scoring({"diet": "vegetarian", "cuisine": "indian"})
+    scores = scores_by_name(result)
+    assert result["total_matches"] == 5
+    assert "Chicken Curry" not in scores
+    assert scores["Quick Paneer Tikka"] == 15.0 and scores["Masala Omelette"] == 15.0
+    assert scores["Pasta Primavera"] == 10.0
+    # Highest score first, ties in collection order
+    assert [item["recipe"]["RecipeName"] for item in result["detailed_results"][:2]] == ["Quick Paneer Tikka", "Masala Omelette"]
+
+    result = recipe_db.search_with_weighted_scoring({"exclude_ingredient": "onion"})
+    assert sorted(scores_by_name(result)) == ["Pasta Primavera", "Quick Paneer Tikka", "Vegan Thai Green Curry"]
+    logger.info("Weighted scoring OK")
+
+def test_weighted_scoring_skips_deleted_recipes():
+    """Recipes deleted after the index was built don't shift scores onto other recipes"""
+    collection = connect_test_collection()
+
+    recipe_db.search_with_weighted_scoring({"diet": "vegetarian"})
+    collection.delete_one({"RecipeName": "Quick Paneer Tikka"})
+    search_cache.invalidate()
+
+    result = recipe_db.search_with_weighted_scoring({"diet": "vegetarian", "cuisine": "indian"})
+    scores = scores_by_name(result)
+    assert "Quick Paneer Tikka" not in scores
+    assert scores["Masala Omelette"] == 15.0
+    assert all(score == 10.0 for name, score in scores.items() if name != "Masala Omelette")
+    for item in result["detailed_results"]:
+        assert item["matches"].get("cuisine", False) == (item["recipe"]["Cuisine"] == "Indian")
+    logger.info("Deleted recipes skipped OK")
+
+def test_concurrent_first_use_builds_once():
+    """Concurrent first searches share one build and never see a half-built index"""
+    connect_test_collection()
+
+    builds = []
+    original_build = RecipeIndex.build_from_collection
+
+    def slow_build(self, *args, **kwargs):
+        builds.append(self)
+        time.sleep(0.2)
+        return original_build(self, *args, **kwargs)
+
+    sizes = []
+    RecipeIndex.build_from_collection = slow_build
+    try:
+        threads = [threading.Thread(target=lambda: sizes.append(len(recipe_db.get_recipe_index().recipe_ids))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        RecipeIndex.build_from_collection = original_build
+
+    assert len(builds) == 1
+    assert sizes == [len(TEST_RECIPES)] * 8
+    logger.info("Concurrent index build OK")
+
+if __name__ == "__main__":
+    logger.info("Testing the recipe index...")
+    run_tests(
+        test_index_lookup,
+        test_exclusions_match_substrings,
+        test_weighted_scoring,
+        test_weighted_scoring_skips_deleted_recipes,
+        test_concurrent_first_use_builds_once
+    )
+    logger.info("Testing complete!")
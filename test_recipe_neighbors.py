@@ -0,0 +1,127 @@
+import contextlib
+import logging
+import os
+import tempfile
+
+import numpy as np
+from scipy import sparse
+
+from recipe_neighbors import NeighborIndex, top_k, weakest_kept_scores
+from recommendation_engine import normalize_rows
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+@contextlib.contextmanager
+def data_directory():
+    """Run in an empty working directory, so data/ files don't touch the repo's"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            yield directory
+        finally:
+            os.chdir(cwd)
+
+def clustered_vectors(count, dimensions=60, clusters=25, seed=1):
+    """Sparse non-negative vectors around a few cluster centers, rows L2-normalized"""
+    rng = np.random.default_rng(seed)
+    centers = rng.random((clusters, dimensions)) * (rng.random((clusters, dimensions)) < 0.2)
+    points = centers[rng.integers(0, clusters, count)] + 0.05 * rng.random((count, dimensions))
+    points[points < 0.04] = 0.0
+    return normalize_rows(sparse.csr_matrix(points, dtype=np.float32))
+
+def brute_force(vectors, position, k):
+    """Similarities of every other recipe to one recipe, best k first"""
+    scores = (vectors @ vectors[position].T).toarray().ravel()
+    scores[position] = -np.inf
+    order = np.lexsort((np.arange(len(scores)), -scores))[:k]
+    return [(int(i), float(scores[i])) for i in order]
+
+def test_top_k():
+    """Best scores first, ties by position, non-finite scores skipped"""
+    scores = np.array([0.5, -np.inf, 0.9, 0.5, np.nan, 0.7, 0.5])
+    assert list(top_k(scores, 3)) == [2, 5, 0]
+    assert list(top_k(scores, 5)) == [2, 5, 0, 3, 6]
+    assert list(top_k(scores, 10)) == [2, 5, 0, 3, 6]
+    logger.info("top_k OK")
+
+def test_weakest_kept_scores():
+    """Each full row's own minimum, even with a shorter row in between"""
+    table = sparse.csr_matrix((np.array([5, 9, 1, 7, 8], dtype=np.float32), [1, 2, 0, 0, 1], [0, 2, 3, 5]), shape=(3, 3))
+    assert list(weakest_kept_scores(table, 2)) == [5, 0, 7]
+    assert list(weakest_kept_scores(table, 1)) == [5, 1, 7]
+    assert list(weakest_kept_scores(sparse.csr_matrix((2, 2), dtype=np.float32), 1)) == [0, 0]
+    logger.info("Weakest kept scores OK")
+
+def test_exact_neighbors():
+    """Small catalogs are searched exactly"""
+    vectors = clustered_vectors(300)
+    ids = [f"recipe-{i}" for i in range(300)]
+    index = NeighborIndex(exact_limit=1000)
+    index.build(vectors, ids)
+    assert not index.approximate
+    for position in range(0, 300, 7):
+        found = index.neighbors(position, 10)
+        expected = brute_force(vectors, position, 10)
+        assert [p for p, _ in found] == [p for p, _ in expected], position
+        assert np.allclose([s for _, s in found], [s for _, s in expected], atol=1e-6)
+
+    table = index.neighbor_table(5)
+    for position in range(300):
+        row = table[position]
+        expected = brute_force(vectors, position, 5)
+        assert np.allclose(sorted(row.data, reverse=True), [s for _, s in expected], atol=1e-6), position
+    logger.info("Exact neighbors OK")
+
+def test_lsh_recall():
+    """Past exact_limit, LSH candidates still find nearly all true neighbors, with exact scores"""
+    vectors = clustered_vectors(2000)
+    index = NeighborIndex(exact_limit=500)
+    index.build(vectors, [f"recipe-{i}" for i in range(2000)])
+    assert index.approximate
+    # Queries score a fraction of the catalog
+    assert len(index._candidates(index.signatures[0])) < 1000
+
+    hits = total = 0
+    for position in range(0, 2000, 20):
+        found = index.neighbors(position, 10)
+        expected = {p for p, _ in brute_force(vectors, position, 10)}
+        hits += len(expected & {p for p, _ in found})
+        total += len(expected)
+        true_scores = (vectors @ vectors[position].T).toarray().ravel()
+        assert all(abs(score - true_scores[p]) < 1e-6 and p != position for p, score in found)
+    assert hits / total >= 0.9, hits / total
+    logger.info(f"LSH recall@10: {hits / total:.3f}")
+
+def test_saved_index_reused_only_for_same_vectors():
+    """A saved index loads for the vectors it was built from and is stale otherwise"""
+    with data_directory():
+        vectors = clustered_vectors(800)
+        ids = [f"recipe-{i}" for i in range(800)]
+        index = NeighborIndex(exact_limit=500)
+        index.build(vectors, ids)
+        table = index.neighbor_table(5)
+        index.save()
+
+        loaded = NeighborIndex(exact_limit=500)
+        assert loaded.load(vectors, ids)
+        assert loaded.approximate and loaded.table_k == 5
+        assert (loaded.neighbor_table(5) != table).nnz == 0
+        assert loaded.neighbors(3, 10) == index.neighbors(3, 10)
+
+        assert not NeighborIndex(exact_limit=500).load(vectors, ids[::-1])
+        assert not NeighborIndex(exact_limit=500).load(clustered_vectors(800, seed=2), ids)
+        # Crossing exact_limit changes the kind of index needed
+        assert not NeighborIndex(exact_limit=5000).load(vectors, ids)
+    logger.info("Saved index OK")
+
+if __name__ == "__main__":
+    logger.info("Testing the recipe neighbor index...")
+    test_top_k()
+    test_weakest_kept_scores()
+    test_exact_neighbors()
+    test_lsh_recall()
+    test_saved_index_reused_only_for_same_vectors()
+    logger.info("Testing complete!")
@@ -0,0 +1,123 @@
+import contextlib
+import logging
+import os
+import random
+import tempfile
+
+import numpy as np
+
+from recommendation_engine import RecipeRecommender
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+CUISINES = ["Indian", "Italian", "Thai", "Mexican"]
+DIETS = ["vegetarian", "vegan", "non-vegetarian"]
+COURSES = ["main course", "starter", "dessert"]
+INGREDIENTS = ["onion", "tomato", "garlic", "paneer", "chicken", "rice", "basil", "coconut milk", "tofu", "cheese"]
+
+@contextlib.contextmanager
+def data_directory():
+    """Run in an empty working directory, so data/ files don't touch the repo's"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            yield directory
+        finally:
+            os.chdir(cwd)
+
+def random_recipes(count, seed=3, prefix="recipe"):
+    """Recipes in the shape extract_recipe_features reads"""
+    generator = random.Random(seed)
+    return {
+        f"{prefix}-{number}": {
+            "Cuisine": generator.choice(CUISINES),
+            "diet": generator.choice(DIETS),
+            "course": generator.choice(COURSES),
+            "ingredients": [f"{generator.randint(1, 3)} cups {i}" for i in generator.sample(INGREDIENTS, generator.randint(2, 5))],
+            "TotalTimeInMins": generator.choice([15, 30, 45, 90])
+        }
+        for number in range(count)
+    }
+
+def pairwise_similarity(recipe_features):
+    """Cosine similarity by a double loop over dense vectors, as the engine computed it before"""
+    recipe_ids = list(recipe_features)
+    feature_names = sorted({name for features in recipe_features.values() for name in features})
+    vectors = {r: np.array([recipe_features[r].get(name, 0) for name in feature_names]) for r in recipe_ids}
+    similarity = {}
+    for i, first in enumerate(recipe_ids):
+        similarity[first] = {}
+        for j, second in enumerate(recipe_ids):
+            if i == j:
+                similarity[first][second] = 1.0
+                continue
+            norms = np.linalg.norm(vectors[first]) * np.linalg.norm(vectors[second])
+            similarity[first][second] = float(np.dot(vectors[first], vectors[second]) / norms) if norms else 0.0
+    return similarity
+
+def loop_predictions(similarity, user_ratings):
+    """Similarity-weighted average of the user's ratings for each unrated recipe"""
+    predicted = {}
+    for recipe_id in similarity:
+        if recipe_id in user_ratings:
+            continue
+        numerator = sum(similarity[rated][recipe_id] * rating for rated, rating in user_ratings.items())
+        denominator = sum(abs(similarity[rated][recipe_id]) for rated in user_ratings)
+        if denominator > 0:
+            predicted[recipe_id] = numerator / denominator
+    return predicted
+
+def test_similarity_matches_double_loop():
+    """The sparse product gives the cosine similarities of the double loop"""
+    with data_directory():
+        recommender = RecipeRecommender()
+        recommender.update_many_recipe_features(random_recipes(40))
+        expected = pairwise_similarity(recommender.recipe_features)
+        for i, first in enumerate(recommender.recipe_ids):
+            for j, second in enumerate(recommender.recipe_ids):
+                assert abs(recommender.recipe_similarity[i, j] - expected[first][second]) < 1e-5, (first, second)
+    logger.info("Similarity matrix OK")
+
+def test_similar_recipes_are_the_most_similar():
+    """get_similar_recipes returns the highest similarities, excluding the recipe itself"""
+    with data_directory():
+        recommender = RecipeRecommender()
+        recommender.update_many_recipe_features(random_recipes(40))
+        expected = pairwise_similarity(recommender.recipe_features)
+        for recipe_id in recommender.recipe_ids:
+            others = sorted((s for r, s in expected[recipe_id].items() if r != recipe_id), reverse=True)
+            similar = recommender.get_similar_recipes(recipe_id, n=5)
+            assert recipe_id not in similar and len(similar) == 5
+            assert np.allclose([expected[recipe_id][r] for r in similar], others[:5], atol=1e-5), recipe_id
+        assert recommender.get_similar_recipes("unknown") == []
+    logger.info("Similar recipes OK")
+
+def test_recommendations_match_loop_predictions():
+    """Personalized recommendations are the recipes the loop predicts highest"""
+    with data_directory():
+        recommender = RecipeRecommender()
+        recommender.update_many_recipe_features(random_recipes(40))
+        expected = pairwise_similarity(recommender.recipe_features)
+        generator = random.Random(5)
+        for user in range(5):
+            ratings = {r: generator.randint(1, 5) for r in generator.sample(recommender.recipe_ids, 6)}
+            for recipe_id, rating in ratings.items():
+                recommender.update_user_preferences(f"user-{user}", recipe_id, rating)
+
+            predicted = loop_predictions(expected, ratings)
+            recommended = recommender.get_personalized_recommendations(f"user-{user}", n=5)
+            assert not set(recommended) & set(ratings)
+            best = sorted(predicted.values(), reverse=True)[:5]
+            assert np.allclose([predicted[r] for r in recommended], best, atol=1e-4), user
+        assert recommender.get_personalized_recommendations("unknown") == []
+    logger.info("Personalized recommendations OK")
+
+if __name__ == "__main__":
+    logger.info("Testing recipe similarity...")
+    test_similarity_matches_double_loop()
+    test_similar_recipes_are_the_most_similar()
+    test_recommendations_match_loop_predictions()
+    logger.info("Testing complete!")
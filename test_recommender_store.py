@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+
+import numpy as np
+from scipy import sparse
+
+from recommendation_engine import LEGACY_FEATURES_PATH, LEGACY_PREFERENCES_PATH, RecipeRecommender
+from recommender_store import RecommenderStore
+from test_recipe_similarity import data_directory, random_recipes
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def test_round_trip():
+    """Saved ids, matrices and arrays load back unchanged, memory-mapped"""
+    with data_directory():
+        store = RecommenderStore()
+        assert not store.exists() and store.load() is None
+        matrix = sparse.random(30, 12, density=0.2, format="csr", dtype=np.float32, random_state=4)
+        norms = np.linspace(0.5, 2.0, 30).astype(np.float32)
+        ids = {"recipes": [f"recipe-{i}" for i in range(30)], "users": []}
+        store.save(ids=ids, matrices={"features": matrix, "ratings": sparse.csr_matrix((0, 0), dtype=np.float32)},
+                   arrays={"feature_norms": norms})
+
+        state = RecommenderStore().load()
+        assert state["ids"] == ids
+        assert (state["matrices"]["features"] != matrix).nnz == 0
+        assert state["matrices"]["ratings"].shape == (0, 0)
+        assert np.array_equal(state["arrays"]["feature_norms"], norms)
+        assert isinstance(state["arrays"]["feature_norms"], np.memmap)
+    logger.info("Store round trip OK")
+
+def test_generations():
+    """Each save writes a new generation and removes the older ones"""
+    with data_directory():
+        store = RecommenderStore()
+        arrays = {"values": np.arange(3, dtype=np.float32)}
+        store.save(ids={}, matrices={}, arrays=arrays)
+        # A directory left by an interrupted save of the next generation is replaced
+        os.makedirs(os.path.join(store.directory, "gen-2"))
+        open(os.path.join(store.directory, "gen-2", "partial.npy"), "w").close()
+        store.save(ids={}, matrices={}, arrays={"values": np.arange(5, dtype=np.float32)})
+
+        assert sorted(entry for entry in os.listdir(store.directory) if entry.startswith("gen-")) == ["gen-2"]
+        assert sorted(os.listdir(os.path.join(store.directory, "gen-2"))) == ["values.npy"]
+        assert list(store.load()["arrays"]["values"]) == [0, 1, 2, 3, 4]
+    logger.info("Generations OK")
+
+def test_update_logs():
+    """Logs append, replay oldest first, skip a torn last line and truncate"""
+    with data_directory():
+        store = RecommenderStore()
+        assert store.read_log("ratings") == []
+        store.append_log("ratings", [{"user": "a", "recipe": "r1", "rating": 4}])
+        store.append_log("ratings", [{"user": "b", "recipe": "r2", "rating": 2}])
+        with open(store.log_path("ratings"), "a") as f:
+            f.write('{"user": "c", "reci')
+        assert [entry["user"] for entry in store.read_log("ratings")] == ["a", "b"]
+        store.truncate_log("ratings")
+        assert store.read_log("ratings") == []
+    logger.info("Update logs OK")
+
+def test_json_files_migrated():
+    """The JSON files used before the store load into it with the same contents"""
+    with data_directory():
+        extractor = RecipeRecommender()
+        features = {recipe_id: extractor.extract_recipe_features(recipe) for recipe_id, recipe in random_recipes(20).items()}
+        preferences = {"user-a": {"recipe-1": 5, "recipe-4": 2}, "user-b": {"recipe-7": 3}}
+        os.makedirs("data", exist_ok=True)
+        with open(LEGACY_FEATURES_PATH, "w") as f:
+            json.dump(features, f)
+        with open(LEGACY_PREFERENCES_PATH, "w") as f:
+            json.dump(preferences, f)
+
+        migrated = RecipeRecommender()
+        assert RecommenderStore().exists()
+        for recommender in (migrated, RecipeRecommender()):
+            assert recommender.user_preferences == preferences
+            loaded = recommender.recipe_features
+            assert loaded.keys() == features.keys()
+            for recipe_id, recipe_features in features.items():
+                assert loaded[recipe_id].keys() == recipe_features.keys()
+                assert np.allclose([loaded[recipe_id][name] for name in recipe_features], list(recipe_features.values()), atol=1e-5)
+    logger.info("JSON migration OK")
+
+def test_ratings_replayed_after_restart():
+    """Ratings appended since the last save are applied on top of the stored matrix"""
+    with data_directory():
+        recommender = RecipeRecommender()
+        recommender.update_many_recipe_features(random_recipes(10))
+        recommender.update_user_preferences("user-a", "recipe-1", 5)
+        recommender.save()
+        recommender.update_user_preferences("user-a", "recipe-1", 2)
+        recommender.update_user_preferences("user-b", "recipe-3", 4)
+
+        expected = {"user-a": {"recipe-1": 2.0}, "user-b": {"recipe-3": 4.0}}
+        restarted = RecipeRecommender()
+        assert restarted.user_preferences == expected
+        restarted.save()
+        assert RecommenderStore().read_log("ratings") == []
+        assert RecipeRecommender().user_preferences == expected
+    logger.info("Rating replay OK")
+
+if __name__ == "__main__":
+    logger.info("Testing the recommender store...")
+    test_round_trip()
+    test_generations()
+    test_update_logs()
+    test_json_files_migrated()
+    test_ratings_replayed_after_restart()
+    logger.info("Testing complete!")
@@ -0,0 +1,84 @@
+import logging
+
+from schema_capabilities import OPTIONAL_FIELDS, SchemaCapabilities, schema_capabilities
+from search_cache import notify_recipes_reloaded
+from testing_db import connect_test_collection, run_tests
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class ProbeRecorder:
+    """Wraps a collection and records the lookups made through it"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.calls = []
+
+    def find_one(self, *args, **kwargs):
+        self.calls.append(("find_one", args))
+        return self.collection.find_one(*args, **kwargs)
+
+    def aggregate(self, *args, **kwargs):
+        self.calls.append(("aggregate", args))
+        return self.collection.aggregate(*args, **kwargs)
+
+class BrokenCollection:
+    """A collection whose lookups always fail"""
+
+    def find_one(self, *args, **kwargs):
+        raise RuntimeError("connection lost")
+
+def test_probes_match_exists_lookups():
+    """Recorded fields are the ones a find_one on $exists finds"""
+    collection = connect_test_collection()
+    collection.update_many({"Cuisine": "Indian"}, {"$unset": {"calories": ""}})
+    collection.update_many({}, {"$unset": {"fat": ""}})
+
+    capabilities = SchemaCapabilities().refresh(collection)
+    expected = {field for field in OPTIONAL_FIELDS if collection.find_one({field: {"$exists": True}}) is not None}
+    assert capabilities.fields == expected
+    assert capabilities.has("calories") and not capabilities.has("fat")
+    assert not capabilities.nutrition
+    assert capabilities.to_dict()["search_tokens"] is True
+    logger.info("Field probes OK")
+
+def test_probes_are_bounded_lookups():
+    """One projected find_one per field and no collection-wide aggregation"""
+    collection = connect_test_collection()
+
+    recorder = ProbeRecorder(collection)
+    SchemaCapabilities().refresh(recorder)
+    assert [name for name, _ in recorder.calls] == ["find_one"] * len(OPTIONAL_FIELDS)
+    for _, (query, projection) in recorder.calls:
+        assert projection == {"_id": 1}
+    logger.info("Bounded probes OK")
+
+def test_probed_once_per_import():
+    """ensure probes on first use and again only after a reload"""
+    collection = connect_test_collection()
+
+    recorder = ProbeRecorder(collection)
+    schema_capabilities.ensure(recorder)
+    schema_capabilities.ensure(recorder)
+    assert len(recorder.calls) == len(OPTIONAL_FIELDS)
+    notify_recipes_reloaded()
+    schema_capabilities.ensure(recorder)
+    assert len(recorder.calls) == 2 * len(OPTIONAL_FIELDS)
+    logger.info("Probe reuse OK")
+
+def test_failed_probe_is_retried():
+    """A failed probe leaves the registry unloaded so the next use retries"""
+    capabilities = SchemaCapabilities().refresh(BrokenCollection())
+    assert not capabilities.loaded and capabilities.fields == set()
+    logger.info("Failed probe OK")
+
+if __name__ == "__main__":
+    logger.info("Testing schema capability probes...")
+    run_tests(
+        test_probes_match_exists_lookups,
+        test_probes_are_bounded_lookups,
+        test_probed_once_per_import,
+        test_failed_probe_is_retried
+    )
+    logger.info("Testing complete!")
@@ -0,0 +1,141 @@
+import logging
+import time
+
+import recipe_db
+from db_connection import recipe_database, record_import
+from search_cache import SearchCache, search_cache
+from testing_db import TEST_RECIPES, prepare_recipe, connect_test_collection, run_tests
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def test_equivalent_calls_share_an_entry():
+    """Case, whitespace, key order and default arguments don't change the key"""
+    cache = SearchCache()
+    calls = []
+
+    @cache.cached
+    def search(preferences, max_relaxations=3, text_query=None):
+        calls.append(preferences)
+        return {"results": [{"name": "Pasta"}], "relaxed": []}
+
+    search({"diet": "Vegetarian", "cuisine": " Italian "})
+    search({"cuisine": "italian", "diet": "vegetarian"})
+    search({"diet": "vegetarian", "cuisine": "italian"}, 3)
+    search({"diet": "vegetarian", "cuisine": "italian"}, max_relaxations=3)
+    assert len(calls) == 1
+    search({"diet": "vegetarian", "cuisine": "italian"}, 1)
+    assert len(calls) == 2
+    assert cache.stats()["hits"] == 3
+    logger.info("Cache keys OK")
+
+def test_unset_preferences_are_dropped():
+    """Unset preferences are dropped before the search, not just from the key"""
+    cache = SearchCache()
+
+    @cache.cached
+    def search(preferences):
+        return {"results": [], "relaxed": list(preferences.keys())}
+
+    assert search({"diet": "", "cuisine": "italian", "time": None}) == {"results": [], "relaxed": ["cuisine"]}
+    assert search({"cuisine": "italian"}) == {"results": [], "relaxed": ["cuisine"]}
+    assert cache.stats()["hits"] == 1
+    # Preference names are not normalized: the searches read them by exact key
+    search({"Cuisine": "italian"})
+    assert cache.stats()["misses"] == 2
+    logger.info("Unset preferences OK")
+
+def test_results_are_copies():
+    """Mutating a returned result, down to the recipes, leaves the cached entry intact"""
+    cache = SearchCache()
+
+    @cache.cached
+    def search(preferences):
+        recipe = {"name": "Pasta", "ingredients": ["pasta"]}
+        return {"results": [recipe], "detailed_results": [{"recipe": recipe, "score": 1.0}]}
+
+    first = search({"diet": "vegetarian"})
+    first["results"][0]["name"] = "Changed"
+    first["detailed_results"][0]["recipe"]["ingredients"].append("sugar")
+    second = search({"diet": "vegetarian"})
+    assert second["results"][0] == {"name": "Pasta", "ingredients": ["pasta"]}
+    # Within one result the recipe is still shared between both lists
+    assert second["results"][0] is second["detailed_results"][0]["recipe"]
+    logger.info("Result copies OK")
+
+def test_eviction_and_ttl():
+    """The least recently used entry is evicted and entries expire after the TTL"""
+    cache = SearchCache(max_size=2, ttl_seconds=0.2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    time.sleep(0.3)
+    assert cache.get("a") == (False, None)
+    assert cache.stats()["evictions"] == 1
+    logger.info("Eviction and TTL OK")
+
+def test_degraded_results_expire_early():
+    """Results computed without MongoDB are only kept for the degraded TTL, also by callers"""
+    cache = SearchCache(ttl_seconds=60, degraded_ttl_seconds=0.2)
+    calls = []
+
+    @cache.cached
+    def inner(preferences):
+        calls.append("inner")
+        cache.mark_degraded()
+        return {"results": [], "relaxed": []}
+
+    @cache.cached
+    def outer(preferences):
+        calls.append("outer")
+        return inner(preferences)
+
+    outer({"diet": "vegan"})
+    outer({"diet": "vegan"})
+    assert calls == ["outer", "inner"]
+    time.sleep(0.3)
+    outer({"diet": "vegan"})
+    assert calls == ["outer", "inner", "outer", "inner"]
+    logger.info("Degraded TTL OK")
+
+def test_reimport_by_another_process():
+    """A new import stamp makes a serving process rebuild its index and drop cached results"""
+    collection = connect_test_collection()
+
+    preferences = {"diet": "vegetarian"}
+    before = recipe_db.search_with_weighted_scoring(preferences)
+    assert len(before["results"]) == 5
+
+    # What import_recipes does in its own process: new documents, new ids, new stamp
+    collection.drop()
+    collection.insert_many([prepare_recipe(recipe) for recipe in TEST_RECIPES])
+    record_import(collection)
+
+    interval = recipe_database.import_check_interval
+    recipe_database.import_check_interval = 0
+    try:
+        recipe_database._import_check_after = 0.0
+        after = recipe_db.search_with_weighted_scoring(preferences)
+        after = recipe_db.search_with_weighted_scoring(preferences)
+    finally:
+        recipe_database.import_check_interval = interval
+    assert len(after["results"]) == 5 and after["total_matches"] == 5
+    assert {recipe["_id"] for recipe in after["results"]}.isdisjoint(recipe["_id"] for recipe in before["results"])
+    logger.info("Re-import picked up OK")
+
+if __name__ == "__main__":
+    logger.info("Testing the search cache...")
+    run_tests(
+        test_equivalent_calls_share_an_entry,
+        test_unset_preferences_are_dropped,
+        test_results_are_copies,
+        test_eviction_and_ttl,
+        test_degraded_results_expire_early,
+        test_reimport_by_another_process
+    )
+    search_cache.invalidate()
+    logger.info("Testing complete!")
@@ -0,0 +1,132 @@
+import logging
+
+from pymongo.errors import OperationFailure
+
+import recipe_db
+from search_cache import search_cache
+from testing_db import connect_test_collection, run_tests
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Preferences exercising the exact match, each relaxation step and the last resort
+TEST_PREFERENCES = [
+    {"diet": "vegetarian", "cuisine": "italian"},
+    {"diet": "vegan", "cuisine": "thai", "time": "quick"},
+    {"diet": "vegan", "cuisine": "indian", "ingredient": "paneer"},
+    {"cuisine": "klingon"},
+    {"taste": "spicy"},
+    {},
+]
+
+class RecordingCollection:
+    """Wraps a collection and records the aggregation pipelines sent to it"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.name = collection.name
+        self.pipelines = []
+
+    def aggregate(self, pipeline, *args, **kwargs):
+        self.pipelines.append(pipeline)
+        return self.collection.aggregate(pipeline, *args, **kwargs)
+
+    def find(self, *args, **kwargs):
+        return self.collection.find(*args, **kwargs)
+
+def sequential_search(collection, preferences, max_relaxations=3):
+    """One query per relaxation level, as search_with_fallback did before the single aggregation"""
+    for level_preferences, relaxed in recipe_db.build_relaxation_levels(preferences, max_relaxations):
+        results = list(collection.find(recipe_db.build_optimized_query(level_preferences)).limit(10))
+        if results:
+            return {"results": results, "relaxed": relaxed}
+    return {"results": list(collection.find({}).limit(10)), "relaxed": list(preferences.keys())}
+
+def names(result):
+    return [recipe["RecipeName"] for recipe in result["results"]]
+
+def test_relaxation_levels():
+    """Constraints are dropped in priority order, ending with the diet alone"""
+    levels = recipe_db.build_relaxation_levels({"diet": "vegan", "cuisine": "thai", "time": "quick"})
+    assert [relaxed for _, relaxed in levels] == [
+        [], ["time"], ["time", "cuisine"], ["time", "cuisine", "diet"], ["time", "cuisine", "diet"]
+    ]
+    assert levels[-1][0] == {"diet": "vegan"}
+    assert len(recipe_db.build_relaxation_levels({"diet": "vegan", "cuisine": "thai", "time": "quick"}, 1)) == 3
+    logger.info("Relaxation levels OK")
+
+def test_matches_sequential_search():
+    """The single aggregation returns what one query per level returned"""
+    collection = connect_test_collection()
+
+    for preferences in TEST_PREFERENCES:
+        search_cache.invalidate()
+        expected = sequential_search(collection, preferences)
+        result = recipe_db.search_with_fallback(preferences)
+        assert names(result) == names(expected), preferences
+        assert result["relaxed"] == expected["relaxed"], preferences
+    logger.info("Fallback search matches the sequential search")
+
+def test_levels_are_bounded_branches():
+    """Every level is an indexed $match followed by its own $limit, with no $facet"""
+    collection = connect_test_collection()
+
+    recording = RecordingCollection(collection)
+    levels = recipe_db.build_relaxation_levels({"diet": "vegan", "cuisine": "thai", "time": "quick"})
+    results, relaxed = recipe_db._find_first_nonempty_level(recording, levels, limit=2)
+    assert relaxed == ["time"] and [recipe["RecipeName"] for recipe in results] == ["Vegan Thai Green Curry"]
+
+    pipeline, = recording.pipelines
+    branches = [pipeline[:4]] + [stage["$unionWith"]["pipeline"] for stage in pipeline[4:]]
+    assert len(branches) == 3
+    for level, branch in enumerate(branches):
+        assert list(branch[0]) == ["$match"] and branch[1] == {"$limit": 2}, branch
+        assert branch[3] == {"$addFields": {"level": level}}
+    assert "$facet" not in str(pipeline)
+    logger.info("Bounded level branches OK")
+
+def test_servers_without_union_with():
+    """A server rejecting $unionWith is queried one bounded level at a time"""
+    collection = connect_test_collection()
+
+    class OldServerCollection(RecordingCollection):
+        def aggregate(self, pipeline, *args, **kwargs):
+            raise OperationFailure("Unrecognized pipeline stage name: '$unionWith'")
+
+    for preferences in TEST_PREFERENCES[:3]:
+        expected = sequential_search(collection, preferences)
+        levels = recipe_db.build_relaxation_levels(preferences)
+        results, relaxed = recipe_db._find_first_nonempty_level(OldServerCollection(collection), levels)
+        assert [recipe["RecipeName"] for recipe in results] == names(expected), preferences
+        assert relaxed == expected["relaxed"], preferences
+    logger.info("Per-level fallback OK")
+
+def test_unfiltered_level_uses_bounded_find():
+    """A level compiling to {} is never a $facet branch over the whole collection"""
+    collection = connect_test_collection()
+
+    recording = RecordingCollection(collection)
+    levels = recipe_db.build_relaxation_levels({"cuisine": "klingon"})
+    results, relaxed = recipe_db._find_first_nonempty_level(recording, levels)
+    assert relaxed == ["cuisine"]
+    assert len(results) == 6
+    for pipeline in recording.pipelines:
+        assert "$match" in pipeline[0], pipeline
+
+    recording = RecordingCollection(collection)
+    results, relaxed = recipe_db._find_first_nonempty_level(recording, recipe_db.build_relaxation_levels({}))
+    assert relaxed == [] and len(results) == 6
+    assert recording.pipelines == []
+    logger.info("Unfiltered level OK")
+
+if __name__ == "__main__":
+    logger.info("Testing search_with_fallback...")
+    run_tests(
+        test_relaxation_levels,
+        test_matches_sequential_search,
+        test_levels_are_bounded_branches,
+        test_servers_without_union_with,
+        test_unfiltered_level_uses_bounded_find
+    )
+    logger.info("Testing complete!")
@@ -0,0 +1,71 @@
+import logging
+
+import recipe_db
+from recipe_index import RecipeIndex
+from search_cache import notify_recipes_reloaded
+from testing_db import connect_test_collection, run_tests
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class ProjectionRecorder:
+    """Wraps a collection and records the projections passed to find"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.projections = []
+
+    def find(self, query=None, projection=None, *args, **kwargs):
+        self.projections.append(projection)
+        return self.collection.find(query, projection, *args, **kwargs)
+
+def postings(index):
+    """Posting lists as plain sets, for comparing indexes"""
+    return {field: {token: set(positions) for token, positions in tokens.items()} for field, tokens in index.postings.items()}
+
+def test_projected_index_matches_full_documents():
+    """An index over the projected fields equals one over the full documents"""
+    collection = connect_test_collection()
+
+    recorder = ProjectionRecorder(collection)
+    projected = RecipeIndex().build_from_collection(recorder)
+    assert "instructions" not in recorder.projections[0] and "Description" not in recorder.projections[0]
+    full = RecipeIndex().build_from_recipes(collection.find({}))
+    assert postings(projected) == postings(full)
+    logger.info("Projected index OK")
+
+def test_legacy_collection_index():
+    """Collections without the import-time token fields are indexed from the raw text"""
+    collection = connect_test_collection()
+    collection.update_many({}, {"$unset": {"cuisine_normalized": "", "ingredient_tokens": "", "search_tokens": ""}})
+    notify_recipes_reloaded()
+
+    index = recipe_db.get_recipe_index()
+    assert not recipe_db.query_compiler.normalized_fields
+    full = RecipeIndex().build_from_recipes(collection.find({}))
+    assert postings(index) == postings(full)
+    result = recipe_db.search_with_weighted_scoring({"ingredient": "coconut milk"})
+    assert result["results"][0]["RecipeName"] == "Vegan Thai Green Curry"
+    logger.info("Legacy index OK")
+
+def test_results_are_full_documents():
+    """Searches scan ids and scoring fields but return complete recipes"""
+    connect_test_collection()
+
+    for result in (
+        recipe_db.search_with_fallback({"diet": "vegan", "cuisine": "thai"}),
+        recipe_db.search_with_weighted_scoring({"diet": "vegan", "cuisine": "thai"}),
+    ):
+        assert result["results"][0]["RecipeName"] == "Vegan Thai Green Curry"
+        assert result["results"][0]["instructions"] and result["results"][0]["Description"]
+    logger.info("Full documents OK")
+
+if __name__ == "__main__":
+    logger.info("Testing search projections...")
+    run_tests(
+        test_projected_index_matches_full_documents,
+        test_legacy_collection_index,
+        test_results_are_full_documents
+    )
+    logger.info("Testing complete!")
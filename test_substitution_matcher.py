@@ -0,0 +1,83 @@
+import logging
+import random
+
+import recipe_db
+from recipe_db import INGREDIENT_SUBSTITUTIONS
+from substitution_matcher import AhoCorasick, SubstitutionMatcher
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+TEST_INGREDIENTS = [
+    "1 red bell pepper, sliced",
+    "2 tbsp chopped Coriander",
+    "1 cup heavy cream",
+    "200 g prawns",
+    "potato chips",
+    "french fries",
+    "1 tbsp tomato sauce",
+    "2 green onions",
+    "plain flour",
+    "1 tsp salt",
+    "",
+]
+
+# Shaped like data/substitutions.json
+TEST_SUBSTITUTIONS = {
+    "butter": [{"name": "margarine", "notes": "1:1"}],
+    "peanut butter": [{"name": "almond butter"}],
+    "milk": [{"name": "oat milk"}],
+    "buttermilk": [{"name": "milk with lemon juice"}],
+    "egg": [{"name": "flax egg"}],
+}
+
+def nested_scan(ingredient):
+    """Key-by-key scan of INGREDIENT_SUBSTITUTIONS, as recipe_db suggested substitutions before the automaton"""
+    suggestions = []
+    ingredient_lower = ingredient.lower()
+    for main_ingredient, substitutes in INGREDIENT_SUBSTITUTIONS.items():
+        if main_ingredient in ingredient_lower:
+            suggestions.append({"original": ingredient, "substitutes": substitutes})
+            break
+        for substitute in substitutes:
+            if substitute in ingredient_lower:
+                suggestions.append({"original": ingredient, "substitutes": [main_ingredient]})
+                break
+    return suggestions
+
+def test_automaton_finds_every_pattern():
+    """The automaton reports the same patterns as a substring test per pattern"""
+    patterns = ["he", "she", "his", "hers", "a", "aa", "ah", "sha"]
+    automaton = AhoCorasick(patterns)
+    generator = random.Random(7)
+    for _ in range(500):
+        text = "".join(generator.choice("ahers") for _ in range(generator.randint(0, 12)))
+        expected = {i for i, pattern in enumerate(patterns) if pattern in text}
+        assert automaton.find_all(text) == expected, text
+    logger.info("Automaton OK")
+
+def test_suggestions_match_nested_scan():
+    """Recipe suggestions are the ones the nested loops produced"""
+    for ingredient in TEST_INGREDIENTS:
+        assert recipe_db.substitution_matcher.suggest(ingredient) == nested_scan(ingredient), ingredient
+
+    recipe = {"ingredients": TEST_INGREDIENTS}
+    expected = [suggestion for ingredient in TEST_INGREDIENTS for suggestion in nested_scan(ingredient)]
+    assert recipe_db.suggest_ingredient_substitutions(recipe) == expected
+    logger.info("Suggestions match the nested scan")
+
+def test_related_keys_match_partial_scan():
+    """Keys inside the ingredient or containing it, in vocabulary order"""
+    matcher = SubstitutionMatcher(TEST_SUBSTITUTIONS)
+    for ingredient in ["butter", "unsalted butter", "peanut butter", "butt", "buttermilk", "milk", "eggs", "oat milk", "salt"]:
+        expected = [key for key in TEST_SUBSTITUTIONS if key in ingredient or ingredient in key]
+        assert matcher.related_keys(ingredient) == expected, ingredient
+    logger.info("Related keys OK")
+
+if __name__ == "__main__":
+    logger.info("Testing substitution matching...")
+    test_automaton_finds_every_pattern()
+    test_suggestions_match_nested_scan()
+    test_related_keys_match_partial_scan()
+    logger.info("Testing complete!")
@@ -0,0 +1,88 @@
+import logging
+
+import pytest
+
+import recipe_db
+from query_compiler import query_compiler
+from testing_db import CONTAINED_INGREDIENT_RECIPES, TEST_RECIPES, connect_test_collection, run_tests
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def test_compile_text():
+    """Keyword searches keep the diet, cuisine, exclusion and time filters"""
+    preferences = {
+        "diet": "vegan", "cuisine": "thai", "ingredient": "tofu", "time": "quick",
+        "exclude_ingredient": "peanut", "course": "main"
+    }
+    query = query_compiler.compile_text("green curry", preferences)
+    assert query["$text"] == {"$search": "green curry"}
+    expected = query_compiler.compile(
+        {"diet": "vegan", "cuisine": "thai", "time": "quick", "exclude_ingredient": "peanut"}
+    )
+    assert {key: value for key, value in query.items() if key != "$text"} == expected
+    assert query_compiler.compile_text("curry") == {"$text": {"$search": "curry"}}
+    logger.info("Text query compilation OK")
+
+def test_local_keyword_ranking():
+    """Without MongoDB, recipes are ranked by the number of keywords they contain"""
+    ranked = recipe_db.filter_recipes_by_text(TEST_RECIPES, "coconut curry")
+    assert [recipe["RecipeName"] for recipe in ranked] == ["Vegan Thai Green Curry", "Chicken Curry"]
+    # Ties keep their original order
+    ranked = recipe_db.filter_recipes_by_text(TEST_RECIPES, "spicy", limit=1)
+    assert [recipe["RecipeName"] for recipe in ranked] == ["Quick Paneer Tikka"]
+    assert recipe_db.filter_recipes_by_text(TEST_RECIPES, "lasagne") == []
+    logger.info("Local keyword ranking OK")
+
+def test_no_keyword_hits_falls_back():
+    """Without keyword hits the structured search runs, with "text" reported as relaxed"""
+    connect_test_collection()
+
+    preferences = {"diet": "vegetarian", "cuisine": "indian"}
+    structured = recipe_db.search_with_fallback(preferences)
+    result = recipe_db.search_with_fallback(preferences, text_query="zzzz")
+    assert result["results"] == structured["results"]
+    assert result["relaxed"] == ["text"] + structured["relaxed"]
+    logger.info("Text fallback OK")
+
+def test_keyword_hits_ranked_by_text_score():
+    """Keyword hits come from the text index, filtered by diet"""
+    collection = connect_test_collection()
+    try:
+        recipe_db.search_text(collection, "curry")
+    except Exception as e:
+        pytest.skip(f"Text search is not supported by this server: {e}")
+
+    result = recipe_db.search_with_fallback({"diet": "vegan"}, text_query="curry")
+    assert [recipe["RecipeName"] for recipe in result["results"]] == ["Vegan Thai Green Curry"]
+    assert result["relaxed"] == []
+    logger.info("Text search OK")
+
+def test_keyword_hits_respect_exclusions():
+    """Excluded ingredients stay excluded from keyword hits; unfiltered preferences are reported"""
+    collection = connect_test_collection(TEST_RECIPES + CONTAINED_INGREDIENT_RECIPES)
+    try:
+        recipe_db.search_text(collection, "curry")
+    except Exception as e:
+        pytest.skip(f"Text search is not supported by this server: {e}")
+
+    result = recipe_db.search_with_fallback({"diet": "vegan"}, text_query="curry")
+    assert "Peanut Noodles" in [recipe["RecipeName"] for recipe in result["results"]]
+
+    preferences = {"diet": "vegan", "exclude_ingredient": "peanut", "course": "main"}
+    result = recipe_db.search_with_fallback(preferences, text_query="curry")
+    assert [recipe["RecipeName"] for recipe in result["results"]] == ["Vegan Thai Green Curry"]
+    assert result["relaxed"] == ["course"]
+    logger.info("Text search exclusions OK")
+
+if __name__ == "__main__":
+    logger.info("Testing keyword search...")
+    run_tests(
+        test_compile_text,
+        test_local_keyword_ranking,
+        test_no_keyword_hits_falls_back,
+        test_keyword_hits_ranked_by_text_score,
+        test_keyword_hits_respect_exclusions
+    )
+    logger.info("Testing complete!")
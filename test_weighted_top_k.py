@@ -0,0 +1,89 @@
+import logging
+
+import recipe_db
+from search_cache import search_cache
+from testing_db import TEST_RECIPES, connect_test_collection, run_tests
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+WEIGHTS = {"diet": 10.0, "exclude_ingredient": 8.0, "cuisine": 5.0, "course": 4.0, "time": 3.0, "ingredient": 2.0, "taste": 1.0}
+
+# Several copies of each test recipe, so there are more candidates than WEIGHTED_TOP_K
+MANY_RECIPES = [
+    dict(recipe, RecipeName=f"{recipe['RecipeName']} {copy}")
+    for copy in range(1, 5)
+    for recipe in TEST_RECIPES
+]
+
+TEST_PREFERENCES = [
+    {},
+    {"diet": "vegetarian"},
+    {"diet": "vegetarian", "cuisine": "indian"},
+    {"cuisine": "italian", "ingredient": "tomatoes"},
+    {"diet": "vegan", "time": "quick"},
+    {"exclude_ingredient": "onion", "ingredient": "paneer"},
+]
+
+def full_sort_rank(index, preferences):
+    """Score every candidate and sort them all, as weighted scoring did before the heap"""
+    candidates = index.all_positions()
+    if "diet" in preferences:
+        candidates &= index.match_preference("diet", preferences["diet"])
+    if "exclude_ingredient" in preferences:
+        candidates -= index.match_preference("exclude_ingredient", preferences["exclude_ingredient"])
+
+    scores = {}
+    for pref, weight in WEIGHTS.items():
+        if pref not in preferences:
+            continue
+        if pref in ("diet", "exclude_ingredient"):
+            matched = candidates
+        else:
+            matched = index.match_preference(pref, preferences[pref]) & candidates
+        for position in matched:
+            scores[position] = scores.get(position, 0.0) + weight
+
+    ranked = sorted(scores, key=lambda position: (-scores[position], position))
+    if len(ranked) < 10:
+        ranked.extend(sorted(candidates - set(scores))[:10 - len(ranked)])
+    return [(position, scores.get(position, 0.0)) for position in ranked[:10]], len(candidates)
+
+def test_heap_matches_full_sort():
+    """The bounded heap picks the recipes and scores the full sort picked, in the same order"""
+    collection = connect_test_collection(MANY_RECIPES)
+
+    index = recipe_db.get_recipe_index()
+    names = {recipe["_id"]: recipe["RecipeName"] for recipe in collection.find({}, {"RecipeName": 1})}
+    for preferences in TEST_PREFERENCES:
+        ranked, total = full_sort_rank(index, preferences)
+        expected = [(names[index.recipe_ids[position]], score) for position, score in ranked]
+        result = recipe_db.search_with_weighted_scoring(preferences)
+        actual = [(item["recipe"]["RecipeName"], item["score"]) for item in result["detailed_results"]]
+        assert actual == expected, preferences
+        assert result["total_matches"] == total
+    logger.info("Heap ranking matches the full sort")
+
+def test_top_k_is_respected():
+    """Only WEIGHTED_TOP_K recipes are returned, the best ones first"""
+    connect_test_collection(MANY_RECIPES)
+
+    top_k = recipe_db.WEIGHTED_TOP_K
+    recipe_db.WEIGHTED_TOP_K = 3
+    try:
+        search_cache.invalidate()
+        result = recipe_db.search_with_weighted_scoring({"diet": "vegetarian", "cuisine": "indian"})
+    finally:
+        recipe_db.WEIGHTED_TOP_K = top_k
+        search_cache.invalidate()
+    assert [recipe["RecipeName"] for recipe in result["results"]] == [
+        "Quick Paneer Tikka 1", "Masala Omelette 1", "Quick Paneer Tikka 2"
+    ]
+    assert result["total_matches"] == 20
+    logger.info("Top K OK")
+
+if __name__ == "__main__":
+    logger.info("Testing weighted top-K selection...")
+    run_tests(test_heap_matches_full_sort, test_top_k_is_respected)
+    logger.info("Testing complete!")
@@ -0,0 +1,171 @@
+import logging
+import os
+from typing import Dict, List, Any, Optional, Callable
+
+import pytest
+
+from db_connection import recipe_database, bootstrap_indexes
+from query_compiler import normalize_cuisine
+from recipe_index import tokenize
+from search_cache import notify_recipes_reloaded
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Throwaway database the test scripts load their recipes into (dropped on every load)
+TEST_DB_NAME = os.environ.get("TEST_MONGO_DB", "recipeDB_test")
+
+# Recipes in the shape import_recipes writes, minus the fields derived in prepare_recipe
+TEST_RECIPES: List[Dict[str, Any]] = [
+    {
+        "RecipeName": "Quick Paneer Tikka",
+        "Description": "A quick spicy starter",
+        "Cuisine": "Indian",
+        "diet": ["vegetarian", "gluten-free"],
+        "ingredients": ["200 grams Paneer", "1 tsp chilli powder", "1 cup curd"],
+        "cleaned_ingredients": ["paneer", "chilli powder", "curd"],
+        "instructions": ["Marinate the paneer.", "Grill until charred."],
+        "TotalTimeInMins": 20,
+        "total_minutes": 20, "calories": 350, "protein": 22, "carbs": 10, "fat": 25, "complexity_score": 0.2
+    },
+    {
+        "RecipeName": "Chicken Curry",
+        "Description": "Rich curry for dinner",
+        "Cuisine": "South Indian Recipes",
+        "diet": ["non-vegetarian", "gluten-free"],
+        "ingredients": ["500 grams chicken", "2 onions", "1 tsp chili flakes"],
+        "cleaned_ingredients": ["chicken", "onions", "chili flakes"],
+        "instructions": ["Brown the onions.", "Simmer the chicken."],
+        "TotalTimeInMins": 45,
+        "total_minutes": 45, "calories": 550, "protein": 35, "carbs": 15, "fat": 30, "complexity_score": 0.4
+    },
+    {
+        "RecipeName": "Pasta Primavera",
+        "Description": "Italian pasta dinner",
+        "Cuisine": "Italian",
+        "diet": ["vegetarian"],
+        "ingredients": ["200 g pasta", "1 cup tomatoes", "50 g cheese"],
+        "cleaned_ingredients": ["pasta", "tomatoes", "cheese"],
+        "instructions": ["Boil the pasta.", "Toss with the vegetables."],
+        "TotalTimeInMins": 30,
+        "total_minutes": 30, "calories": 480, "protein": 15, "carbs": 70, "fat": 12, "complexity_score": 0.3
+    },
+    {
+        "RecipeName": "Vegan Thai Green Curry",
+        "Description": "Coconut curry with vegetables",
+        "Cuisine": "Thai",
+        "diet": ["vegan", "vegetarian", "gluten-free", "dairy-free"],
+        "ingredients": ["1 can coconut milk", "2 cups mixed vegetables", "1 tbsp green curry paste"],
+        "cleaned_ingredients": ["coconut milk", "mixed vegetables", "green curry paste"],
+        "instructions": ["Fry the paste.", "Add the coconut milk and vegetables."],
+        "TotalTimeInMins": 35,
+        "total_minutes": 35, "calories": 420, "protein": 8, "carbs": 30, "fat": 28, "complexity_score": 0.3
+    },
+    {
+        "RecipeName": "Tomato Basil Soup",
+        "Description": "A quick light soup",
+        "Cuisine": "Continental",
+        "diet": ["vegan", "vegetarian", "gluten-free", "dairy-free"],
+        "ingredients": ["4 tomatoes", "1 bunch basil", "1 onion"],
+        "cleaned_ingredients": ["tomatoes", "basil", "onion"],
+        "instructions": ["Simmer everything.", "Blend until smooth."],
+        "TotalTimeInMins": 25,
+        "total_minutes": 25, "calories": 180, "protein": 4, "carbs": 25, "fat": 6, "complexity_score": 0.1
+    },
+    {
+        "RecipeName": "Masala Omelette",
+        "Description": "Spicy breakfast eggs",
+        "Cuisine": "Indian",
+        "diet": ["vegetarian", "gluten-free"],
+        "ingredients": ["3 eggs", "1 green chilli", "1 onion"],
+        "cleaned_ingredients": ["eggs", "green chilli", "onion"],
+        "instructions": ["Whisk the eggs.", "Cook with the onion and chilli."],
+        "TotalTimeInMins": 15,
+        "total_minutes": 15, "calories": 300, "protein": 20, "carbs": 5, "fat": 22, "complexity_score": 0.1
+    }
+]
+
+# Recipes whose ingredients contain "nut" or "milk" only inside a longer word
+# (exclusions are substring matches, as the $regex filters were)
+CONTAINED_INGREDIENT_RECIPES: List[Dict[str, Any]] = [
+    {
+        "RecipeName": "Walnut Brownies",
+        "Description": "Fudgy brownies",
+        "Cuisine": "Continental",
+        "diet": ["vegetarian"],
+        "ingredients": ["1 cup walnuts", "200 g dark chocolate", "1 cup flour"],
+        "cleaned_ingredients": ["walnuts", "dark chocolate", "flour"],
+        "instructions": ["Melt the chocolate.", "Fold in the walnuts and bake."],
+        "TotalTimeInMins": 50,
+        "total_minutes": 50, "calories": 450, "protein": 6, "carbs": 50, "fat": 25, "complexity_score": 0.3
+    },
+    {
+        "RecipeName": "Peanut Noodles",
+        "Description": "Quick noodles in a peanut curry sauce",
+        "Cuisine": "Thai",
+        "diet": ["vegan", "vegetarian", "dairy-free"],
+        "ingredients": ["200 g noodles", "3 tbsp peanut butter", "1 tbsp soy sauce"],
+        "cleaned_ingredients": ["noodles", "peanut butter", "soy sauce"],
+        "instructions": ["Boil the noodles.", "Toss with the sauce."],
+        "TotalTimeInMins": 15,
+        "total_minutes": 15, "calories": 520, "protein": 16, "carbs": 60, "fat": 22, "complexity_score": 0.1
+    },
+    {
+        "RecipeName": "Buttermilk Pancakes",
+        "Description": "Fluffy breakfast pancakes",
+        "Cuisine": "Continental",
+        "diet": ["vegetarian"],
+        "ingredients": ["2 cups buttermilk", "1 cup flour", "1 egg"],
+        "cleaned_ingredients": ["buttermilk", "flour", "egg"],
+        "instructions": ["Whisk everything.", "Fry in a pan."],
+        "TotalTimeInMins": 25,
+        "total_minutes": 25, "calories": 380, "protein": 11, "carbs": 55, "fat": 12, "complexity_score": 0.2
+    },
+    {
+        "RecipeName": "Cashew Pulao",
+        "Description": "Fragrant rice with nuts",
+        "Cuisine": "Indian",
+        "diet": ["vegan", "vegetarian", "gluten-free", "dairy-free"],
+        "ingredients": ["1 cup basmati rice", "1/4 cup cashew nuts", "1 onion"],
+        "cleaned_ingredients": ["basmati rice", "cashew nuts", "onion"],
+        "instructions": ["Fry the cashews and onion.", "Cook with the rice."],
+        "TotalTimeInMins": 35,
+        "total_minutes": 35, "calories": 410, "protein": 9, "carbs": 65, "fat": 14, "complexity_score": 0.2
+    }
+]
+
+def prepare_recipe(recipe: Dict[str, Any]) -> Dict[str, Any]:
+    """Add the normalized fields import_recipes.main derives (returns a new dict)"""
+    document = dict(recipe)
+    document["cuisine_normalized"] = normalize_cuisine(recipe["Cuisine"])
+    document["ingredient_tokens"] = sorted(set(tokenize(recipe["cleaned_ingredients"])))
+    document["search_tokens"] = sorted(set(tokenize([recipe["RecipeName"], recipe["Description"]])))
+    return document
+
+def connect_test_collection(recipes: Optional[List[Dict[str, Any]]] = None):
+    """Point the shared connection at a freshly loaded test database
+
+    Skips the calling test (pytest.skip) if MongoDB is unreachable.
+    """
+    recipe_database.close()
+    recipe_database.db_name = TEST_DB_NAME
+    collection = recipe_database.get_collection()
+    if collection is None:
+        pytest.skip("MongoDB is not reachable (set MONGO_URI)")
+
+    collection.drop()
+    collection.database["schema_info"].delete_many({})
+    collection.insert_many([prepare_recipe(recipe) for recipe in (TEST_RECIPES if recipes is None else recipes)])
+    bootstrap_indexes(collection, force=True)
+    # Derived state (index, vocabulary, cached results) describes the old contents
+    notify_recipes_reloaded()
+    return collection
+
+def run_tests(*tests: Callable[[], None]):
+    """Run test functions from a script's __main__, logging the ones that skip"""
+    for test in tests:
+        try:
+            test()
+        except pytest.skip.Exception as e:
+            logger.warning(f"Skipped {test.__name__}: {e.msg}")